@@ -0,0 +1,191 @@
+"""Local, in-memory stand-ins for the boto3 AWS Batch and CloudWatch Logs
+clients.
+
+The `FakeBatchClient` implements the parts of the Batch API used by the
+monitor and submitters (`submit_job`, `list_jobs` with `nextToken`
+pagination, `describe_jobs`, and `terminate_job`) closely enough that they
+can be exercised offline. Jobs do not run; their statuses are set with
+`set_status`, or advanced through the usual sequence with `advance`. The
+number of calls made to each method is recorded in `calls`, and a number of
+`TooManyRequestsException` errors may be injected with `throttle`.
+
+The `FakeLogsClient` likewise serves `get_log_events`, a page at a time with
+`nextForwardToken` cursors, from events added with `put_events`.
+"""
+import time
+import uuid
+import threading
+from collections import Counter, OrderedDict
+
+__all__ = ['FakeBatchClient', 'FakeLogsClient', 'FakeClientError',
+           'JOB_STATUSES']
+
+JOB_STATUSES = ['SUBMITTED', 'PENDING', 'RUNNABLE', 'STARTING', 'RUNNING',
+                'SUCCEEDED', 'FAILED']
+
+
+class FakeClientError(Exception):
+    """An error shaped like `botocore.exceptions.ClientError`."""
+    def __init__(self, code, operation_name):
+        self.response = {'Error': {'Code': code, 'Message': code}}
+        self.operation_name = operation_name
+        super(FakeClientError, self).__init__(
+            'An error occurred (%s) when calling the %s operation.'
+            % (code, operation_name)
+        )
+
+
+class FakeBatchClient(object):
+    """An in-memory imitation of `boto3.client('batch')`.
+
+    Parameters
+    ----------
+    page_size : int
+        The largest number of jobs returned by a single `list_jobs` call,
+        whatever `maxResults` is given. The real API returns at most 100.
+    """
+    def __init__(self, page_size=100):
+        self.page_size = page_size
+        self.jobs = OrderedDict()
+        self.calls = Counter()
+        self._throttle = Counter()
+        self._lock = threading.Lock()
+        return
+
+    def _count_call(self, operation_name):
+        with self._lock:
+            self.calls[operation_name] += 1
+            if self._throttle[operation_name] > 0:
+                self._throttle[operation_name] -= 1
+                raise FakeClientError('TooManyRequestsException',
+                                      operation_name)
+        return
+
+    def throttle(self, operation_name, times):
+        """Make the next `times` calls of an operation fail with a
+        `TooManyRequestsException`."""
+        with self._lock:
+            self._throttle[operation_name] += times
+        return
+
+    def submit_job(self, jobName, jobQueue, jobDefinition, **kwargs):
+        self._count_call('SubmitJob')
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self.jobs[job_id] = {'jobId': job_id, 'jobName': jobName,
+                                 'jobQueue': jobQueue,
+                                 'jobDefinition': jobDefinition,
+                                 'status': 'SUBMITTED', 'params': kwargs}
+        return {'jobId': job_id, 'jobName': jobName}
+
+    def list_jobs(self, jobQueue, jobStatus='RUNNING', maxResults=100,
+                  nextToken=None):
+        self._count_call('ListJobs')
+        with self._lock:
+            matches = [job for job in self.jobs.values()
+                       if job['jobQueue'] == jobQueue
+                       and job['status'] == jobStatus]
+        start = int(nextToken) if nextToken else 0
+        end = start + min(maxResults, self.page_size)
+        ret = {'jobSummaryList': [self._summarize(job)
+                                  for job in matches[start:end]]}
+        if end < len(matches):
+            ret['nextToken'] = str(end)
+        return ret
+
+    def describe_jobs(self, jobs):
+        self._count_call('DescribeJobs')
+        if len(jobs) > 100:
+            raise FakeClientError('ClientException', 'DescribeJobs')
+        descs = []
+        with self._lock:
+            for job_id in jobs:
+                if job_id not in self.jobs:
+                    continue
+                job = self.jobs[job_id]
+                desc = self._summarize(job)
+                desc['jobDefinition'] = job['jobDefinition']
+                desc['container'] = {}
+                if JOB_STATUSES.index(job['status']) >= \
+                        JOB_STATUSES.index('RUNNING'):
+                    desc['container']['logStreamName'] = \
+                        self.get_log_stream_name(job_id)
+                descs.append(desc)
+        return {'jobs': descs}
+
+    def get_log_stream_name(self, job_id):
+        """Get the name of the log stream a job has once it runs."""
+        return '%s/default/%s' % (self.jobs[job_id]['jobDefinition'], job_id)
+
+    def terminate_job(self, jobId, reason):
+        self._count_call('TerminateJob')
+        self.set_status(jobId, 'FAILED')
+        with self._lock:
+            self.jobs[jobId]['statusReason'] = reason
+        return {}
+
+    @staticmethod
+    def _summarize(job):
+        return {k: job[k] for k in ['jobId', 'jobName', 'status']}
+
+    def set_status(self, job_id, status):
+        """Set the status of a job."""
+        if status not in JOB_STATUSES:
+            raise ValueError("Invalid status: %s" % status)
+        with self._lock:
+            self.jobs[job_id]['status'] = status
+        return
+
+    def advance(self, job_id, fail=False):
+        """Move a job on to its next status, ending in SUCCEEDED or FAILED.
+        """
+        status = self.jobs[job_id]['status']
+        if status in ('SUCCEEDED', 'FAILED'):
+            return
+        if status == 'RUNNING':
+            self.set_status(job_id, 'FAILED' if fail else 'SUCCEEDED')
+        else:
+            self.set_status(job_id,
+                            JOB_STATUSES[JOB_STATUSES.index(status) + 1])
+        return
+
+
+class FakeLogsClient(object):
+    """An in-memory imitation of `boto3.client('logs')`.
+
+    Parameters
+    ----------
+    page_size : int
+        The largest number of events returned by one `get_log_events` call.
+    """
+    def __init__(self, page_size=100):
+        self.page_size = page_size
+        self.streams = {}
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        return
+
+    def put_events(self, log_stream_name, messages, timestamp=None):
+        """Add messages to the end of a log stream."""
+        if timestamp is None:
+            timestamp = int(time.time() * 1000)
+        with self._lock:
+            events = self.streams.setdefault(log_stream_name, [])
+            events.extend({'timestamp': timestamp, 'message': msg}
+                          for msg in messages)
+        return
+
+    def get_log_events(self, logGroupName, logStreamName, startFromHead=False,
+                       nextToken=None, limit=None):
+        with self._lock:
+            self.calls['GetLogEvents'] += 1
+            if logStreamName not in self.streams:
+                raise FakeClientError('ResourceNotFoundException',
+                                      'GetLogEvents')
+            events = list(self.streams[logStreamName])
+        start = int(nextToken.split('/')[1]) if nextToken else 0
+        end = min(start + min(limit or self.page_size, self.page_size),
+                  len(events))
+        return {'events': events[start:end],
+                'nextForwardToken': 'f/%d' % end,
+                'nextBackwardToken': 'b/%d' % start}
@@ -0,0 +1,233 @@
+"""Tail the CloudWatch logs of batch jobs, and stash them in compressed chunks.
+
+A `LogTailer` keeps the `nextForwardToken` of its job's log stream, so each
+call of `fetch` only gets the events logged since the last. The lines it
+gathers are handed to a `LogSink`, which compresses each batch of lines into
+a gzip chunk and appends it to the job's stashed log, locally or on S3. When
+the job is done, its log is given its final label by renaming (or, on S3,
+copying) the chunks, rather than reloading and rewriting the whole log.
+
+Because concatenated gzip members form a valid gzip stream, a local stashed
+log can be read with `gzip.open`, and the chunks of a log on S3 can be
+decompressed and joined in order, as `load_s3_log` does.
+"""
+import gzip
+import boto3
+import logging
+import threading
+from os import path, replace
+from datetime import datetime
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['LogTailer', 'LogSink', 'LocalLogSink', 'S3LogSink', 'load_s3_log']
+
+
+class LogTailer(object):
+    """Fetch the new lines of a batch job's CloudWatch log, poll by poll.
+
+    Parameters
+    ----------
+    job_def : dict
+        A job summary, with at least a 'jobId' and a 'jobName'.
+    batch_client : botocore.client.Batch
+        The client used to find the log stream of the job.
+    logs_client : botocore.client.CloudWatchLogs
+        The client used to get the log events.
+    log_group_name : str
+        The log group of the job. Default is '/aws/batch/job'.
+    """
+    def __init__(self, job_def, batch_client, logs_client,
+                 log_group_name='/aws/batch/job'):
+        self.job_id = job_def['jobId']
+        self.job_name = job_def['jobName']
+        self.batch_client = batch_client
+        self.logs_client = logs_client
+        self.log_group_name = log_group_name
+        self.log_stream_name = None
+        self.next_token = None
+        self.latest_timestamp = None
+        self.lines = []
+        self.num_lines = 0
+        return
+
+    def __repr__(self):
+        return '%s(%s, %d lines)' % (self.__class__.__name__, self.job_name,
+                                     self.num_lines)
+
+    def __len__(self):
+        return self.num_lines
+
+    def _find_log_stream(self):
+        jobs = self.batch_client.describe_jobs(jobs=[self.job_id])['jobs']
+        if not jobs:
+            return None
+        return jobs[0].get('container', {}).get('logStreamName')
+
+    def fetch(self):
+        """Get the lines logged since the last fetch, and buffer them.
+
+        Returns
+        -------
+        new_lines : list[str]
+            The new lines of the log, which are also added to `lines`. This
+            is empty if the job has not yet started logging.
+        """
+        if self.log_stream_name is None:
+            self.log_stream_name = self._find_log_stream()
+            if self.log_stream_name is None:
+                return []
+
+        new_lines = []
+        kwargs = {'logGroupName': self.log_group_name,
+                  'logStreamName': self.log_stream_name,
+                  'startFromHead': True}
+        while True:
+            if self.next_token is not None:
+                kwargs['nextToken'] = self.next_token
+            resp = self.logs_client.get_log_events(**kwargs)
+            for event in resp['events']:
+                timestamp = datetime.utcfromtimestamp(event['timestamp']/1000)
+                new_lines.append('%s: %s\n' % (timestamp, event['message']))
+                self.latest_timestamp = timestamp
+
+            # The same token is given back once the end of the log is reached.
+            token = resp.get('nextForwardToken')
+            at_end = not resp['events'] or token in (None, self.next_token)
+            if token is not None:
+                self.next_token = token
+            if at_end:
+                break
+
+        self.lines.extend(new_lines)
+        self.num_lines += len(new_lines)
+        return new_lines
+
+    def pop_lines(self):
+        """Return the buffered lines, and clear the buffer."""
+        lines = self.lines
+        self.lines = []
+        return lines
+
+
+class LogSink(object):
+    """Stash job logs as a series of gzip chunks, and label them when done.
+
+    Chunks of the same job must be appended by one thread at a time, but
+    different jobs may be stashed concurrently.
+    """
+    def __init__(self):
+        self.num_chunks = Counter()
+        self._lock = threading.Lock()
+        return
+
+    def append(self, job_name, lines):
+        """Compress lines of a job's log and add them to its stash."""
+        if not lines:
+            return
+        data = gzip.compress(''.join(lines).encode('utf-8'))
+        with self._lock:
+            chunk_idx = self.num_chunks[job_name]
+            self.num_chunks[job_name] += 1
+        self._write_chunk(job_name, chunk_idx, data)
+        return
+
+    def finalize(self, job_name, label):
+        """Give the stashed log of a job its final label."""
+        raise NotImplementedError
+
+    def _write_chunk(self, job_name, chunk_idx, data):
+        raise NotImplementedError
+
+
+class LocalLogSink(LogSink):
+    """Stash logs in a local directory, one gzip file per job.
+
+    Each chunk is appended to `<job_name>_stash.log.gz`, which is renamed to
+    `<label>_<job_name>_stash.log.gz` when the job is finalized.
+    """
+    def __init__(self, dirname):
+        super(LocalLogSink, self).__init__()
+        self.dirname = dirname
+        return
+
+    def get_path(self, job_name, label=''):
+        return path.join(self.dirname, '%s%s_stash.log.gz'
+                         % (label + '_' if label else '', job_name))
+
+    def _write_chunk(self, job_name, chunk_idx, data):
+        with open(self.get_path(job_name), 'ab') as f:
+            f.write(data)
+        return
+
+    def finalize(self, job_name, label):
+        running_path = self.get_path(job_name)
+        if not path.exists(running_path):
+            logger.info("No log was stashed for %s." % job_name)
+            return None
+        final_path = self.get_path(job_name, label)
+        replace(running_path, final_path)
+        return final_path
+
+
+class S3LogSink(LogSink):
+    """Stash logs on S3, with one object per chunk.
+
+    Chunk `i` of a job is written to `RUNNING_<job_name>_stash.log.<i>.gz`
+    under the prefix of the job. When the job is finalized, the chunks are
+    copied within S3 to `<label>_<job_name>_stash.log.<i>.gz`, and the
+    originals are deleted.
+
+    Parameters
+    ----------
+    bucket : str
+        The bucket in which to stash the logs.
+    get_prefix : callable
+        Takes the name of a job and returns the prefix of its logs, with a
+        trailing '/'.
+    s3_client : Optional[botocore.client.S3]
+        The client to use. By default a new boto3 client is made.
+    """
+    def __init__(self, bucket, get_prefix, s3_client=None):
+        super(S3LogSink, self).__init__()
+        if s3_client is None:
+            s3_client = boto3.client('s3')
+        self.bucket = bucket
+        self.get_prefix = get_prefix
+        self.s3_client = s3_client
+        return
+
+    def get_key(self, job_name, label, chunk_idx):
+        return '%s%s_%s_stash.log.%05d.gz' % (self.get_prefix(job_name),
+                                              label, job_name, chunk_idx)
+
+    def _write_chunk(self, job_name, chunk_idx, data):
+        self.s3_client.put_object(Bucket=self.bucket, Body=data,
+                                  Key=self.get_key(job_name, 'RUNNING',
+                                                   chunk_idx))
+        return
+
+    def finalize(self, job_name, label):
+        keys = []
+        for chunk_idx in range(self.num_chunks[job_name]):
+            running_key = self.get_key(job_name, 'RUNNING', chunk_idx)
+            final_key = self.get_key(job_name, label, chunk_idx)
+            self.s3_client.copy_object(
+                Bucket=self.bucket, Key=final_key,
+                CopySource={'Bucket': self.bucket, 'Key': running_key}
+            )
+            self.s3_client.delete_object(Bucket=self.bucket, Key=running_key)
+            keys.append(final_key)
+        if not keys:
+            logger.info("No log was stashed for %s." % job_name)
+        return keys
+
+
+def load_s3_log(s3_client, bucket, keys):
+    """Decompress and join the chunks of a log stashed by an `S3LogSink`."""
+    return ''.join(
+        gzip.decompress(s3_client.get_object(Bucket=bucket, Key=key)['Body']
+                        .read()).decode('utf-8')
+        for key in sorted(keys)
+    )
@@ -3,14 +3,21 @@ import logging
 from time import sleep
 from os import makedirs, path
 from datetime import datetime
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 
-from indra.util.aws import get_ids, JobLog, tag_instance
+from indra.util.aws import get_ids, tag_instance
 
 from indra_reading.util import get_s3_job_log_prefix
 from indra_reading.batch.util import bucket_name
+from indra_reading.batch.logs import LogTailer, LocalLogSink, S3LogSink
 
 logger = logging.getLogger('batch_monitor')
 
+PRE_RUN_STATUSES = ['SUBMITTED', 'PENDING', 'RUNNABLE', 'STARTING']
+ACTIVE_STATUSES = PRE_RUN_STATUSES + ['RUNNING']
+FINAL_STATUSES = ['SUCCEEDED', 'FAILED']
+
 
 class BatchReadingError(Exception):
     pass
@@ -33,8 +40,31 @@ class BatchMonitor(object):
         Indicate the root name of the location you wish all logs to be stored.
         If you choose to dump logs on s3, this will be the s3 prefix. Note that
         a trailing '/' is NOT assumed.
+    batch_client : Optional[botocore.client.Batch]
+        The client used to query AWS Batch. By default a new boto3 client is
+        made. A `indra_reading.batch.fake_client.FakeBatchClient` may be
+        given to run the monitor offline.
+    log_threads : int
+        The maximum number of job logs fetched at once. Default is 10.
+    describe_threads : int
+        The maximum number of `describe_jobs` calls, of up to 100 jobs each,
+        made at once. Default is 4.
+    logs_client : Optional[botocore.client.CloudWatchLogs]
+        The client used to fetch the job logs. By default a new boto3 client
+        is made.
+
+    Each poll lists the jobs of every status concurrently, following the
+    pagination of the Batch API. When a job list is given, only the active
+    statuses are listed, and the tracked jobs that have left them are
+    described individually, once, to find their final status.
+
+    Each job log is tailed from where the last poll left off, and if logs
+    are stashed, they are written out in compressed chunks and given their
+    final label by renaming, not rewriting, them.
     """
-    def __init__(self, queue_name, job_list=None, job_base=None, log_base=None):
+    def __init__(self, queue_name, job_list=None, job_base=None, log_base=None,
+                 batch_client=None, log_threads=10, logs_client=None,
+                 describe_threads=4):
 
         self.start_time = datetime.now()
         self.queue_name = queue_name
@@ -50,9 +80,17 @@ class BatchMonitor(object):
         # Don't start watching jobs added after this command was initialized.
         self.observed_job_def_dict = {}
 
-        self.batch_client = boto3.client('batch')
+        if batch_client is None:
+            batch_client = boto3.client('batch')
+        self.batch_client = batch_client
+        if logs_client is None:
+            logs_client = boto3.client('logs')
+        self.logs_client = logs_client
+        self.log_threads = log_threads
+        self.describe_threads = describe_threads
 
         self.job_id_list = None
+        self._job_summaries = {}
         self._submitter_submitting = False
         return
 
@@ -99,8 +137,9 @@ class BatchMonitor(object):
             a problem if there is a chance you might call this when no jobs
             will ever be run.
         dump_size : int
-            Set the size of the log dumps (number of lines). The default is
-            10,000.
+            Set the size of the log dumps (number of lines). The lines of a
+            running job's log are stashed once this many have gathered, and
+            the rest when the job is done. The default is 10,000.
         result_record : dict
             A dict which will be modified in place to record the results of the
             job.
@@ -113,17 +152,20 @@ class BatchMonitor(object):
                 get_ecs_cluster_for_queue(self.queue_name, self.batch_client)
         else:
             ecs_cluster_name = None
+        log_sink = self._get_log_sink(stash_log_method) \
+            if stash_log_method else None
         terminate_msg = 'Job log has stalled for at least %f minutes.'
         terminated_jobs = set()
         found_a_job = False
         while True:
             pre_run = []
             self.job_id_list = get_ids(self.job_list)
-            for status in ('SUBMITTED', 'PENDING', 'RUNNABLE', 'STARTING'):
-                pre_run += self.get_jobs_by_status(status)
-            running = self.get_jobs_by_status('RUNNING')
-            failed = self.get_jobs_by_status('FAILED')
-            done = self.get_jobs_by_status('SUCCEEDED')
+            jobs_by_status = self.poll_jobs()
+            for status in PRE_RUN_STATUSES:
+                pre_run += jobs_by_status[status]
+            running = jobs_by_status['RUNNING']
+            failed = jobs_by_status['FAILED']
+            done = jobs_by_status['SUCCEEDED']
 
             if len(pre_run + running):
                 found_a_job = True
@@ -177,22 +219,27 @@ class BatchMonitor(object):
             if tag_instances:
                 tag_instances_on_cluster(ecs_cluster_name)
 
-            # Stash the logs of things that have finished so far. Note that
-            # jobs terminated in this round will not be picked up until the
-            # next round.
-            if stash_log_method:
-                for job_log in self.job_log_dict.values():
-                    self._stash_log(job_log, stash_log_method)
+            # Stash the logs that have grown large enough, and all of the
+            # logs of jobs that are no longer running. Note that jobs
+            # terminated in this round will not be picked up until the next
+            # round.
+            if log_sink is not None:
+                running_ids = {job['jobId'] for job in running}
+                self._stash_logs(
+                    log_sink,
+                    [job_log for job_log in self.job_log_dict.values()
+                     if job_log.lines and (job_log.job_id not in running_ids
+                                           or len(job_log.lines) >= dump_size)]
+                )
 
             sleep(poll_interval)
 
-        # Reload the stashed logs, and dump a final record log.
-        if stash_log_method:
+        # Stash the last of the logs, and label them.
+        if log_sink is not None:
             failed_jobs = {job['jobId'] for job in failed}
             succeeded_jobs = {job['jobId'] for job in done}
+            labels = {}
             for job_log in self.job_log_dict.values():
-                job_log.load(self._get_log_name(stash_log_method,
-                                                job_log.job_name, 'RUNNING'))
                 if job_log.job_id in terminated_jobs:
                     label = 'TERMINATED'
                 elif job_log.job_id in failed_jobs:
@@ -203,11 +250,8 @@ class BatchMonitor(object):
                     label = 'UNKNOWN'
                     logger.warning("Job %s not among terminated, succeeded, "
                                    "or failed..." % job_log.job_id)
-
-                final_log_name = self._get_log_name(stash_log_method,
-                                                    job_log.job_name, label)
-                job_log.dump(final_log_name, append=False)
-                job_log.clear_lines()
+                labels[job_log.job_id] = label
+            self._stash_logs(log_sink, self.job_log_dict.values(), labels)
 
         result_record['terminated'] = terminated_jobs
         result_record['failed'] = failed
@@ -215,23 +259,46 @@ class BatchMonitor(object):
 
         return ret
 
-    def _stash_log(self, job_log, stash_log_method):
-        log_name = self._get_log_name(stash_log_method, job_log.job_name,
-                                      'RUNNING')
-        job_log.dump(log_name)
-        job_log.clear_lines()
-        return log_name
+    def _stash_log(self, log_sink, job_log, label=None):
+        try:
+            if label is not None:
+                # Get the last of the log before it is labeled.
+                job_log.fetch()
+            log_sink.append(job_log.job_name, job_log.pop_lines())
+            if label is not None:
+                log_sink.finalize(job_log.job_name, label)
+        except Exception as e:
+            logger.error("Failed to stash log for: %s" % job_log.job_name)
+            logger.exception(e)
+        return
+
+    def _stash_logs(self, log_sink, job_logs, labels=None):
+        """Stash the buffered lines of job logs, `log_threads` at a time.
+
+        If `labels` are given, a dict of labels keyed by job ID, each log is
+        also brought up to date and given its final label.
+        """
+        job_logs = list(job_logs)
+        if not job_logs:
+            return
+        labels = labels or {}
+        with ThreadPoolExecutor(max_workers=self.log_threads) as executor:
+            list(executor.map(
+                lambda job_log: self._stash_log(log_sink, job_log,
+                                                labels.get(job_log.job_id)),
+                job_logs
+            ))
+        return
 
-    def _get_log_name(self, stash_log_method, job_name, label=''):
-        log_name = '%s_stash.log' % job_name
+    def _get_log_sink(self, stash_log_method):
         if not self.log_base:
             raise ValueError("You cannot stash logs without specifying a base "
                              "directory for the logs: log_base.")
         if stash_log_method == 's3':
-            s3_prefix = get_s3_job_log_prefix(self.log_base, job_name,
-                                              job_queue=self.queue_name)
-            log_name = (label + '_' if label else '') + log_name
-            log_name = 's3:%s/%s%s' % (bucket_name, s3_prefix, log_name)
+            def get_prefix(job_name):
+                return get_s3_job_log_prefix(self.log_base, job_name,
+                                             job_queue=self.queue_name)
+            log_sink = S3LogSink(bucket_name, get_prefix)
         elif stash_log_method == 'local':
             prefix = self.log_base
             if prefix is None:
@@ -239,65 +306,140 @@ class BatchMonitor(object):
             dirname = '%s_job_logs' % prefix
             if not path.exists(dirname):
                 makedirs(dirname)
-            log_name = path.join(dirname, log_name)
+            log_sink = LocalLogSink(dirname)
         else:
             raise ValueError("Invalid log stash method: %s"
                              % stash_log_method)
-        return log_name
+        return log_sink
 
-    def get_jobs_by_status(self, status):
-        res = self.batch_client.list_jobs(jobQueue=self.queue_name,
-                                          jobStatus=status, maxResults=10000)
-        jobs = res['jobSummaryList']
+    def _list_jobs(self, status):
+        """List all the jobs in the queue with a status, page by page."""
+        jobs = []
+        kwargs = {}
+        while True:
+            res = self.batch_client.list_jobs(jobQueue=self.queue_name,
+                                              jobStatus=status, maxResults=100,
+                                              **kwargs)
+            jobs += res['jobSummaryList']
+            if not res.get('nextToken'):
+                break
+            kwargs['nextToken'] = res['nextToken']
+        return jobs
+
+    def _filter_jobs(self, jobs):
         if self.job_base:
             jobs = [job for job in jobs if
                     job['jobName'].startswith(self.job_base)]
         if self.job_id_list is not None:
-            jobs = [job_def for job_def in jobs
-                    if job_def['jobId'] in self.job_id_list]
+            job_ids = set(self.job_id_list)
+            jobs = [job_def for job_def in jobs if job_def['jobId'] in job_ids]
         return jobs
 
+    def get_jobs_by_status(self, status):
+        return self._filter_jobs(self._list_jobs(status))
+
+    def _describe_jobs(self, job_ids):
+        return self.batch_client.describe_jobs(jobs=job_ids)['jobs']
+
+    def poll_jobs(self):
+        """Get the jobs being watched, as a dict keyed by status.
+
+        The statuses are listed concurrently. If a job list was given, only
+        the active statuses are listed. Tracked jobs whose final status is
+        not yet known, and that are not active, are then described in
+        batches of 100, and once a job is found to have finished it is never
+        queried again.
+        """
+        statuses = ACTIVE_STATUSES if self.job_id_list else \
+            ACTIVE_STATUSES + FINAL_STATUSES
+        with ThreadPoolExecutor(max_workers=len(statuses)) as executor:
+            job_lists = executor.map(self.get_jobs_by_status, statuses)
+            jobs_by_status = dict(zip(statuses, job_lists))
+        if not self.job_id_list:
+            return jobs_by_status
+
+        # Record the active jobs, and look up any others that have changed.
+        active_ids = set()
+        for status in ACTIVE_STATUSES:
+            for job in jobs_by_status[status]:
+                self._job_summaries[job['jobId']] = job
+                active_ids.add(job['jobId'])
+        changed_ids = []
+        for jid in self.job_id_list:
+            if jid in active_ids:
+                continue
+            summary = self._job_summaries.get(jid)
+            if summary is None or summary['status'] not in FINAL_STATUSES:
+                changed_ids.append(jid)
+        if changed_ids:
+            chunks = [changed_ids[i:i+100]
+                      for i in range(0, len(changed_ids), 100)]
+            num_threads = min(len(chunks), self.describe_threads)
+            with ThreadPoolExecutor(max_workers=num_threads) as executor:
+                for jobs in executor.map(self._describe_jobs, chunks):
+                    for job in jobs:
+                        self._job_summaries[job['jobId']] = \
+                            {k: job[k] for k in ['jobId', 'jobName', 'status']}
+
+        # Sort out the tracked jobs by status.
+        jobs_by_status = {status: [] for status in statuses + FINAL_STATUSES}
+        for job in self._filter_jobs(list(self._job_summaries.values())):
+            jobs_by_status[job['status']].append(job)
+        return jobs_by_status
+
+    def _check_log(self, job_log, job_def, idle_log_timeout):
+        """Fetch new lines of a job log, returning whether it has stalled."""
+        try:
+            now = datetime.utcnow()
+            new_lines = job_log.fetch()
+
+            if len(job_log) and not new_lines:
+                # If the job log hasn't changed, announce as such, and
+                # check to see if it has been the same for longer than
+                # stall time.
+                check_dt = now - job_log.latest_timestamp
+                logger.warning(('Job \'%s\' has not produced output for '
+                                '%d seconds.')
+                               % (job_def['jobName'], check_dt.seconds))
+                if idle_log_timeout and check_dt.seconds > idle_log_timeout:
+                    logger.warning("Job \'%s\' has stalled."
+                                   % job_def['jobName'])
+                    return True
+        except Exception as e:
+            # Sometimes due to sync et al. issues, a part of this will fail
+            # Such things are usually transitory issues so we keep trying.
+            logger.error("Failed to check log for: %s" % str(job_def))
+            logger.exception(e)
+        return False
+
     def check_logs(self, job_defs, idle_log_timeout):
-        """Updates the job_log_dict."""
-        stalled_jobs = set()
+        """Updates the job_log_dict.
 
-        # Check the status of all the jobs we're tracking.
+        The logs are fetched concurrently, `log_threads` at a time.
+        """
+        # Find the logs of all the jobs we're tracking.
+        job_logs = []
         for job_def in job_defs:
-            try:
-                # Get the job id.
-                jid = job_def['jobId']
-                now = datetime.utcnow()
-                if jid not in self.job_log_dict.keys():
-                    # If the job is new...
-                    logger.info("Adding job %s to the log job_log at %s."
-                                % (jid, now))
-                    # Instantiate a new job_log.
-                    job_log = JobLog(job_def)
-                    self.job_log_dict[jid] = job_log
-                else:
-                    job_log = self.job_log_dict[jid]
-
-                pre_len = len(job_log)
-                job_log.get_lines()
-                post_len = len(job_log)
-
-                if post_len and pre_len == post_len:
-                    # If the job log hasn't changed, announce as such, and
-                    # check to see if it has been the same for longer than
-                    # stall time.
-                    check_dt = now - job_log.latest_timestamp
-                    logger.warning(('Job \'%s\' has not produced output for '
-                                    '%d seconds.')
-                                   % (job_def['jobName'], check_dt.seconds))
-                    if idle_log_timeout and check_dt.seconds > idle_log_timeout:
-                        logger.warning("Job \'%s\' has stalled."
-                                       % job_def['jobName'])
-                        stalled_jobs.add(jid)
-            except Exception as e:
-                # Sometimes due to sync et al. issues, a part of this will fail
-                # Such things are usually transitory issues so we keep trying.
-                logger.error("Failed to check log for: %s" % str(job_def))
-                logger.exception(e)
+            # Get the job id.
+            jid = job_def['jobId']
+            if jid not in self.job_log_dict.keys():
+                # If the job is new...
+                logger.info("Adding job %s to the log job_log at %s."
+                            % (jid, datetime.utcnow()))
+                # Instantiate a new job_log.
+                self.job_log_dict[jid] = LogTailer(job_def, self.batch_client,
+                                                   self.logs_client)
+            job_logs.append((self.job_log_dict[jid], job_def))
+        if not job_logs:
+            return set()
+
+        # Check the status of all the logs.
+        check = partial(self._check_log, idle_log_timeout=idle_log_timeout)
+        with ThreadPoolExecutor(max_workers=self.log_threads) as executor:
+            stalled = executor.map(lambda args: check(*args), job_logs)
+            stalled_jobs = {job_def['jobId']
+                            for (_, job_def), is_stalled
+                            in zip(job_logs, stalled) if is_stalled}
 
         # Pass up the set of job id's for stalled jobs.
         return stalled_jobs
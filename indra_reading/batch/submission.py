@@ -0,0 +1,241 @@
+"""Submit many jobs to AWS Batch quickly, without tripping its rate limits.
+
+A `SubmissionEngine` submits jobs from a pool of threads, each taking a token
+from a shared `TokenBucket` before calling `submit_job`. When Batch answers
+with a `TooManyRequestsException`, the call is retried after an exponential
+backoff, and the rate of the bucket is halved; it then grows back by one job
+per second for every second's worth of successful submissions. Each job that
+is submitted is appended to an optional checkpoint file, so that a
+submission that is interrupted may be run again and will skip the jobs that
+were already submitted.
+"""
+import json
+import time
+import random
+import logging
+import threading
+from os import path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from indra_reading.util.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['SubmissionEngine', 'is_throttling_error']
+
+
+def is_throttling_error(error):
+    """Check whether an error from a boto3 client is due to throttling."""
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') in \
+        ('TooManyRequestsException', 'ThrottlingException')
+
+
+class SubmissionEngine(object):
+    """Submit jobs to AWS Batch from a pool of threads, at an adaptive rate.
+
+    Parameters
+    ----------
+    batch_client : botocore.client.Batch
+        The client used to submit the jobs.
+    num_threads : int
+        The number of jobs that may be submitted at once. Default is 8.
+    rate : float
+        The number of jobs submitted per second to begin with. Default is 10.
+    min_rate : float
+        The lowest rate to which throttling may slow submission. Default is
+        0.5.
+    max_rate : Optional[float]
+        The highest rate to which submission may speed up. By default, the
+        rate never rises above where it started.
+    max_retries : int
+        The number of times a throttled submission is tried again before the
+        error is raised. Other errors are raised at once. Default is 8.
+    backoff : float
+        The seconds to wait before the first retry of a throttled submission,
+        doubled with each further retry. Default is 1.
+    checkpoint_file : Optional[str]
+        A file of the jobs submitted, one JSON object per line. If it exists,
+        the jobs recorded in it are not submitted again.
+    """
+    def __init__(self, batch_client, num_threads=8, rate=10, min_rate=0.5,
+                 max_rate=None, max_retries=8, backoff=1,
+                 checkpoint_file=None):
+        if max_rate is None:
+            max_rate = rate
+        self.batch_client = batch_client
+        self.num_threads = num_threads
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.max_rate = max_rate
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.checkpoint_file = checkpoint_file
+        self.bucket = TokenBucket(rate)
+
+        self.submitted = self._load_checkpoint()
+        self.num_submitted = 0
+        self.num_resumed = 0
+        self.num_throttled = 0
+        self.start_time = None
+        self.end_time = None
+
+        self._successes = 0
+        self._last_slowdown = 0
+        self._lock = threading.Lock()
+        return
+
+    def __repr__(self):
+        return ('%s(num_threads=%d, rate=%.2f, submitted=%d)'
+                % (self.__class__.__name__, self.num_threads, self.rate,
+                   self.num_submitted))
+
+    def _load_checkpoint(self):
+        submitted = {}
+        if not self.checkpoint_file or not path.exists(self.checkpoint_file):
+            return submitted
+        with open(self.checkpoint_file, 'r') as f:
+            for line in f:
+                try:
+                    job = json.loads(line)
+                except ValueError:
+                    # The last line may be cut off if we were interrupted.
+                    logger.warning("Skipping bad line of checkpoint: %r"
+                                   % line)
+                    continue
+                submitted[(job['jobQueue'], job['jobName'])] = \
+                    {k: job[k] for k in ['jobId', 'jobName']}
+        logger.info("Loaded %d submitted jobs from %s."
+                    % (len(submitted), self.checkpoint_file))
+        return submitted
+
+    def _record(self, job_kwargs, job_info):
+        job = {k: job_info[k] for k in ['jobId', 'jobName']}
+        with self._lock:
+            self.submitted[(job_kwargs['jobQueue'], job['jobName'])] = job
+            self.num_submitted += 1
+            if self.checkpoint_file:
+                with open(self.checkpoint_file, 'a') as f:
+                    f.write(json.dumps(dict(job,
+                                            jobQueue=job_kwargs['jobQueue']))
+                            + '\n')
+        return job
+
+    def _speed_up(self):
+        with self._lock:
+            self._successes += 1
+            if self.rate < self.max_rate and self._successes >= self.rate:
+                self._successes = 0
+                self.rate = min(self.max_rate, self.rate + 1)
+                self.bucket.set_rate(self.rate)
+        return
+
+    def _slow_down(self):
+        with self._lock:
+            self.num_throttled += 1
+            self._successes = 0
+            # Threads throttled at about the same time only slow us once.
+            now = time.monotonic()
+            if now - self._last_slowdown < 1:
+                return
+            self._last_slowdown = now
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.bucket.set_rate(self.rate)
+            logger.warning("Throttled by Batch, slowing to %.2f jobs/s."
+                           % self.rate)
+        return
+
+    def _submit(self, job_kwargs):
+        wait_time = self.backoff
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                job_info = self.batch_client.submit_job(**job_kwargs)
+            except Exception as e:
+                if not is_throttling_error(e) or attempt == self.max_retries:
+                    raise
+                self._slow_down()
+                time.sleep(wait_time * random.uniform(0.5, 1))
+                wait_time *= 2
+                continue
+            self._speed_up()
+            logger.info("Submitted %s." % job_kwargs['jobName'])
+            return job_kwargs, self._record(job_kwargs, job_info)
+
+    def submit_all(self, job_kwargs_iter, keep_going=None):
+        """Submit jobs, yielding each as soon as it has been submitted.
+
+        Parameters
+        ----------
+        job_kwargs_iter : iterable[dict]
+            The keyword arguments of `submit_job` for each job, including at
+            least `jobName` and `jobQueue`, which together identify a job in
+            the checkpoint. The iterable is consumed lazily.
+        keep_going : Optional[callable]
+            Checked before each job is submitted; if it returns False, no
+            further jobs are submitted.
+
+        Yields
+        ------
+        job_kwargs : dict
+            The arguments with which the job was submitted.
+        job : dict
+            The 'jobId' and 'jobName' of the job. Jobs that were found in the
+            checkpoint are yielded without being submitted again.
+        """
+        self.start_time = time.monotonic()
+        pending = set()
+        try:
+            with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+                for job_kwargs in job_kwargs_iter:
+                    if keep_going is not None and not keep_going():
+                        logger.info("Submission was stopped, "
+                                    "discontinuing...")
+                        break
+
+                    key = (job_kwargs['jobQueue'], job_kwargs['jobName'])
+                    if key in self.submitted:
+                        self.num_resumed += 1
+                        yield job_kwargs, self.submitted[key]
+                        continue
+
+                    # Keep a bounded number of jobs in flight.
+                    if len(pending) >= 2*self.num_threads:
+                        done, pending = wait(pending,
+                                             return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                    pending.add(executor.submit(self._submit, job_kwargs))
+
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+        finally:
+            self.end_time = time.monotonic()
+            logger.info(self.get_report()['summary'])
+        return
+
+    def get_report(self):
+        """Get the number of jobs submitted, and how quickly.
+
+        Returns
+        -------
+        report : dict
+            The numbers of jobs submitted, resumed from the checkpoint, and
+            throttled, the seconds taken, the jobs submitted per second, and
+            a one-line summary of them.
+        """
+        end_time = self.end_time or time.monotonic()
+        elapsed = end_time - self.start_time if self.start_time else 0
+        jobs_per_sec = self.num_submitted / elapsed if elapsed else 0
+        report = {'submitted': self.num_submitted,
+                  'resumed': self.num_resumed,
+                  'throttled': self.num_throttled,
+                  'seconds': elapsed,
+                  'jobs_per_sec': jobs_per_sec}
+        report['summary'] = ('Submitted %d jobs in %.1f seconds (%.2f jobs/s), '
+                             'skipped %d already submitted, throttled %d times.'
+                             % (self.num_submitted, elapsed, jobs_per_sec,
+                                self.num_resumed, self.num_throttled))
+        return report
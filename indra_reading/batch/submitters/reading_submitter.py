@@ -105,7 +105,7 @@ class ReadingSubmitter(Submitter):
                 yield job_start_ix, job_end_ix
 
     def submit_reading(self, input_fname, start_ix, end_ix, ids_per_job,
-                       num_tries=1, stagger=0):
+                       num_tries=1, stagger=0, checkpoint_file=None):
         """Submit a batch of reading jobs.
 
         This is now just a thin wrapper around `submit_jobs`.
@@ -125,6 +125,10 @@ class ReadingSubmitter(Submitter):
             The number of times a job may be attempted.
         stagger : float
             The number of seconds to wait between job submissions.
+        checkpoint_file : Optional[str]
+            A file in which to record the jobs submitted, so that an
+            interrupted submission may be resumed without submitting any job
+            twice.
 
         Returns
         -------
@@ -133,7 +137,8 @@ class ReadingSubmitter(Submitter):
             used.
         """
         return self.submit_jobs(input_fname, start_ix, end_ix, ids_per_job,
-                                num_tries=num_tries, stagger=stagger)
+                                num_tries=num_tries, stagger=stagger,
+                                checkpoint_file=checkpoint_file)
 
     def run(self, input_fname, ids_per_job, stagger=0, **wait_params):
         """Run this submission all the way.
@@ -9,6 +9,7 @@ from indra_reading.util import get_s3_and_job_prefixes
 
 from indra_reading.batch.util import get_environment
 from indra_reading.batch.monitor import BatchMonitor
+from indra_reading.batch.submission import SubmissionEngine
 
 logger = logging.getLogger('batch_submitter_core')
 
@@ -72,6 +73,7 @@ class Submitter:
         self.options = options
         self.running = None
         self.submitting = False
+        self.submission_report = None
         self.monitors = {}
         for queue_name in self._iter_over_select_queues():
             self.monitors[queue_name] = \
@@ -115,15 +117,32 @@ class Submitter:
         for monitor in self.monitors.values():
             monitor.set_submitting(status)
 
-    def submit_jobs(self, *args, num_tries=1, stagger=0):
+    def submit_jobs(self, *args, num_tries=1, stagger=0, num_threads=8,
+                    rate=10, checkpoint_file=None, batch_client=None):
         """Submit all the jobs to batch.
 
+        Jobs are submitted by a
+        `indra_reading.batch.submission.SubmissionEngine`, from a pool of
+        threads, slowing down whenever Batch throttles the submissions.
+
         Parameters
         ----------
         num_tries : int
             The number of times a job may be attempted.
         stagger : float
-            The number of seconds to wait between job submissions.
+            The number of seconds to wait between job submissions. If given,
+            jobs are submitted one at a time, at most 1/`stagger` per second.
+        num_threads : int
+            The number of jobs that may be submitted at once. Default is 8.
+        rate : float
+            The number of jobs to submit per second. Default is 10.
+        checkpoint_file : Optional[str]
+            A file in which to record the jobs submitted. If a submission is
+            interrupted, running it again with the same file will not submit
+            the recorded jobs a second time, though they are still tracked.
+        batch_client : Optional[botocore.client.Batch]
+            The client used to submit jobs. By default a new boto3 client is
+            made.
 
         Returns
         -------
@@ -135,7 +154,13 @@ class Submitter:
         environment_vars = get_environment()
 
         # Iterate over the list of PMIDs and submit the job in chunks
-        batch_client = boto3.client('batch', region_name='us-east-1')
+        if batch_client is None:
+            batch_client = boto3.client('batch', region_name='us-east-1')
+        if stagger:
+            num_threads = 1
+            rate = 1/stagger
+        engine = SubmissionEngine(batch_client, num_threads=num_threads,
+                                  rate=rate, checkpoint_file=checkpoint_file)
 
         # Check to see if we've already been given a signal to quit.
         if self.running is None:
@@ -143,26 +168,19 @@ class Submitter:
         elif not self.running:
             return None
 
-        self.set_monitors_submitting(True)
-        try:
+        def iter_job_kwargs():
             for job_args in self._iter_job_args(*args):
-                # Check for a stop signal
-                if not self.running:
-                    logger.info("Running was switched off, discontinuing...")
-                    break
-
                 cmd_iter = self._iter_job_queue_def_commands(*job_args)
                 for job_name, cmd, job_def, job_queue in cmd_iter:
                     command_list = get_batch_command(cmd, purpose=self._purpose,
                                                      project=self.project_name)
                     logger.info('Command list: %s' % str(command_list))
 
-                    # Submit the job.
                     kwargs = {}
                     if self.job_timeout_override is not None:
                         kwargs['timeout'] = \
                             {'attemptDurationSeconds': self.job_timeout_override}
-                    job_info = batch_client.submit_job(
+                    yield dict(
                         jobName=job_name,
                         jobQueue=job_queue,
                         jobDefinition=job_def,
@@ -173,14 +191,15 @@ class Submitter:
                         **kwargs
                     )
 
-                    # Record the job id.
-                    logger.info("submitted...")
-                    self.job_lists[job_queue].append(
-                        {k: job_info[k] for k in ['jobId', 'jobName']}
-                    )
-                    logger.info("Sleeping for %d seconds..." % stagger)
-                    sleep(stagger)
+        self.set_monitors_submitting(True)
+        try:
+            job_iter = engine.submit_all(iter_job_kwargs(),
+                                         keep_going=lambda: self.running)
+            for job_kwargs, job in job_iter:
+                # Record the job id.
+                self.job_lists[job_kwargs['jobQueue']].append(job)
         finally:
+            self.submission_report = engine.get_report()
             self.set_monitors_submitting(False)
         return self.job_lists
 
@@ -13,9 +13,11 @@ import glob
 import json
 import pickle
 import functools
-import signal
 import time
+import queue
+import threading
 import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from collections import Counter
 from platform import system
@@ -30,6 +32,11 @@ from indra.literature import pmc_client, s3_client, get_full_text, \
     elsevier_client
 from indra.sources.sparser import api as sparser
 
+from indra_reading.util.rate_limit import TokenBucket
+from indra_reading.readers.policy import ExecutionPolicy
+from indra_reading.readers.content import Content
+from indra_reading.readers.reach import ReachReader
+
 
 def make_parser():
     parser = argparse.ArgumentParser(
@@ -70,6 +77,45 @@ def make_parser():
         type=int,
         help='Select the number of cores you want to use.'
         )
+    parser.add_argument(
+        '--fetch_threads',
+        dest='fetch_threads',
+        default=None,
+        type=int,
+        help=('Download content using this many threads, independent of the '
+              'number of cores used for reading. By default, content is '
+              'downloaded by a pool of num_cores processes.')
+        )
+    parser.add_argument(
+        '--fetch_rate',
+        dest='fetch_rate',
+        default=None,
+        type=float,
+        help=('The maximum number of content downloads to start per second '
+              'when using --fetch_threads. By default there is no limit.')
+        )
+    parser.add_argument(
+        '--pipeline',
+        dest='pipeline',
+        action='store_true',
+        help=('Download, read, and process content at the same time, in '
+              'batches, rather than one whole phase after another.')
+        )
+    parser.add_argument(
+        '--batch_size',
+        dest='batch_size',
+        default=100,
+        type=int,
+        help='The number of pmids read at a time with --pipeline.'
+        )
+    parser.add_argument(
+        '--max_queued',
+        dest='max_queued',
+        default=None,
+        type=int,
+        help=('The maximum number of downloads waiting to be read with '
+              '--pipeline. By default, twice the batch size.')
+        )
     parser.add_argument(
         '-v', '--verbose',
         dest='verbose',
@@ -171,7 +217,8 @@ def join_json_files(prefix):
 
 
 def download_from_s3(pmid, reader='all', input_dir=None, reader_version=None,
-                     force_read=False, force_fulltext=False):
+                     force_read=False, force_fulltext=False,
+                     rate_limiter=None):
     logger.info(('Downloading %s from S3, force_read=%s, force_fulltext=%s '
                  'reader_version=%s') % (pmid, force_read, force_fulltext,
                                          reader_version))
@@ -180,8 +227,12 @@ def download_from_s3(pmid, reader='all', input_dir=None, reader_version=None,
 
     # First define the text retrieval function
     def get_text():
-        # Add timeout here for PubMed
-        time.sleep(0.5)
+        # Add timeout here for PubMed, or wait for our turn if the downloads
+        # share a rate limit.
+        if rate_limiter is None:
+            time.sleep(0.5)
+        else:
+            rate_limiter.acquire()
         # full_pmid = s3_client.check_pmid(pmid)
         # Look for the full text
         content, content_type = s3_client.get_upload_content(
@@ -253,8 +304,54 @@ def download_from_s3(pmid, reader='all', input_dir=None, reader_version=None,
     return result
 
 
+def fetch_content(pmids, download_func, num_threads, rate=None):
+    """Download content for many PMIDs concurrently, using threads.
+
+    Downloading is bound by the network, not the CPU, so a pool of threads
+    in this process is used rather than a pool of processes, allowing many
+    more concurrent requests while sharing connections. Each file is written
+    by `download_func` as soon as its download completes.
+
+    Parameters
+    ----------
+    pmids : list[str]
+        The PMIDs whose content should be downloaded.
+    download_func : callable
+        A function, such as `download_from_s3`, which takes a PMID and a
+        `rate_limiter` keyword argument and returns a dict of results keyed
+        by the PMID.
+    num_threads : int
+        The number of concurrent downloads.
+    rate : Optional[float]
+        The maximum number of downloads to start per second. If None, the
+        rate is not limited.
+
+    Returns
+    -------
+    results : list[dict]
+        The results of `download_func` for each PMID that did not fail.
+    """
+    rate_limiter = TokenBucket(rate) if rate else None
+    results = []
+    logger.info('Getting content for %d PMIDs with %d threads'
+                % (len(pmids), num_threads))
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        futures = {executor.submit(download_func, pmid,
+                                   rate_limiter=rate_limiter): pmid
+                   for pmid in pmids}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error('Failed to get content for %s.'
+                             % futures[future])
+                logger.exception(e)
+    return results
+
+
 def get_content_to_read(pmid_list, start_index, end_index, tmp_dir, num_cores,
-                        force_fulltext, force_read, reader, reader_version):
+                        force_fulltext, force_read, reader, reader_version,
+                        fetch_threads=None, fetch_rate=None):
     if end_index is None or end_index > len(pmid_list):
         end_index = len(pmid_list)
     pmids_in_range = pmid_list[start_index:end_index]
@@ -277,7 +374,10 @@ def get_content_to_read(pmid_list, start_index, end_index, tmp_dir, num_cores,
         force_read=force_read,
         force_fulltext=force_fulltext
         )
-    if num_cores > 1:
+    if fetch_threads is not None:
+        res = fetch_content(pmids_in_range, download_from_s3_func,
+                            fetch_threads, fetch_rate)
+    elif num_cores > 1:
         # Get content using a multiprocessing pool
         logger.info('Creating multiprocessing pool with %d cpus' % num_cores)
         pool = mp.Pool(num_cores)
@@ -346,49 +446,65 @@ def get_content_to_read(pmid_list, start_index, end_index, tmp_dir, num_cores,
 #==============================================================================
 
 
-def _timeout_handler(signum, frame):
-    raise Exception('Timeout')
+SPARSER_POLICY = ExecutionPolicy(timeout=60)
 
 
-def read_pmid(pmid, source, cont_path, sparser_version, outbuf=None,
-              cleanup=True):
-    "Run sparser on a single pmid."
-    signal.signal(signal.SIGALRM, _timeout_handler)
-    signal.alarm(60)
-    try:
-        if (source is 'content_not_found'
-           or source.startswith('unhandled_content_type')
-           or source.endswith('failure')):
-            logger.info('No content read for %s.' % pmid)
-            return  # No real content here.
-
-        if cont_path.endswith('.nxml') and source.startswith('pmc'):
-            new_fname = 'PMC%s%d.nxml' % (pmid, mp.current_process().pid)
-            os.rename(cont_path, new_fname)
+def _read_pmid_content(pmid, source, cont_path, outbuf, cleanup, timeout):
+    sp = None
+    if cont_path.endswith('.nxml') and source.startswith('pmc'):
+        new_fname = 'PMC%s%d.nxml' % (pmid, mp.current_process().pid)
+        os.rename(cont_path, new_fname)
 
-            try:
-                sp = sparser.process_nxml_file(
-                    new_fname,
-                    outbuf=outbuf,
-                    cleanup=cleanup
-                    )
-            finally:
-                if cleanup and os.path.exists(new_fname):
-                    os.remove(new_fname)
-        elif cont_path.endswith('.txt'):
-            content_str = ''
-            with open(cont_path, 'r') as f:
-                content_str = f.read()
-            sp = sparser.process_text(
-                content_str,
+        try:
+            sp = sparser.process_nxml_file(
+                new_fname,
                 outbuf=outbuf,
-                cleanup=cleanup
+                cleanup=cleanup,
+                timeout=timeout
                 )
-        signal.alarm(0)
+        finally:
+            if cleanup and os.path.exists(new_fname):
+                os.remove(new_fname)
+    elif cont_path.endswith('.txt'):
+        content_str = ''
+        with open(cont_path, 'r') as f:
+            content_str = f.read()
+        sp = sparser.process_text(
+            content_str,
+            outbuf=outbuf,
+            cleanup=cleanup,
+            timeout=timeout
+            )
+    return sp
+
+
+def read_pmid(pmid, source, cont_path, sparser_version, outbuf=None,
+              cleanup=True, policy=None):
+    """Run sparser on a single pmid.
+
+    The deadline, retries, and quarantine are set by `policy`, which is
+    `SPARSER_POLICY` by default. The deadline is passed on to the Sparser
+    subprocess, which is killed if it runs over, so this may be run in any
+    thread or process.
+    """
+    if policy is None:
+        policy = SPARSER_POLICY
+    if (source == 'content_not_found'
+       or source.startswith('unhandled_content_type')
+       or source.endswith('failure')):
+        logger.info('No content read for %s.' % pmid)
+        return  # No real content here.
+
+    try:
+        sp = policy.run(
+            lambda timeout: _read_pmid_content(pmid, source, cont_path,
+                                               outbuf, cleanup, timeout),
+            pmid,
+            text_length=os.path.getsize(cont_path)
+            )
     except Exception as e:
         logger.error('Failed to process data for %s.' % pmid)
         logger.exception(e)
-        signal.alarm(0)
         return
 
     if sp is None:
@@ -402,17 +518,44 @@ def read_pmid(pmid, source, cont_path, sparser_version, outbuf=None,
     return sp.statements
 
 
-def get_stmts(pmids_unread, cleanup=True, sparser_version=None):
-    "Run sparser on the pmids in pmids_unread."
-    if sparser_version is None:
-        sparser_version = sparser.get_version()
-    stmts = {}
+def _get_content_size(pmid_and_result):
+    """Get the size of the content file for a pmid, or 0 if it has none."""
+    cont_path = pmid_and_result[1].get('content_path')
+    if cont_path is None or not os.path.exists(cont_path):
+        return 0
+    return os.path.getsize(cont_path)
+
+
+def _open_sparser_log(buffering=-1):
     now = datetime.now()
     outbuf_fname = 'sparser_%s_%s.log' % (
         now.strftime('%Y%m%d-%H%M%S'),
         mp.current_process().pid,
         )
-    outbuf = open(outbuf_fname, 'wb')
+    return outbuf_fname, open(outbuf_fname, 'ab', buffering=buffering)
+
+
+# The Sparser log shared by all the calls of get_stmts in a pool worker.
+_worker_outbuf = None
+
+
+def _init_sparser_worker():
+    """Open one Sparser log for a pool worker, for all the pmids it reads."""
+    global _worker_outbuf
+    # The log is unbuffered, as a worker may be ended without closing it.
+    outbuf_fname, _worker_outbuf = _open_sparser_log(buffering=0)
+    print("Sparser logs may be found in %s" % outbuf_fname)
+
+
+def get_stmts(pmids_unread, cleanup=True, sparser_version=None):
+    "Run sparser on the pmids in pmids_unread."
+    if sparser_version is None:
+        sparser_version = sparser.get_version()
+    stmts = {}
+    if _worker_outbuf is not None:
+        outbuf_fname, outbuf = None, _worker_outbuf
+    else:
+        outbuf_fname, outbuf = _open_sparser_log()
     try:
         for pmid, result in pmids_unread.items():
             logger.info('Reading %s' % pmid)
@@ -436,8 +579,9 @@ def get_stmts(pmids_unread, cleanup=True, sparser_version=None):
                     'Results so far will be pickled unless '
                     'Keyboard interupt is hit again.')
     finally:
-        outbuf.close()
-        print("Sparser logs may be found in %s" % outbuf_fname)
+        if outbuf_fname is not None:
+            outbuf.close()
+            print("Sparser logs may be found in %s" % outbuf_fname)
     return stmts
 
 
@@ -450,42 +594,42 @@ def get_stmts_from_cache(pmid):
 
 
 def run_sparser(pmid_list, tmp_dir, num_cores, start_index, end_index,
-                force_read, force_fulltext, cleanup=True, verbose=True):
+                force_read, force_fulltext, cleanup=True, verbose=True,
+                fetch_threads=None, fetch_rate=None):
     'Run the sparser reader on the pmids in pmid_list.'
     reader_version = sparser.get_version()
     _, _, _, pmids_read, pmids_unread, _ =\
         get_content_to_read(
             pmid_list, start_index, end_index, tmp_dir, num_cores,
-            force_fulltext, force_read, 'sparser', reader_version
+            force_fulltext, force_read, 'sparser', reader_version,
+            fetch_threads, fetch_rate
             )
 
     logger.info('Adjusting num cores to length of pmid_list.')
     num_cores = min(len(pmid_list), num_cores)
     logger.info('Adjusted...')
-    if num_cores is 1:
+    if num_cores == 1:
         stmts = get_stmts(pmids_unread, cleanup=cleanup)
         stmts.update({pmid: get_stmts_from_cache(pmid)[pmid]
                       for pmid in pmids_read.keys()})
     elif num_cores > 1:
         logger.info("Starting a pool with %d cores." % num_cores)
-        pool = mp.Pool(num_cores)
-        pmids_to_read = list(pmids_unread.keys())
-        N = len(pmids_unread)
-        dn = int(N/num_cores)
-        logger.info("Breaking pmids into batches.")
-        batches = []
-        for i in range(num_cores):
-            batches.append({
-                k: pmids_unread[k]
-                for k in pmids_to_read[i*dn:min((i+1)*dn, N)]
-                })
+        pool = mp.Pool(num_cores, initializer=_init_sparser_worker)
+
+        # Hand the pmids out one at a time, biggest first, so the time to
+        # read varies as little as possible between processes.
+        tasks = sorted(pmids_unread.items(), key=_get_content_size,
+                       reverse=True)
         get_stmts_func = functools.partial(
             get_stmts,
             cleanup=cleanup,
             sparser_version=reader_version
             )
         logger.info("Mapping get_stmts onto pool.")
-        unread_res = pool.map(get_stmts_func, batches)
+        unread_res = list(pool.imap_unordered(
+            get_stmts_func,
+            ({pmid: result} for pmid, result in tasks)
+            ))
         logger.info('len(unread_res)=%d' % len(unread_res))
         read_res = pool.map(get_stmts_from_cache, pmids_read.keys())
         logger.info('len(read_res)=%d' % len(read_res))
@@ -612,19 +756,18 @@ def upload_process_reach_files(output_dir, pmid_info_dict, reader_version,
     return stmts_by_pmid
 
 
-def run_reach(pmid_list, base_dir, num_cores, start_index, end_index,
-              force_read, force_fulltext, cleanup=False, verbose=True):
-    """Run reach on a list of pmids."""
-    logger.info('Running REACH with force_read=%s' % force_read)
-    logger.info('Running REACH with force_fulltext=%s' % force_fulltext)
+def get_reach_path_and_version():
+    """Get the path to the REACH jar and the REACH version.
 
+    If the path is not set or invalid, (None, None) is returned.
+    """
     # Get the path to the REACH JAR
     path_to_reach = get_config('REACHPATH')
     if path_to_reach is None or not os.path.exists(path_to_reach):
         logger.warning(
             'Reach path not set or invalid. Check REACHPATH environment var.'
             )
-        return {}, {}
+        return None, None
 
     logger.info('Using REACH jar at: %s' % path_to_reach)
 
@@ -636,11 +779,56 @@ def run_reach(pmid_list, base_dir, num_cores, start_index, end_index,
         reach_version = re.sub('-SNAP.*?$', '', m.groups()[0])
 
     logger.info('Using REACH version: %s' % reach_version)
+    return path_to_reach, reach_version
+
+
+def run_reach_cli(tmp_dir, path_to_reach, num_cores, verbose=True):
+    """Run REACH on the content in <tmp_dir>/input, writing to <tmp_dir>/output.
+    """
+    # Create the REACH configuration file
+    with open(REACH_CONF_FMT_FNAME, 'r') as fmt_file:
+        conf_file_path = os.path.join(tmp_dir, 'indra.conf')
+        with open(conf_file_path, 'w') as conf_file:
+            conf_file.write(
+                fmt_file.read().format(tmp_dir=os.path.abspath(tmp_dir),
+                                       num_cores=num_cores,
+                                       loglevel='INFO')
+                )
+
+    # Run REACH!
+    logger.info("Beginning reach.")
+    args = ['java', '-Xmx24000m', '-Dconfig.file=%s' % conf_file_path,
+            '-jar', path_to_reach]
+    p = subprocess.Popen(args, stdout=subprocess.PIPE,
+                         stderr=subprocess.PIPE)
+    if verbose:
+        for line in iter(p.stdout.readline, b''):
+            logger.info(line)
+    p_out, p_err = p.communicate()
+    if p.returncode:
+        logger.error('Problem running REACH:')
+        logger.error('Stdout: %s' % p_out.decode('utf-8'))
+        logger.error('Stderr: %s' % p_err.decode('utf-8'))
+        raise Exception('REACH crashed')
+    return
+
+
+def run_reach(pmid_list, base_dir, num_cores, start_index, end_index,
+              force_read, force_fulltext, cleanup=False, verbose=True,
+              fetch_threads=None, fetch_rate=None):
+    """Run reach on a list of pmids."""
+    logger.info('Running REACH with force_read=%s' % force_read)
+    logger.info('Running REACH with force_fulltext=%s' % force_fulltext)
+
+    path_to_reach, reach_version = get_reach_path_and_version()
+    if path_to_reach is None:
+        return {}, {}
 
     tmp_dir, _, output_dir, pmids_read, pmids_unread, num_found =\
         get_content_to_read(
             pmid_list, start_index, end_index, base_dir, num_cores,
-            force_fulltext, force_read, 'reach', reach_version
+            force_fulltext, force_read, 'reach', reach_version,
+            fetch_threads, fetch_rate
             )
 
     stmts = {}
@@ -652,31 +840,7 @@ def run_reach(pmid_list, base_dir, num_cores, start_index, end_index,
             )
         logger.info("REACH not run.")
     elif len(pmids_unread) > 0 and num_found > 0:
-        # Create the REACH configuration file
-        with open(REACH_CONF_FMT_FNAME, 'r') as fmt_file:
-            conf_file_path = os.path.join(tmp_dir, 'indra.conf')
-            with open(conf_file_path, 'w') as conf_file:
-                conf_file.write(
-                    fmt_file.read().format(tmp_dir=os.path.abspath(tmp_dir),
-                                           num_cores=num_cores,
-                                           loglevel='INFO')
-                    )
-
-        # Run REACH!
-        logger.info("Beginning reach.")
-        args = ['java', '-Xmx24000m', '-Dconfig.file=%s' % conf_file_path,
-                '-jar', path_to_reach]
-        p = subprocess.Popen(args, stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE)
-        if verbose:
-            for line in iter(p.stdout.readline, b''):
-                logger.info(line)
-        p_out, p_err = p.communicate()
-        if p.returncode:
-            logger.error('Problem running REACH:')
-            logger.error('Stdout: %s' % p_out.decode('utf-8'))
-            logger.error('Stderr: %s' % p_err.decode('utf-8'))
-            raise Exception('REACH crashed')
+        run_reach_cli(tmp_dir, path_to_reach, num_cores, verbose)
 
         # Process JSON files from local file system, process to INDRA
         # Statements and upload to S3
@@ -719,12 +883,381 @@ def run_reach(pmid_list, base_dir, num_cores, start_index, end_index,
     return stmts, pmids_unread
 
 
+#==============================================================================
+# PIPELINE -- the following stream content through fetching, reading, and
+# processing at the same time, rather than one phase after another.
+#==============================================================================
+
+
+_END = object()
+
+
+def _put_unless_stopped(q, item, stop):
+    """Put an item on a bounded queue, giving up if `stop` is set."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def iter_fetched_content(pmids, download_func, num_threads, rate=None,
+                         max_queued=100):
+    """Yield the results of downloading content as each download completes.
+
+    At most `max_queued` results are held waiting to be consumed. When that
+    many are waiting, the downloading threads block, so the disk and memory
+    used by content waiting to be read stay bounded.
+
+    Parameters
+    ----------
+    pmids : list[str]
+        The PMIDs whose content should be downloaded.
+    download_func : callable
+        A function, such as `download_from_s3`, which takes a PMID and a
+        `rate_limiter` keyword argument and returns a dict of results keyed
+        by the PMID.
+    num_threads : int
+        The number of concurrent downloads.
+    rate : Optional[float]
+        The maximum number of downloads to start per second.
+    max_queued : int
+        The maximum number of downloaded results waiting to be consumed.
+    """
+    pmid_q = queue.Queue()
+    for pmid in pmids:
+        pmid_q.put(pmid)
+    result_q = queue.Queue(maxsize=max_queued)
+    rate_limiter = TokenBucket(rate) if rate else None
+    stop = threading.Event()
+
+    def fetch_loop():
+        while not stop.is_set():
+            try:
+                pmid = pmid_q.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                res = download_func(pmid, rate_limiter=rate_limiter)
+            except Exception as e:
+                logger.error('Failed to get content for %s.' % pmid)
+                logger.exception(e)
+                res = {pmid: {'content_source': 'download_failure',
+                              'content_path': None}}
+            if not _put_unless_stopped(result_q, res, stop):
+                return
+        _put_unless_stopped(result_q, _END, stop)
+
+    threads = [threading.Thread(target=fetch_loop, daemon=True)
+               for _ in range(num_threads)]
+    for th in threads:
+        th.start()
+
+    num_finished = 0
+    try:
+        while num_finished < len(threads):
+            res = result_q.get()
+            if res is _END:
+                num_finished += 1
+                continue
+            yield res
+    finally:
+        stop.set()
+
+
+def iter_batches(result_iter, batch_size):
+    """Group the dicts from `result_iter` into dicts of `batch_size` PMIDs."""
+    batch = {}
+    for res in result_iter:
+        batch.update(res)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = {}
+    if batch:
+        yield batch
+
+
+def run_pipeline(pmids, download_func, read_func, process_func,
+                 fetch_threads, fetch_rate=None, batch_size=100,
+                 max_queued=None):
+    """Fetch, read, and process content in three concurrent stages.
+
+    Content is downloaded by a pool of threads onto a bounded queue. Batches
+    of `batch_size` PMIDs are taken from that queue and read in this thread,
+    and the output of each batch is passed on to a third thread to be
+    processed (and uploaded) while the next batch is read. At most one read
+    batch waits to be processed, so if processing falls behind, reading
+    waits, and in turn fetching waits, bounding disk and memory use.
+
+    Parameters
+    ----------
+    pmids : list[str]
+        The PMIDs to be read.
+    download_func : callable
+        Used to download content, as in `iter_fetched_content`.
+    read_func : callable
+        Given a batch, a dict of download results keyed by PMID, read the
+        content and return whatever `process_func` needs.
+    process_func : callable
+        Given the output of `read_func`, return a dict of statements keyed by
+        PMID.
+    fetch_threads : int
+        The number of concurrent downloads.
+    fetch_rate : Optional[float]
+        The maximum number of downloads to start per second.
+    batch_size : int
+        The number of PMIDs read at a time.
+    max_queued : Optional[int]
+        The maximum number of downloads waiting to be read. By default, this
+        is twice the batch size.
+
+    Returns
+    -------
+    stmts : dict
+        The statements produced, keyed by PMID.
+    pmid_info : dict
+        The results of downloading each PMID, keyed by PMID.
+    """
+    if max_queued is None:
+        max_queued = 2*batch_size
+    stmts = {}
+    pmid_info = {}
+    read_q = queue.Queue(maxsize=1)
+
+    def process_loop():
+        while True:
+            read_output = read_q.get()
+            if read_output is _END:
+                break
+            try:
+                stmts.update(process_func(read_output))
+            except Exception as e:
+                logger.error('Failed to process a batch of readings.')
+                logger.exception(e)
+
+    process_thread = threading.Thread(target=process_loop)
+    process_thread.start()
+    try:
+        fetched = iter_fetched_content(pmids, download_func, fetch_threads,
+                                       fetch_rate, max_queued)
+        for i, batch in enumerate(iter_batches(fetched, batch_size)):
+            pmid_info.update(batch)
+            logger.info('Reading batch %d with %d PMIDs.' % (i, len(batch)))
+            read_q.put(read_func(batch))
+    finally:
+        read_q.put(_END)
+        process_thread.join()
+    logger.info('Pipeline produced statements for %d / %d PMIDs.'
+                % (len(stmts), len(pmid_info)))
+    return stmts, pmid_info
+
+
+def _make_pipeline_dir(pmid_list, start_index, end_index, base_dir):
+    if end_index is None or end_index > len(pmid_list):
+        end_index = len(pmid_list)
+    pmids_in_range = pmid_list[start_index:end_index]
+    tmp_dir = tempfile.mkdtemp(prefix='read_pipeline_%s_to_%s_' %
+                               (start_index, end_index), dir=base_dir)
+    # Make the temp directory writeable by REACH
+    os.chmod(tmp_dir, stat.S_IRWXO | stat.S_IRWXU | stat.S_IRWXG)
+    staging_dir = os.path.join(tmp_dir, 'staging')
+    os.makedirs(staging_dir)
+    return pmids_in_range, tmp_dir, staging_dir
+
+
+def _split_batch(batch, reader_version):
+    """Split a batch into PMIDs to read and PMIDs already read on S3."""
+    to_read = {pmid: info for pmid, info in batch.items()
+               if info.get('reader_version') != reader_version}
+    cached = [pmid for pmid, info in batch.items()
+              if info.get('reader_version') == reader_version]
+    return to_read, cached
+
+
+def run_reach_pipeline(pmid_list, base_dir, num_cores, start_index,
+                       end_index, force_read, force_fulltext, cleanup=False,
+                       verbose=True, fetch_threads=None, fetch_rate=None,
+                       batch_size=100, max_queued=None):
+    """Run reach on a list of pmids, streaming through `run_pipeline`.
+
+    A single REACH server (see `ReachReader`'s `server_mode`) is started for
+    the whole run, so the JVM is started and the models are loaded only
+    once, however many batches there are. Each batch of content is sent to
+    the server while the next batch downloads, and the output of each batch
+    is uploaded and processed while the next batch is read.
+
+    PMIDs that REACH failed to read are returned among the unread PMIDs with
+    `reading_failed` set in their info, and their content is kept, so that
+    they may be retried.
+    """
+    path_to_reach, reach_version = get_reach_path_and_version()
+    if path_to_reach is None:
+        return {}, {}
+
+    mem_tot = get_mem_total()
+    if mem_tot is not None and mem_tot <= REACH_MEM + MEM_BUFFER:
+        logger.error("Too little memory to run reach. At least %s required."
+                     % (REACH_MEM + MEM_BUFFER))
+        return {}, {}
+
+    pmids_in_range, tmp_dir, staging_dir = \
+        _make_pipeline_dir(pmid_list, start_index, end_index, base_dir)
+    download_func = functools.partial(
+        download_from_s3,
+        input_dir=staging_dir,
+        reader='reach',
+        reader_version=reach_version,
+        force_read=force_read,
+        force_fulltext=force_fulltext
+        )
+
+    reader = ReachReader(base_dir=tmp_dir, n_proc=num_cores,
+                         server_mode=True)
+    failed_pmids = set()
+
+    def read_batch(batch):
+        to_read, cached = _split_batch(batch, reach_version)
+        to_read = {pmid: info for pmid, info in to_read.items()
+                   if info.get('content_path') is not None}
+        if not to_read:
+            return {}, to_read, cached
+
+        reader.reset()
+        contents = [Content.from_file(info['content_path'])
+                    for info in to_read.values()]
+        try:
+            reader.read(contents, verbose=verbose)
+            readings = {str(rd.content_id): rd.reading
+                        for rd in reader.results if rd.reading is not None}
+        except Exception as e:
+            logger.error('REACH failed on a batch of %d PMIDs.'
+                         % len(to_read))
+            logger.exception(e)
+            readings = {}
+
+        # Keep the content of anything that was not read, so it may be
+        # tried again.
+        for pmid, info in to_read.items():
+            if pmid not in readings:
+                info['reading_failed'] = True
+                failed_pmids.add(pmid)
+            elif cleanup and os.path.exists(info['content_path']):
+                os.remove(info['content_path'])
+        return readings, to_read, cached
+
+    def process_batch(read_output):
+        readings, to_read, cached = read_output
+        pmid_json_tuples = []
+        for pmid, reading in readings.items():
+            try:
+                s3_client.put_reader_output(
+                    'reach', reading, pmid, reach_version,
+                    to_read[pmid].get('content_source')
+                    )
+            except Exception as e:
+                logger.error("Caught an exception while trying to upload "
+                             "reach reading results onto s3 for %s." % pmid)
+                logger.exception(e)
+            pmid_json_tuples.append((pmid, reading))
+        stmts = {}
+        for res in process_pool.imap_unordered(upload_process_pmid,
+                                               pmid_json_tuples):
+            stmts.update(res)
+        for pmid in cached:
+            stmts.update(process_reach_from_s3(pmid))
+        return stmts
+
+    process_pool = mp.Pool(num_cores)
+    try:
+        with reader:
+            stmts, pmid_info = run_pipeline(
+                pmids_in_range, download_func, read_batch, process_batch,
+                fetch_threads or num_cores, fetch_rate, batch_size,
+                max_queued
+                )
+    finally:
+        process_pool.close()
+        process_pool.join()
+    if failed_pmids:
+        logger.warning('REACH failed to read %d PMIDs, which are returned as '
+                       'unread.' % len(failed_pmids))
+    elif cleanup:
+        shutil.rmtree(tmp_dir)
+    pmids_unread, _ = _split_batch(pmid_info, reach_version)
+    return stmts, pmids_unread
+
+
+def run_sparser_pipeline(pmid_list, tmp_dir, num_cores, start_index,
+                         end_index, force_read, force_fulltext, cleanup=True,
+                         verbose=True, fetch_threads=None, fetch_rate=None,
+                         batch_size=100, max_queued=None):
+    """Run sparser on a list of pmids, streaming through `run_pipeline`.
+
+    Unlike `run_reach_pipeline`, the new content is processed within the read
+    stage: the pmids in each batch are handed out one at a time, biggest
+    first, to `num_cores` processes, each of which reads a pmid with Sparser,
+    processes the output into statements, and uploads them, while the next
+    batch downloads. The processing stage only loads the statements of
+    content that was already read from S3, while the next batch is read.
+    """
+    reader_version = sparser.get_version()
+    pmids_in_range, base_dir, staging_dir = \
+        _make_pipeline_dir(pmid_list, start_index, end_index, tmp_dir)
+    download_func = functools.partial(
+        download_from_s3,
+        input_dir=staging_dir,
+        reader='sparser',
+        reader_version=reader_version,
+        force_read=force_read,
+        force_fulltext=force_fulltext
+        )
+    get_stmts_func = functools.partial(
+        get_stmts,
+        cleanup=cleanup,
+        sparser_version=reader_version
+        )
+
+    pool = mp.Pool(num_cores, initializer=_init_sparser_worker)
+    try:
+        def read_batch(batch):
+            to_read, cached = _split_batch(batch, reader_version)
+            tasks = sorted(to_read.items(), key=_get_content_size,
+                           reverse=True)
+            res = pool.imap_unordered(get_stmts_func,
+                                      ({pmid: info} for pmid, info in tasks))
+            stmts = {pmid: stmt_list for res_dict in res
+                     for pmid, stmt_list in res_dict.items()}
+            return stmts, cached
+
+        def process_batch(read_output):
+            stmts, cached = read_output
+            for pmid in cached:
+                stmts.update(get_stmts_from_cache(pmid))
+            return stmts
+
+        stmts, pmid_info = run_pipeline(
+            pmids_in_range, download_func, read_batch, process_batch,
+            fetch_threads or num_cores, fetch_rate, batch_size, max_queued
+            )
+    finally:
+        pool.close()
+        pool.join()
+    if cleanup:
+        shutil.rmtree(base_dir)
+    pmids_unread, _ = _split_batch(pmid_info, reader_version)
+    return stmts, pmids_unread
+
+
 #==============================================================================
 # MAIN -- the main script
 #==============================================================================
 
 
 READER_DICT = {'reach': run_reach, 'sparser': run_sparser}
+PIPELINE_READER_DICT = {'reach': run_reach_pipeline,
+                        'sparser': run_sparser_pipeline}
 
 
 def get_mem_total():
@@ -812,7 +1345,13 @@ def main():
 
         stmts = {}
         for reader in readers:
-            run_reader = READER_DICT[reader]
+            kwargs = {}
+            if args.pipeline:
+                run_reader = PIPELINE_READER_DICT[reader]
+                kwargs['batch_size'] = args.batch_size
+                kwargs['max_queued'] = args.max_queued
+            else:
+                run_reader = READER_DICT[reader]
             some_stmts, _ = run_reader(
                 pmid_list,
                 out_dir,
@@ -822,7 +1361,10 @@ def main():
                 args.force_read,
                 args.force_fulltext,
                 cleanup=args.cleanup,
-                verbose=args.verbose
+                verbose=args.verbose,
+                fetch_threads=args.fetch_threads,
+                fetch_rate=args.fetch_rate,
+                **kwargs
                 )
             stmts[reader] = some_stmts
 
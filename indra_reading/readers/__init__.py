@@ -1,12 +1,16 @@
 import logging
 
-from .core import Reader, ReadingError, ReadingData, get_reader, \
+from .core import Reader, ReadingError, ReadingData, statuses, get_reader, \
     get_reader_classes, get_reader_class
 
 from .util import get_dir
 
 from .content import Content
 
+from .cache import ReadingCache, MemoryReadingCache, DiskReadingCache
+
+from .policy import ExecutionPolicy, ReadingTimeout, QuarantinedError
+
 logger = logging.getLogger(__name__)
 
 err_msg = ("Could not load {reader} reader: \"{err}\". {reader} will not be "
@@ -0,0 +1,184 @@
+import os
+import json
+import zlib
+import hashlib
+import logging
+import threading
+from os import path
+from collections import OrderedDict
+
+from .util import get_dir
+
+logger = logging.getLogger(__name__)
+
+
+class ReadingCache(object):
+    """The interface for a cache of readings keyed by the content read.
+
+    Readings are keyed by the name and version of the reader and a hash of
+    the text that was read, so the same text will be found regardless of the
+    ID it was given. Entries are stored as zlib-compressed JSON.
+
+    Children must implement `_get_bytes` and `_put_bytes`, and may use
+    `max_bytes` to bound the size of the cache.
+
+    Parameters
+    ----------
+    max_bytes : int or None
+        The maximum total size of the compressed entries. When exceeded, the
+        least recently used entries are evicted. If None, the cache is
+        unbounded. Default is None.
+    """
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        return
+
+    def __repr__(self):
+        return '%s(hits=%d, misses=%d)' % (self.__class__.__name__,
+                                           self.hits, self.misses)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(reader_name, reader_version, text):
+        """Create the key for a reading of `text` by the given reader."""
+        if isinstance(text, str):
+            text = text.encode('utf-8')
+        text_hash = hashlib.sha256(text).hexdigest()
+        return '%s:%s:%s' % (reader_name.lower(), reader_version, text_hash)
+
+    def get(self, key):
+        """Get the reading for a key, or None if it is not in the cache."""
+        with self._lock:
+            raw = self._get_bytes(key)
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(zlib.decompress(raw).decode('utf-8'))
+
+    def put(self, key, reading):
+        """Add a reading to the cache under the given key."""
+        raw = zlib.compress(json.dumps(reading).encode('utf-8'))
+        with self._lock:
+            self._put_bytes(key, raw)
+        return
+
+    def _get_bytes(self, key):
+        raise NotImplementedError()
+
+    def _put_bytes(self, key, raw):
+        raise NotImplementedError()
+
+
+class MemoryReadingCache(ReadingCache):
+    """A reading cache held in memory, with least-recently-used eviction."""
+    def __init__(self, max_bytes=None):
+        super(MemoryReadingCache, self).__init__(max_bytes)
+        self._entries = OrderedDict()
+        self._num_bytes = 0
+        return
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get_bytes(self, key):
+        raw = self._entries.get(key)
+        if raw is not None:
+            self._entries.move_to_end(key)
+        return raw
+
+    def _put_bytes(self, key, raw):
+        if key in self._entries:
+            self._num_bytes -= len(self._entries.pop(key))
+        self._entries[key] = raw
+        self._num_bytes += len(raw)
+        while self.max_bytes is not None and self._num_bytes > self.max_bytes \
+                and len(self._entries) > 1:
+            _, old_raw = self._entries.popitem(last=False)
+            self._num_bytes -= len(old_raw)
+        return
+
+
+class DiskReadingCache(ReadingCache):
+    """A reading cache stored in a local directory.
+
+    Each entry is a file named by the hash of its key, so the cache persists
+    between runs. Files are touched when they are read, so eviction removes
+    the least recently used entries first.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory in which to store the cache.
+    max_bytes : int or None
+        The maximum total size of the cache files. If None, the cache is
+        unbounded. Default is None.
+    """
+    def __init__(self, cache_dir, max_bytes=None):
+        super(DiskReadingCache, self).__init__(max_bytes)
+        self.cache_dir = get_dir(cache_dir)
+        self._num_bytes = sum(path.getsize(path.join(self.cache_dir, fname))
+                              for fname in os.listdir(self.cache_dir))
+        return
+
+    def __len__(self):
+        return len(os.listdir(self.cache_dir))
+
+    def _get_path(self, key):
+        fname = hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json.z'
+        return path.join(self.cache_dir, fname)
+
+    def _get_bytes(self, key):
+        fpath = self._get_path(key)
+        if not path.exists(fpath):
+            return None
+        with open(fpath, 'rb') as f:
+            raw = f.read()
+        os.utime(fpath)
+        return raw
+
+    def _put_bytes(self, key, raw):
+        fpath = self._get_path(key)
+        if path.exists(fpath):
+            self._num_bytes -= path.getsize(fpath)
+
+        # Write to a temporary file and move it so that readers of the cache
+        # in other processes never see a partial entry.
+        tmp_path = '%s.%d.tmp' % (fpath, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+        os.replace(tmp_path, fpath)
+        self._num_bytes += len(raw)
+
+        if self.max_bytes is not None and self._num_bytes > self.max_bytes:
+            self._evict(keep=fpath)
+        return
+
+    def _evict(self, keep=None):
+        fpaths = [path.join(self.cache_dir, fname)
+                  for fname in os.listdir(self.cache_dir)]
+        fpaths.sort(key=path.getmtime)
+        for fpath in fpaths:
+            if self._num_bytes <= self.max_bytes:
+                break
+            if fpath == keep:
+                continue
+            try:
+                size = path.getsize(fpath)
+                os.remove(fpath)
+            except OSError:
+                continue
+            self._num_bytes -= size
+            logger.debug("Evicted %s from the reading cache." % fpath)
+        return
@@ -1,9 +1,48 @@
+import re
 import zlib
+import gzip
 import shutil
 
 from os import path
 
 
+_NON_ASCII_PATT = re.compile(r'[^\x00-\x7F]')
+_DIGIT_PATT = re.compile(r'[0-9]')
+
+
+def get_text_stats(text, sample_size=None):
+    """Get statistics used to judge whether a text is likely to read well.
+
+    Parameters
+    ----------
+    text : str
+        The text to examine.
+    sample_size : Optional[int]
+        If given, the ratios are computed over at most this many characters
+        from the start of the text.
+
+    Returns
+    -------
+    stats : dict
+        The `length` of the text, the `sample_length` over which ratios were
+        computed, and the `space_ratio`, `non_ascii_ratio`, and `digit_ratio`
+        of the sample. A high digit ratio generally indicates tables.
+    """
+    if sample_size is not None and len(text) > sample_size:
+        sample = text[:sample_size]
+    else:
+        sample = text
+    n = len(sample)
+    stats = {'length': len(text), 'sample_length': n, 'space_ratio': 0.0,
+             'non_ascii_ratio': 0.0, 'digit_ratio': 0.0}
+    if n:
+        stats['space_ratio'] = sample.count(' ')/n
+        if not sample.isascii():
+            stats['non_ascii_ratio'] = len(_NON_ASCII_PATT.findall(sample))/n
+        stats['digit_ratio'] = len(_DIGIT_PATT.findall(sample))/n
+    return stats
+
+
 class Content(object):
     """An object to regularize the content passed to the readers.
 
@@ -14,7 +53,17 @@ class Content(object):
     This class also regularizes the handling of id's and formats, as well as
     allowing for decompression and decoding, in the manner standard in the INDRA
     project.
+
+    Content from a file is loaded lazily: the text stays on disk until
+    `get_text` is called, and changing the id, format, or location only
+    changes the labels. `copy_to` copies (and if need be decompresses) a file
+    straight to its destination, releasing any text that was loaded, so that
+    many Content objects can be prepared for reading without holding all
+    their text in memory.
     """
+    # The size of the chunks in which compressed content is decompressed.
+    chunk_size = 2**16
+
     def __init__(self, id, format, compressed=False, encoded=False):
         self.file_exists = False
         self.compressed = compressed
@@ -25,6 +74,8 @@ class Content(object):
         self._fname = None
         self._location = None
         self._raw_content = None
+        self._source_path = None
+        self._stats = {}
         return
 
     def __repr__(self):
@@ -44,6 +95,7 @@ class Content(object):
         content = cls(file_id, file_format, compressed, encoded)
         content.file_exists = True
         content._location = path.dirname(file_path)
+        content._source_path = file_path
         return content
 
     @classmethod
@@ -54,15 +106,22 @@ class Content(object):
         content._raw_content = raw_content
         return content
 
-    def _load_raw_content(self):
-        if self.file_exists and self._raw_content is None:
-            with open(self.get_filepath(), 'r') as f:
-                self._raw_content = f.read()
-        return
+    def _load_text_from_file(self):
+        fpath = self._source_path
+        if self.compressed:
+            # Stream the decompression, so the compressed bytes are never
+            # held in memory.
+            with gzip.open(fpath, 'rb') as f:
+                ret_cont = f.read()
+            if self.encoded:
+                ret_cont = ret_cont.decode('utf-8')
+        else:
+            with open(fpath, 'r') as f:
+                ret_cont = f.read()
+        return ret_cont
 
     def change_id(self, new_id):
         """Change the id of this content."""
-        self._load_raw_content()
         self._id = new_id
         self.get_filename(renew=True)
         self.get_filepath(renew=True)
@@ -74,7 +133,6 @@ class Content(object):
         Note that this does NOT actually alter the format of the content, only
         the label.
         """
-        self._load_raw_content()
         self._format = new_format
         self.get_filename(renew=True)
         self.get_filepath(renew=True)
@@ -86,7 +144,6 @@ class Content(object):
         Note that this does NOT change the actual location of the file. To do
         so, use the `copy_to` method.
         """
-        self._load_raw_content()
         self._location = new_location
         self.get_filepath(renew=True)
         return
@@ -103,18 +160,55 @@ class Content(object):
 
     def get_text(self):
         """Get the loaded, decompressed, and decoded text of this content."""
-        self._load_raw_content()
         if self._text is None:
-            assert self._raw_content is not None
-            ret_cont = self._raw_content
-            if self.compressed:
-                ret_cont = zlib.decompress(ret_cont, zlib.MAX_WBITS+16)
-            if self.encoded:
-                ret_cont = ret_cont.decode('utf-8')
-            self._text = ret_cont
+            if self._raw_content is None:
+                assert self._source_path is not None
+                self._text = self._load_text_from_file()
+            else:
+                ret_cont = self._raw_content
+                if self.compressed:
+                    ret_cont = zlib.decompress(ret_cont, zlib.MAX_WBITS+16)
+                if self.encoded:
+                    ret_cont = ret_cont.decode('utf-8')
+                self._text = ret_cont
         assert self._text is not None
         return self._text
 
+    def get_length_bounds(self):
+        """Get bounds on the length of the text, loading it only if needed.
+
+        If the text is still in an uncompressed file, the bounds are derived
+        from the size of the file, as utf-8 uses 1 to 4 bytes per character.
+        Otherwise the exact length of the text is given for both bounds.
+
+        Returns
+        -------
+        min_length, max_length : int
+            The lower and upper bounds on the number of characters.
+        """
+        if self._text is None and self._raw_content is None \
+                and self._source_path is not None and not self.compressed:
+            size = path.getsize(self._source_path)
+            return -(-size // 4), size
+        length = len(self.get_text())
+        return length, length
+
+    def get_stats(self, sample_size=None):
+        """Get statistics on the text, computed only once per sample size.
+
+        See `get_text_stats` for details.
+        """
+        if sample_size not in self._stats:
+            self._stats[sample_size] = get_text_stats(self.get_text(),
+                                                      sample_size)
+        return self._stats[sample_size]
+
+    def release_text(self):
+        """Release the loaded text, if it can be reloaded from a file."""
+        if self._source_path is not None:
+            self._text = None
+        return
+
     def get_filename(self, renew=False):
         """Get the filename of this content.
 
@@ -133,16 +227,47 @@ class Content(object):
 
         If no location is given, it is assumed to be "here", e.g. ".".
         """
-        if self._location is None or renew:
+        if self._location is None:
             self._location = '.'
         return path.join(self._location, self.get_filename())
 
+    def _write_raw_content(self, fpath):
+        """Write the raw content to a file, decompressing as we go."""
+        raw = self._raw_content
+        if not self.compressed:
+            mode = 'w' if isinstance(raw, str) else 'wb'
+            with open(fpath, mode) as f:
+                f.write(raw)
+            return
+
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS+16)
+        with open(fpath, 'wb') as f:
+            for i in range(0, len(raw), self.chunk_size):
+                f.write(decompressor.decompress(raw[i:i+self.chunk_size]))
+            f.write(decompressor.flush())
+        return
+
     def copy_to(self, location, fname=None):
+        """Copy this content to a file in `location`, returning the new path.
+
+        If the content came from a file, the file is copied (decompressing it
+        on the way if needed) without loading it, and any text that had been
+        loaded is released; it will be reloaded from the original file if it
+        is needed again.
+        """
         if fname is None:
             fname = self.get_filename()
         fpath = path.join(location, fname)
-        if self.file_exists and not self._raw_content:
-            shutil.copy(self.get_filepath(), fpath)
+        if self._source_path is not None:
+            if self.compressed:
+                with gzip.open(self._source_path, 'rb') as f_in, \
+                        open(fpath, 'wb') as f_out:
+                    shutil.copyfileobj(f_in, f_out, self.chunk_size)
+            else:
+                shutil.copy(self._source_path, fpath)
+            self.release_text()
+        elif self._text is None and self._raw_content is not None:
+            self._write_raw_content(fpath)
         else:
             with open(fpath, 'w') as f:
                 f.write(self.get_text())
@@ -1,9 +1,14 @@
+import gzip
 import json
 import logging
 import tempfile
 from datetime import datetime
+from collections import Counter
+from multiprocessing import Pool
 
 from .util import get_dir, get_time_stamp, formats
+from .content import Content, get_text_stats
+from .policy import ExecutionPolicy
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +17,14 @@ CONTENT_CHARACTER_LIMIT = 5e5
 CONTENT_MAX_SPACE_RATIO = 0.5
 
 
+class statuses:
+    """The possible statuses of each content ID given to a reader."""
+    READ = 'read'
+    NULL = 'null'
+    SKIPPED = 'skipped'
+    FAILED = 'failed'
+
+
 class ReadingData(object):
     """Object to contain the data produced by a reading.
 
@@ -69,20 +82,23 @@ class ReadingData(object):
                 stmts = []
             else:
                 stmts = processor.statements
-
-            # Add some metadata to the annotations
-            if add_metadata:
-                meta_info = {'READER': self.reader_class.name.upper(),
-                             'CONTENT_ID': self.content_id}
-                self._results = []
-                for stmt in stmts:
-                    stmt.evidence[0].text_refs.update(meta_info)
-                    self._results.append(stmt)
-            else:
-                self._results = stmts[:]
+            self._set_results(stmts, add_metadata)
 
         return self._results[:]
 
+    def _set_results(self, stmts, add_metadata=False):
+        # Add some metadata to the annotations
+        if add_metadata:
+            meta_info = {'READER': self.reader_class.name.upper(),
+                         'CONTENT_ID': self.content_id}
+            self._results = []
+            for stmt in stmts:
+                stmt.evidence[0].text_refs.update(meta_info)
+                self._results.append(stmt)
+        else:
+            self._results = stmts[:]
+        return
+
     def to_json(self):
         return {'content_id': self.content_id,
                 'reader_name': self.reader_class.name,
@@ -103,15 +119,47 @@ class ReadingData(object):
 
 
 class Reader(object):
-    """This abstract object defines and some general methods for readers."""
+    """This abstract object defines and some general methods for readers.
+
+    Parameters
+    ----------
+    base_dir : Optional[str]
+        The directory in which the reader's temporary files are made.
+    n_proc : int
+        The number of processes the reader may use. Default is 1.
+    check_content : bool
+        If True (default), skip content that is unlikely to be read well.
+    input_character_limit : int
+        The maximum length of content that will be read.
+    max_space_ratio : float
+        The maximum fraction of the content characters that may be spaces.
+    max_non_ascii_ratio : Optional[float]
+        If given, the maximum fraction of the content characters that may be
+        non-ASCII.
+    max_digit_ratio : Optional[float]
+        If given, the maximum fraction of the content characters that may be
+        digits, which are usually a sign of tables of data.
+    ResultClass : type
+        The class used to store each result. Default is `ReadingData`.
+    cache : Optional[indra_reading.readers.cache.ReadingCache]
+        If given, content whose text has already been read by this version of
+        this reader is served from the cache instead of being read, and new
+        readings are added to it.
+    policy : Optional[indra_reading.readers.policy.ExecutionPolicy]
+        The deadlines, retries, and quarantine applied to each document, by
+        readers that read documents one at a time. By default, each document
+        is given `default_timeout` seconds and is not retried.
+    """
     name = NotImplemented
     result_format = formats.JSON
     results_type = 'statements'
+    default_timeout = 60
 
     def __init__(self, base_dir=None, n_proc=1, check_content=True,
                  input_character_limit=CONTENT_CHARACTER_LIMIT,
                  max_space_ratio=CONTENT_MAX_SPACE_RATIO,
-                 ResultClass=ReadingData):
+                 max_non_ascii_ratio=None, max_digit_ratio=None,
+                 ResultClass=ReadingData, cache=None, policy=None):
         if base_dir is None:
             base_dir = self.name.lower() + '_run'
         self.n_proc = n_proc
@@ -126,9 +174,19 @@ class Reader(object):
         self.do_content_check = check_content
         self.input_character_limit = input_character_limit
         self.max_space_ratio = max_space_ratio
+        self.max_non_ascii_ratio = max_non_ascii_ratio
+        self.max_digit_ratio = max_digit_ratio
         self.results = []
+        self.result_status = {}
+        self.summary = None
+        self._result_index = {}
         self.ResultClass = ResultClass
         self.content_ids_read = []
+        self.cache = cache
+        self._cache_keys = {}
+        if policy is None:
+            policy = ExecutionPolicy(timeout=self.default_timeout)
+        self.policy = policy
         return
 
     def __repr__(self):
@@ -138,14 +196,18 @@ class Reader(object):
     def reset(self):
         """Reset the attributes of the reader to start another reading."""
         self.results = []
+        self.result_status = {}
+        self.summary = None
+        self._result_index = {}
         self.id_maps = {}
         self.content_ids_read = []
+        self._cache_keys = {}
         return
 
     def _map_id(self, content_id):
         if not isinstance(content_id, int) and content_id.isdecimal():
             content_id = int(content_id)
-        elif content_id in self.id_maps.keys():
+        elif content_id in self.id_maps:
             content_id = self.id_maps[content_id]
         return content_id
 
@@ -159,19 +221,86 @@ class Reader(object):
         result_object = self.ResultClass(content_id, self.__class__,
                                          self.get_version(),
                                          self.result_format, content, **kwargs)
+        self._result_index[content_id] = len(self.results)
         self.results.append(result_object)
+
+        # Record the status, unless a reason for a null result is known.
+        if content is not None:
+            self.result_status[content_id] = statuses.READ
+        elif self.result_status.get(content_id) not in (statuses.SKIPPED,
+                                                        statuses.FAILED):
+            self.result_status[content_id] = statuses.NULL
+        return
+
+    def set_status(self, content_id, status):
+        """Record the status of a content ID, e.g. `statuses.FAILED`."""
+        self.result_status[self._map_id(content_id)] = status
         return
 
-    def _check_content(self, content_str):
-        """Check if the content is likely to be successfully read."""
-        if self.do_content_check:
-            space_ratio = float(content_str.count(' '))/len(content_str)
-            if space_ratio > self.max_space_ratio:
-                return "space-ratio: %f > %f" % (space_ratio,
-                                                 self.max_space_ratio)
-            if len(content_str) > self.input_character_limit:
-                return "too long: %d > %d" % (len(content_str),
-                                              self.input_character_limit)
+    def get_result(self, content_id):
+        """Get the ReadingData for a content ID, or None if there is none."""
+        idx = self._result_index.get(self._map_id(content_id))
+        if idx is None:
+            return None
+        return self.results[idx]
+
+    def _check_content(self, content):
+        """Check if the content is likely to be successfully read.
+
+        The length is checked first, from the size of the file if possible,
+        so content that is too long is rejected before any other work is
+        done on it. The other statistics are computed in one pass and
+        recorded on the Content object, so they are only computed once.
+
+        Parameters
+        ----------
+        content : Content or str
+            The content to check. A raw string is also accepted.
+
+        Returns
+        -------
+        quality_issue : str or None
+            A description of the problem with the content, if any.
+        """
+        quality_issue = self._get_quality_issue(content)
+        if quality_issue is not None and isinstance(content, Content):
+            self.set_status(content.get_id(), statuses.SKIPPED)
+        return quality_issue
+
+    def _get_quality_issue(self, content):
+        if not self.do_content_check:
+            return None
+
+        if isinstance(content, Content):
+            min_len, _ = content.get_length_bounds()
+        else:
+            min_len = len(content)
+        if min_len > self.input_character_limit:
+            return "too long: %d > %d" % (min_len, self.input_character_limit)
+
+        # The ratios need not be computed beyond the character limit.
+        sample_size = int(self.input_character_limit) + 1
+        if isinstance(content, Content):
+            stats = content.get_stats(sample_size)
+        else:
+            stats = get_text_stats(content, sample_size)
+        if stats['length'] > self.input_character_limit:
+            return "too long: %d > %d" % (stats['length'],
+                                          self.input_character_limit)
+        if not stats['length']:
+            return "empty"
+
+        if stats['space_ratio'] > self.max_space_ratio:
+            return "space-ratio: %f > %f" % (stats['space_ratio'],
+                                             self.max_space_ratio)
+        if self.max_non_ascii_ratio is not None \
+                and stats['non_ascii_ratio'] > self.max_non_ascii_ratio:
+            return "non-ascii-ratio: %f > %f" % (stats['non_ascii_ratio'],
+                                                 self.max_non_ascii_ratio)
+        if self.max_digit_ratio is not None \
+                and stats['digit_ratio'] > self.max_digit_ratio:
+            return "digit-ratio: %f > %f" % (stats['digit_ratio'],
+                                             self.max_digit_ratio)
         return None
 
     @classmethod
@@ -187,35 +316,97 @@ class Reader(object):
             self.content_ids_read.append(content.get_id())
             yield content
 
+    def _iter_uncached_content(self, content_iter):
+        """Add cached readings to the results, yielding only the rest.
+
+        Content is checked before its text is hashed, so that content which
+        would be skipped anyway, e.g. for being too long, is never loaded.
+        """
+        version = self.get_version()
+        for content in content_iter:
+            quality_issue = self._check_content(content)
+            if quality_issue is not None:
+                logger.warning("Skipping %s due to: %s"
+                               % (content.get_id(), quality_issue))
+                continue
+            key = self.cache.make_key(self.name, version, content.get_text())
+            reading = self.cache.get(key)
+            if reading is not None:
+                self.add_result(content.get_id(), reading)
+                continue
+            self._cache_keys[self._map_id(content.get_id())] = key
+            yield content
+
+    def _update_cache(self):
+        """Add the new, non-null readings to the cache."""
+        for rd in self.results:
+            key = self._cache_keys.pop(rd.content_id, None)
+            if key is not None and rd.reading is not None:
+                self.cache.put(key, rd.reading)
+        self._cache_keys = {}
+        return
+
     def read(self, read_list, verbose=False, log=False):
-        """Read a list of items and return a dict of output files."""
+        """Read a list of items and return a dict of output files.
+
+        After reading, a null result is added for any content that did not
+        produce one, the status of each content ID is recorded in
+        `result_status` (see `statuses`), and a summary of the reading is
+        stored in `summary`.
+        """
         # Place a timer on the whole reading process.
         start = datetime.now()
-        ret = self._read(self._iter_content(read_list), verbose, log)
+        content_iter = self._iter_content(read_list)
+        if self.cache is None:
+            self._read(content_iter, verbose, log)
+        else:
+            self._read(self._iter_uncached_content(content_iter), verbose,
+                       log)
+            self._update_cache()
         end = datetime.now()
 
-        # Count the number of not-null readings, and fill in any missing.
-        # NOTE: result_dict should be empty after this operation.
-        result_dict = {rd.content_id: rd for rd in self.results}
-        null_results = 0
+        self.summary = self._reconcile_results()
+        self.summary['duration'] = (end - start).total_seconds()
+
+        # Make a report of the results.
+        logger.info("%s took %s to read %s content and produce %s results, "
+                    "with %d of those being null. Statuses: %s"
+                    % (self.name, end - start, self.summary['num_input'],
+                       self.summary['num_results'],
+                       self.summary['num_results']
+                       - self.summary['statuses'].get(statuses.READ, 0),
+                       self.summary['statuses']))
+        return self.results
+
+    def _reconcile_results(self):
+        """Fill in null results for any input without a result.
+
+        Returns
+        -------
+        summary : dict
+            The number of inputs and results, a count of each status among
+            the inputs, and any IDs that have results but were not among the
+            inputs.
+        """
+        input_ids = set()
         for content_id in self.content_ids_read:
             content_id = self._map_id(content_id)
-            if content_id not in result_dict.keys():
+            input_ids.add(content_id)
+            if content_id not in self._result_index:
                 self.add_result(content_id, None)
-                null_results += 1
-            elif result_dict.pop(content_id).reading is None:
-                null_results += 1
 
-        if result_dict:
-            logger.warning("The following IDs are in results but not in the "
-                           "input: %s" % result_dict.keys())
+        unexpected_ids = [cid for cid in self._result_index.keys()
+                          if cid not in input_ids]
+        if unexpected_ids:
+            logger.warning("%d IDs are in results but not in the input, "
+                           "e.g.: %s" % (len(unexpected_ids),
+                                         unexpected_ids[:10]))
 
-        # Make a report of the results.
-        logger.info("%s took %s to read %s content and produce %s results, "
-                    "with %d of those being null."
-                    % (self.name, end - start, len(self.content_ids_read),
-                       len(self.results), null_results))
-        return ret
+        status_counts = Counter(self.result_status[cid] for cid in input_ids)
+        return {'reader': self.name, 'num_input': len(input_ids),
+                'num_results': len(self.results),
+                'statuses': dict(status_counts),
+                'unexpected_ids': unexpected_ids}
 
     def _read(self, content_iter, verbose=False, log=False):
         """Here is where the child defines the details of how it reads."""
@@ -261,6 +452,85 @@ def get_reader(reader_name, *args, **kwargs):
     return get_reader_class(reader_name)(*args, **kwargs)
 
 
+def _get_result_jsons(reader_name_and_reading):
+    """Produce the JSON results of a single reading, for use in a pool."""
+    # Make sure all the readers are registered, even in a spawned process.
+    from indra_reading.readers import get_reader_class
+
+    reader_name, reading = reader_name_and_reading
+    if reading is None:
+        return []
+
+    reader_class = get_reader_class(reader_name)
+    try:
+        # MTI's mesh terms are already simple and picklable.
+        if reader_class.results_type == 'mesh_terms':
+            return reader_class.parse_results(reading)
+        processor = reader_class.parse_results(reading)
+    except Exception as e:
+        logger.exception(e)
+        return None
+    if processor is None:
+        return None
+    return [stmt.to_json() for stmt in processor.statements]
+
+
+def get_results_parallel(readings, n_proc=1, add_metadata=False,
+                         chunksize=None):
+    """Get the results of many readings, using a pool of processes.
+
+    Only the name of the reader and the raw reading are sent to each worker,
+    and only the JSON of the statements is sent back, so the (often large)
+    processor objects never need to be pickled. The statements are stored on
+    each ReadingData object as if `get_results` had been called.
+
+    Parameters
+    ----------
+    readings : list [ReadingData]
+        The readings to process.
+    n_proc : int
+        The number of processes to use. If 1, the results are produced in
+        this process. Default is 1.
+    add_metadata : bool
+        If True, add the reader and content ID to the evidence annotations,
+        as in `ReadingData.get_results`.
+    chunksize : Optional[int]
+        The number of readings sent to a worker at a time. By default the
+        readings are divided into about four chunks per process.
+
+    Returns
+    -------
+    results : list [tuple(content_id, list)]
+        The content ID of each reading paired with its results, in the same
+        order as `readings`.
+    """
+    from indra.statements import stmts_from_json
+
+    readings = list(readings)
+    args = [(rd.reader_class.name, rd.reading) for rd in readings]
+    if n_proc > 1 and len(readings) > 1:
+        if chunksize is None:
+            chunksize = max(1, len(readings) // (4 * n_proc))
+        with Pool(n_proc) as pool:
+            json_results = pool.map(_get_result_jsons, args, chunksize)
+    else:
+        json_results = map(_get_result_jsons, args)
+
+    results = []
+    for rd, res_json in zip(readings, json_results):
+        if rd.reader_class.results_type == 'mesh_terms':
+            results.append((rd.content_id, res_json))
+            continue
+
+        if res_json is None:
+            logger.error("Production of statements from %s failed for %s."
+                         % (rd.reader_class.name, rd.content_id))
+            res_json = []
+        rd._set_results(stmts_from_json(res_json), add_metadata)
+        results.append((rd.content_id, rd.get_results()))
+    return results
+
+
 def dump_readings(readings, filepath):
     """Dump a list of ReadingData objects to a file as JSON."""
     json_list = []
@@ -278,3 +548,90 @@ def load_readings(filepath):
     with open(filepath, 'r') as f:
         json_list = json.load(f)
     return [ReadingData.from_json(jd) for jd in json_list]
+
+
+def _open_reading_stream(filepath, mode, compressed=None):
+    if compressed is None:
+        compressed = filepath.endswith('.gz')
+    if compressed:
+        return gzip.open(filepath, mode + 't', encoding='utf-8')
+    return open(filepath, mode, encoding='utf-8')
+
+
+class ReadingStreamWriter(object):
+    """Write ReadingData objects to a line-delimited JSON file as they come.
+
+    Each reading is serialized with `ReadingData.to_json` and written as a
+    single line, so readings never need to be held together in memory. The
+    object may be used as a context manager.
+
+    Parameters
+    ----------
+    filepath : str
+        The path to the file to write. If the path ends with '.gz', the file
+        will be gzip-compressed unless `compressed` is given explicitly.
+    append : bool
+        If True, add readings to the end of an existing file. Default False.
+    compressed : bool or None
+        Whether to gzip the output. By default this is inferred from the
+        file extension.
+    """
+    def __init__(self, filepath, append=False, compressed=None):
+        self.filepath = filepath
+        self.num_written = 0
+        self._file = _open_reading_stream(filepath, 'a' if append else 'w',
+                                          compressed)
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, reading):
+        """Write a single ReadingData object to the file."""
+        self._file.write(json.dumps(reading.to_json()) + '\n')
+        self.num_written += 1
+        return
+
+    def write_all(self, readings):
+        """Write every ReadingData object from an iterable to the file."""
+        for rd in readings:
+            self.write(rd)
+        return
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        return
+
+
+def dump_readings_stream(readings, filepath, append=False, compressed=None):
+    """Dump an iterable of ReadingData objects to a line-delimited JSON file.
+
+    Unlike `dump_readings`, the readings are consumed one at a time, so a
+    generator may be passed without building the full list in memory.
+
+    Returns
+    -------
+    num_written : int
+        The number of readings written to the file.
+    """
+    with ReadingStreamWriter(filepath, append, compressed) as writer:
+        writer.write_all(readings)
+    return writer.num_written
+
+
+def iter_readings(filepath, compressed=None):
+    """Lazily yield ReadingData objects from a line-delimited JSON file.
+
+    This is the counterpart of `ReadingStreamWriter` and
+    `dump_readings_stream`.
+    """
+    with _open_reading_stream(filepath, 'r', compressed) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            yield ReadingData.from_json(json.loads(line))
@@ -2,24 +2,62 @@ import re
 import glob
 import json
 import logging
+import threading
 from os import path, remove, listdir
+from functools import partial
 from indra.sources import eidos
 from indra.config import get_config
 from indra.literature.pmc_client import extract_text
 from indra.sources.eidos.cli import extract_from_directory
-from indra_reading.readers.core import Reader
+from indra_reading.readers.core import Reader, statuses
 from indra_reading.readers.util import get_dir
-from indra_reading.readers.content import Content
+from indra_reading.readers.preprocess import ContentConverter
 
 
 logger = logging.getLogger(__name__)
 
 
+def _extract_text(nxml_str, text_normalizer=None):
+    txt = extract_text(nxml_str)
+    if text_normalizer is not None:
+        txt = text_normalizer(txt)
+    return txt
+
+
 class EidosReader(Reader):
+    """A wrapper around the Eidos reader.
+
+    Parameters
+    ----------
+    text_normalizer : Optional[indra_reading.readers.normalize.TextNormalizer]
+        If given, it is applied to the text extracted from NXML content
+        before that text is read.
+    persistent : bool
+        If True, Eidos is loaded into this process through pyjnius the first
+        time it is needed, and kept loaded for every later reading, by any
+        EidosReader in the process. Texts are then read from memory, and the
+        results added directly, with no files written or read. If False
+        (default), the Eidos command line tool is run on a directory of
+        files for each reading.
+    preprocess_cache : Optional[indra_reading.readers.cache.ReadingCache]
+        If given, the text extracted from NXML content is cached here, keyed
+        by a hash of the NXML.
+
+    NXML content is converted to text by `n_proc` processes, and each text is
+    written for Eidos as soon as it is ready.
+    """
     name = 'EIDOS'
 
-    def __init__(self, *args, **kwargs):
+    # The Eidos engine loaded into this process, if any.
+    _engine = None
+    _engine_lock = threading.Lock()
+
+    def __init__(self, *args, text_normalizer=None, persistent=False,
+                 preprocess_cache=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.preprocess_cache = preprocess_cache
+        self.text_normalizer = text_normalizer
+        self.persistent = persistent
         self.num_input = 0
         self.input_dir = get_dir(self.tmp_dir, 'input')
         self.output_dir = get_dir(self.tmp_dir, 'output')
@@ -29,21 +67,31 @@ class EidosReader(Reader):
         jar_name = path.basename(get_config('EIDOSPATH'))
         return re.match(r'eidos-assembly-(.+).jar', jar_name).groups()[0]
 
-    def prep_input(self, content_iter):
-        logger.info('Prepping input.')
-        for content in content_iter:
-            # If it's an NXML, we get the raw text and save it as new content
-            if content.is_format('nxml'):
-                txt = extract_text(content.get_text())
-                content = \
-                    Content.from_string(str(content.get_id()),
-                                        'txt', txt)
-            quality_issue = self._check_content(content.get_text())
+    def _iter_text_content(self, content_iter):
+        """Yield the content to read as text, converting NXML in parallel."""
+        # If it's an NXML, we get the raw text and save it as new content
+        name = 'extract_text'
+        if self.text_normalizer is not None:
+            name += '+%r' % self.text_normalizer
+        converter = ContentConverter(
+            partial(_extract_text, text_normalizer=self.text_normalizer),
+            'nxml', 'txt', n_proc=self.n_proc, cache=self.preprocess_cache,
+            name=name
+        )
+        for content_id, content in converter.iter_convert(content_iter):
+            if content is None:
+                self.set_status(content_id, statuses.FAILED)
+                continue
+            quality_issue = self._check_content(content)
             if quality_issue is not None:
                 logger.warning('Skipping %s due to: %s'
                                % (content.get_id(), quality_issue))
                 continue
+            yield content
 
+    def prep_input(self, content_iter):
+        logger.info('Prepping input.')
+        for content in self._iter_text_content(content_iter):
             new_fpath = content.copy_to(self.input_dir)
             self.num_input += 1
             logger.debug('%s saved for reading by Eidos.' % new_fpath)
@@ -70,11 +118,45 @@ class EidosReader(Reader):
                 try:
                     content = json.load(fh)
                 except json.JSONDecodeError:
+                    self.set_status(content_id, statuses.FAILED)
                     content = None
             self.add_result(content_id, content)
         return self.results
 
+    @classmethod
+    def get_engine(cls):
+        """Get the Eidos engine of this process, loading it if need be."""
+        with cls._engine_lock:
+            if cls._engine is None:
+                logger.info('Loading Eidos into this process.')
+                from indra.sources.eidos.reader import EidosReader \
+                    as EidosEngine
+                engine = EidosEngine()
+                engine.initialize_reader()
+                cls._engine = engine
+        return cls._engine
+
+    def _read_persistent(self, content_iter):
+        """Read each text in memory with the persistent Eidos engine."""
+        engine = None
+        for content in self._iter_text_content(content_iter):
+            if engine is None:
+                engine = self.get_engine()
+            content_id = content.get_id()
+            try:
+                with self._engine_lock:
+                    reading = engine.process_text(content.get_text())
+            except Exception as e:
+                logger.error('Eidos failed to read %s: %s' % (content_id, e))
+                self.set_status(content_id, statuses.FAILED)
+                continue
+            self.add_result(content_id, reading)
+        return self.results
+
     def _read(self, content_iter, verbose=False, log=False):
+        if self.persistent:
+            return self._read_persistent(content_iter)
+
         ret = []
         self.prep_input(content_iter)
 
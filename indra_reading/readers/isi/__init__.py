@@ -1,9 +1,12 @@
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
-from indra_reading.readers.core import Reader
+from indra_reading.readers.core import Reader, statuses
 from indra_reading.readers.util import get_dir
+from indra_reading.readers.preprocess import ContentConverter
 
+from indra.literature.pmc_client import extract_text
 from indra.sources.isi.api import run_isi, get_isi_version
 from indra.sources.isi.processor import IsiProcessor
 from indra.sources.isi.preprocessor import IsiPreprocessor
@@ -15,13 +18,50 @@ logger = logging.getLogger(__name__)
 molecular_complexes_only = True
 
 
+class _IsiShard(object):
+    """The directories and preprocessor of one shard of an ISI reading."""
+    def __init__(self, base_dir, index):
+        self.index = index
+        shard_dir = get_dir(base_dir, 'shard_%d' % index)
+        self.input_dir = get_dir(shard_dir, 'input')
+        self.nxml_dir = get_dir(shard_dir, 'nxmls')
+        self.temp_dir = get_dir(shard_dir, 'temp')
+        self.output_dir = get_dir(shard_dir, 'output')
+        self.pp = IsiPreprocessor(self.input_dir)
+        self.content_ids = []
+        return
+
+
 class IsiReader(Reader):
-    """Wrapper for the ISI reader."""
+    """Wrapper for the ISI reader.
+
+    Parameters
+    ----------
+    nxml_to_text : bool
+        If True, NXML content is converted to text with
+        `indra.literature.pmc_client.extract_text`, by `n_proc` processes,
+        rather than by the ISI preprocessor one document at a time. Default
+        is False.
+    preprocess_cache : Optional[indra_reading.readers.cache.ReadingCache]
+        If given along with `nxml_to_text`, the text extracted from NXML
+        content is cached here, keyed by a hash of the NXML.
+    shard_size : Optional[int]
+        If given, the content is split into shards of this many documents,
+        each run by a separate instance of ISI in its own directories, up to
+        `n_proc` at a time. Each shard is started as soon as it is
+        preprocessed, and its outputs are added as soon as it is done, so a
+        slow shard does not hold up the others. If None (default), all the
+        content is run by one instance of ISI with `n_proc` processes.
+    """
 
     name = 'ISI'
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, nxml_to_text=False, preprocess_cache=None,
+                 shard_size=None, **kwargs):
         super(IsiReader, self).__init__(*args, **kwargs)
+        self.nxml_to_text = nxml_to_text
+        self.shard_size = shard_size
+        self.preprocess_cache = preprocess_cache
 
         # Define some extra directories
         self.nxml_dir = get_dir(self.tmp_dir, 'nxmls')
@@ -30,34 +70,62 @@ class IsiReader(Reader):
 
         return
 
+    def _iter_converted(self, content_iter):
+        converter = ContentConverter(extract_text, 'nxml', 'txt',
+                                     n_proc=self.n_proc,
+                                     cache=self.preprocess_cache)
+        for content_id, content in converter.iter_convert(content_iter):
+            if content is None:
+                self.set_status(content_id, statuses.FAILED)
+                continue
+            yield content
+
+    def _preprocess(self, pp, content, nxml_dir):
+        """Preprocess a content, returning whether it will be read."""
+        # Check the quality of the text, and skip if there are any issues.
+        quality_issue = self._check_content(content)
+        if quality_issue is not None:
+            logger.warning("Skipping %s due to: %s"
+                           % (content.get_id(), quality_issue))
+            return False
+
+        # Preprocess the content
+        if content.is_format('nxml'):
+            content.copy_to(nxml_dir)
+            pp.preprocess_nxml_file(content.get_filepath(),
+                                    content.get_id(), {})
+        elif content.is_format('txt', 'text'):
+            pp.preprocess_plain_text_string(content.get_text(),
+                                            content.get_id(), {})
+        else:
+            logger.error("Invalid/unrecognized format: %s"
+                         % content.get_format())
+            return False
+        return True
+
+    def _add_outputs(self, pp, output_dir):
+        """Add the outputs of ISI to the results."""
+        for fname, cid, extra_annots in pp.iter_outputs(output_dir):
+            with open(fname, 'r') as f:
+                content = json.load(f)
+            self.add_result(cid, content)
+        return
+
     def _read(self, content_iter, verbose=False, log=False, n_per_proc=None):
+        if self.nxml_to_text:
+            content_iter = self._iter_converted(content_iter)
+
+        if self.shard_size:
+            return self._read_sharded(content_iter, verbose, log)
+
         # Create a preprocessor
         pp = IsiPreprocessor(self.input_dir)
 
         # Preprocess all the content.
         num_content = 0
         for content in content_iter:
-
-            # Check the quality of the text, and skip if there are any issues.
-            quality_issue = self._check_content(content.get_text())
-            if quality_issue is not None:
-                logger.warning("Skipping %s due to: %s"
-                               % (content.get_id(), quality_issue))
-                continue
-
-            # Preprocess the content
-            if content.is_format('nxml'):
-                content.copy_to(self.nxml_dir)
-                pp.preprocess_nxml_file(content.get_filepath(),
-                                        content.get_id(), {})
-            elif content.is_format('txt', 'text'):
-                pp.preprocess_plain_text_string(content.get_text(),
-                                                content.get_id(), {})
-            else:
-                logger.error("Invalid/unrecognized format: %s"
-                             % content.get_format())
-                continue
-            num_content += 1
+            if self._preprocess(pp, content, self.nxml_dir):
+                num_content += 1
 
         # Make sure we actually have something to read before running.
         if not num_content:
@@ -68,13 +136,68 @@ class IsiReader(Reader):
                 self.n_proc, verbose=verbose, log=log)
 
         # Process the outputs
-        for fname, cid, extra_annots in pp.iter_outputs(self.output_dir):
-            with open(fname, 'r') as f:
-                content = json.load(f)
-            self.add_result(cid, content)
+        self._add_outputs(pp, self.output_dir)
+
+        return self.results
+
+    def _add_done_shards(self, pending, wait_for_all=False):
+        """Add the outputs of any finished shards, removing them from
+        `pending`, a dict of futures to shards. If `wait_for_all`, wait for
+        every shard, adding each as it finishes."""
+        if wait_for_all:
+            done = as_completed(list(pending.keys()))
+        else:
+            done, _ = wait(list(pending.keys()), timeout=0)
+        for future in done:
+            shard = pending.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                logger.exception(e)
+                logger.error("ISI failed on shard %d." % shard.index)
+                for content_id in shard.content_ids:
+                    self.set_status(content_id, statuses.FAILED)
+                continue
+            logger.info("ISI finished shard %d of %d contents."
+                        % (shard.index, len(shard.content_ids)))
+            self._add_outputs(shard.pp, shard.output_dir)
+        return
 
+    def _read_sharded(self, content_iter, verbose, log):
+        """Read the content in shards, by concurrent runs of ISI.
+
+        Each shard is handed to ISI as soon as it is preprocessed, while the
+        next shard is being prepared, and its outputs are added as soon as
+        it is done.
+        """
+        pending = {}
+        shard = None
+        num_shards = 0
+        with ThreadPoolExecutor(max_workers=self.n_proc) as executor:
+            for content in content_iter:
+                if shard is None:
+                    shard = _IsiShard(self.tmp_dir, num_shards)
+                    num_shards += 1
+                if not self._preprocess(shard.pp, content, shard.nxml_dir):
+                    continue
+                shard.content_ids.append(content.get_id())
+                if len(shard.content_ids) >= self.shard_size:
+                    self._submit_shard(executor, pending, shard, verbose, log)
+                    shard = None
+                    self._add_done_shards(pending)
+            if shard is not None and shard.content_ids:
+                self._submit_shard(executor, pending, shard, verbose, log)
+            self._add_done_shards(pending, wait_for_all=True)
         return self.results
 
+    def _submit_shard(self, executor, pending, shard, verbose, log):
+        logger.info("Starting ISI on shard %d of %d contents."
+                    % (shard.index, len(shard.content_ids)))
+        future = executor.submit(run_isi, shard.input_dir, shard.output_dir,
+                                 shard.temp_dir, 1, verbose=verbose, log=log)
+        pending[future] = shard
+        return
+
     @classmethod
     def get_version(cls):
         return get_isi_version()
@@ -30,28 +30,135 @@ try:
     # jnius before the other imports
     from os import environ
     environ['CLASSPATH'] = f'{mti_jars_path}/*'
-    from jnius import autoclass
+    from jnius import autoclass, detach
     MTI_AVAILABLE = True
 except:
     logger.warning("Unable to access secure parameters; "
                    "MTI reading will not be available.")
     MTI_AVAILABLE = False
 
-import re
-import html
 import glob
+import json
+import threading
 from os import path, remove, listdir
-from collections import defaultdict
-from indra_reading.readers.core import Reader
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from indra_reading.readers.core import Reader, ReadingError, statuses
+from indra_reading.readers.policy import ExecutionPolicy
 from indra_reading.readers.util import get_dir
+from indra_reading.readers.normalize import TextNormalizer
+
+
+_sanitizer = TextNormalizer(whitespace='newlines', non_ascii=' ',
+                            unescape_html=True)
 
 
 def sanitize_text(txt):
     """MTI needs single-line text and errors on non-ASCII."""
-    txt = html.unescape(txt)
-    txt = re.sub(r'\n', ' ', txt)
-    txt = re.sub(r'[^\x00-\x7F]+', ' ', txt)
-    return txt
+    return _sanitizer(txt)
+
+
+class MeshLookup(object):
+    """A bounded, memoized lookup of MeSH terms by their names.
+
+    The same few thousand MeSH headings come back from MTI again and again,
+    so each name is looked up with `mesh_client` only once per process, and
+    kept until `max_size` names have been used more recently. The memo may
+    be saved with `dump_snapshot`, and loaded with `load_snapshot`, e.g. in
+    the initializer of each process of a pool, to skip even the first
+    lookups.
+
+    Parameters
+    ----------
+    max_size : Optional[int]
+        The maximum number of names to remember. If None, there is no limit.
+        Default is 100000.
+    """
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        return
+
+    def __repr__(self):
+        return '%s(size=%d, hits=%d, misses=%d)' \
+               % (self.__class__.__name__, len(self._memo), self.hits,
+                  self.misses)
+
+    def __len__(self):
+        return len(self._memo)
+
+    def _remember(self, topic, mesh_id_str):
+        self._memo[topic] = mesh_id_str
+        self._memo.move_to_end(topic)
+        while self.max_size is not None and len(self._memo) > self.max_size:
+            self._memo.popitem(last=False)
+        return
+
+    def get_mesh_id(self, topic):
+        """Get the MeSH ID (e.g. 'D000123') of a name, or None."""
+        with self._lock:
+            if topic in self._memo:
+                self.hits += 1
+                self._memo.move_to_end(topic)
+                return self._memo[topic]
+            self.misses += 1
+        mesh_id_str = mesh_client.get_mesh_id_name(topic)[0]
+        with self._lock:
+            self._remember(topic, mesh_id_str)
+        if not mesh_id_str:
+            logger.warning('Mesh ID not found for "%s"' % topic)
+        return mesh_id_str
+
+    def get_term(self, topic):
+        """Get the term (mesh_id, is_concept) for a name, or None."""
+        # Look for mesh ID of the topic
+        mesh_id_str = self.get_mesh_id(topic)
+        if not mesh_id_str:
+            return None
+
+        # Add mesh ID as a number without prefix
+        assert mesh_id_str[0] in ['C', 'D'], \
+            f"Supposedly impossible mesh ID found: {mesh_id_str}"
+        is_concept = (mesh_id_str[0] == 'C')
+        mesh_id = int(mesh_id_str[1:])
+        return mesh_id, is_concept
+
+    def get_terms(self, topics):
+        """Get a dict of the terms of many names, looking each up once."""
+        return {topic: self.get_term(topic) for topic in set(topics)}
+
+    def load_snapshot(self, fname):
+        """Add the names and MeSH IDs saved in a JSON file to the memo."""
+        with open(fname, 'r') as f:
+            snapshot = json.load(f)
+        with self._lock:
+            for topic, mesh_id_str in snapshot.items():
+                self._remember(topic, mesh_id_str)
+        logger.info('Loaded %d MeSH names from %s.' % (len(snapshot), fname))
+        return
+
+    def dump_snapshot(self, fname):
+        """Save the names and MeSH IDs in the memo to a JSON file."""
+        with self._lock:
+            snapshot = dict(self._memo)
+        with open(fname, 'w') as f:
+            json.dump(snapshot, f)
+        return
+
+
+# The lookup shared by all MTIReaders in this process.
+mesh_lookup = MeshLookup()
+
+
+def warm_mesh_lookup(fname):
+    """Pre-warm the MeSH lookup of this process from a snapshot file.
+
+    This may be given as the `initializer` of a `multiprocessing.Pool`.
+    """
+    mesh_lookup.load_snapshot(fname)
 
 
 def has_error(line):
@@ -62,15 +169,45 @@ class MtiUnavailableError(Exception):
     pass
 
 
+class MtiBatchError(ReadingError):
+    pass
+
+
 class MTIReader(Reader):
+    """A wrapper around the MTI batch interface.
+
+    The input is split into chunks, which are submitted to MTI concurrently,
+    up to `n_proc` at a time. The results of each chunk are parsed in memory
+    as soon as it is done. A chunk that fails is submitted again, so one
+    error does not lose the whole reading.
+
+    Parameters
+    ----------
+    chunk_size : Optional[int]
+        The number of abstracts submitted to MTI in each batch. If None
+        (default), all the abstracts are submitted in a single batch.
+    chunk_retries : int
+        The number of times a failed chunk is submitted again. Default is 2.
+    chunk_backoff : float
+        The seconds to wait before retrying a chunk, doubled with each
+        retry. Default is 10.
+    """
     name = 'MTI'
     results_type = 'mesh_terms'
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, chunk_size=None, chunk_retries=2,
+                 chunk_backoff=10, **kwargs):
         super().__init__(*args, **kwargs)
         self.num_input = 0
         self.input_dir = get_dir(self.tmp_dir, 'input')
         self.output_dir = get_dir(self.tmp_dir, 'output')
+        self.chunk_size = chunk_size
+        self.chunk_policy = ExecutionPolicy(timeout=None,
+                                            max_retries=chunk_retries,
+                                            backoff=chunk_backoff,
+                                            quarantine_after=None)
+        self.chunk_files = []
+        self.chunk_ids = {}
 
     @classmethod
     def get_version(cls):
@@ -78,25 +215,42 @@ class MTIReader(Reader):
 
     def prep_input(self, content_iter):
         logger.info('Prepping input.')
-        abs_file = path.join(self.input_dir, 'abstracts.txt')
-        abs_file = path.realpath(path.expanduser(abs_file))
 
         # MTI takes a single text file with multiple IDs and text
         # contents when running in batch mode. Here we compile
-        # that single file.
-        with open(abs_file, 'w') as fh:
+        # one such file for each chunk.
+        self.chunk_files = []
+        self.chunk_ids = {}
+        fh = None
+        num_in_chunk = 0
+        try:
             for content in content_iter:
                 # If it's an NXML, we skip it
                 if content.is_format('nxml'):
                     continue
-                quality_issue = self._check_content(content.get_text())
+                quality_issue = self._check_content(content)
                 if quality_issue is not None:
                     logger.warning('Skipping %s due to: %s'
                                    % (content.get_id(), quality_issue))
                     continue
+                if fh is None or num_in_chunk == self.chunk_size:
+                    if fh is not None:
+                        fh.close()
+                    abs_file = path.join(self.input_dir, 'abstracts_%d.txt'
+                                         % len(self.chunk_files))
+                    abs_file = path.realpath(path.expanduser(abs_file))
+                    self.chunk_files.append(abs_file)
+                    self.chunk_ids[abs_file] = []
+                    fh = open(abs_file, 'w')
+                    num_in_chunk = 0
+                num_in_chunk += 1
                 self.num_input += 1
+                self.chunk_ids[abs_file].append(content.get_id())
                 fh.write('UI  -  %s\n' % content.get_id())
                 fh.write('AB  -  %s\n\n' % sanitize_text(content.get_text()))
+        finally:
+            if fh is not None:
+                fh.close()
         return
 
     def clear_input(self):
@@ -123,35 +277,29 @@ class MTIReader(Reader):
             self.add_result(content_id, content)
         return self.results
 
-    def _read(self, content_iter, verbose=False, log=False):
-        if not MTI_AVAILABLE:
-            raise MtiUnavailableError("MTI is not available for reading.")
-        logger.info('Running MTI.')
-        ret = []
-        self.prep_input(content_iter)
-
-        if not self.num_input:
-            return ret
-
-        # We can now retrieve the prepared input file and call
-        # MTI batch
-        abs_file = path.join(self.input_dir, 'abstracts.txt')
-        abs_file = path.realpath(path.expanduser(abs_file))
-        logger.info('Instantiating MTI GenericBatchNew class.')
-        batch = autoclass('GenericBatchNew')()
-        logger.info('Calling MTI batch processor.')
-        result = batch.processor(["--email", mti_email, abs_file],
-                                 mti_username, mti_password)
+    @staticmethod
+    def _run_batch(abs_file):
+        """Submit a single input file to MTI, returning the raw result."""
+        try:
+            batch = autoclass('GenericBatchNew')()
+            result = batch.processor(["--email", mti_email, abs_file],
+                                     mti_username, mti_password)
+        finally:
+            # Release this thread from the JVM.
+            detach()
         # If there is an error, MTI just returns a string
         # starting with ERROR
         if result.startswith('ERROR'):
-            logger.error('MTI returned with error: "%s"' % result)
-            return ret
+            raise MtiBatchError('MTI returned with error: "%s"' % result)
+        return result
 
-        logger.info('MTI succeeded.')
+    def _run_chunk(self, abs_file):
+        return self.chunk_policy.run(lambda timeout: self._run_batch(abs_file),
+                                     path.basename(abs_file))
 
-        # Here we take apart the response by content ID so that we
-        # can create separate output files for each content
+    def add_batch_result(self, result):
+        """Split a raw MTI result by content ID, and add it to the results.
+        """
         result_by_id = defaultdict(list)
         for line in result.splitlines():
             if has_error(line):
@@ -162,40 +310,74 @@ class MTIReader(Reader):
             result_by_id[content_id].append(line)
         logger.info('Got results for %s IDs' % len(result_by_id))
         for content_id, res in result_by_id.items():
-            out_file = path.join(self.output_dir,
-                                 '%s.txt' % content_id)
-            with open(out_file, 'w') as fh:
-                for line in res:
-                    fh.write('%s\n' % line)
-        # Get the output
-        ret = self.get_output()
+            self.add_result(content_id, ''.join('%s\n' % line
+                                                for line in res))
+        return
+
+    def _read(self, content_iter, verbose=False, log=False):
+        if not MTI_AVAILABLE:
+            raise MtiUnavailableError("MTI is not available for reading.")
+        logger.info('Running MTI.')
+        self.prep_input(content_iter)
+
+        if not self.num_input:
+            return []
+
+        # We can now submit each of the prepared input files to MTI
+        # batch, and take apart each response as it comes back.
+        logger.info('Calling MTI batch processor on %d chunks.'
+                    % len(self.chunk_files))
+        n_threads = min(self.n_proc, len(self.chunk_files))
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            futures = {executor.submit(self._run_chunk, abs_file): abs_file
+                       for abs_file in self.chunk_files}
+            for future in as_completed(futures):
+                abs_file = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error('MTI failed on %s: %s' % (abs_file, e))
+                    for content_id in self.chunk_ids[abs_file]:
+                        self.set_status(content_id, statuses.FAILED)
+                    continue
+                logger.info('MTI succeeded on %s.' % abs_file)
+                self.add_batch_result(result)
+
         self.clear_input()
-        return ret
+        return self.results
 
     @staticmethod
-    def parse_results(content):
-        """Get terms from a single MTI output"""
+    def _get_topics(content):
         if not content:
             return []
-
-        terms = set()
-
         # Split content into non-empty lines
-        lines = content.splitlines()
-        for line in lines:
-            topic = line.split('|')[1]
-
-            # Look for mesh ID of the topic
-            mesh_id_str = mesh_client.get_mesh_id_name(topic)[0]
-            if not mesh_id_str:
-                logger.warning('Mesh ID not found for "%s"' % topic)
-                continue 
-
-            # Add mesh ID as a number without prefix
-            assert mesh_id_str[0] in ['C', 'D'], \
-                f"Supposedly impossible mesh ID found: {mesh_id_str}"
-            is_concept = (mesh_id_str[0] == 'C')
-            mesh_id = int(mesh_id_str[1:])
-            terms.add((mesh_id, is_concept))
+        return [line.split('|')[1] for line in content.splitlines()]
 
+    @classmethod
+    def parse_results(cls, content):
+        """Get terms from a single MTI output"""
+        terms = set()
+        for topic in cls._get_topics(content):
+            term = mesh_lookup.get_term(topic)
+            if term is not None:
+                terms.add(term)
         return list(terms)
+
+    @classmethod
+    def parse_results_many(cls, contents):
+        """Get the terms from many MTI outputs at once.
+
+        The MeSH terms of all the distinct topics in `contents` are looked up
+        in a single pass before any output is parsed.
+
+        Returns
+        -------
+        terms_list : list[list[tuple]]
+            The terms of each content, in the same order as `contents`.
+        """
+        topics_list = [cls._get_topics(content) for content in contents]
+        term_dict = mesh_lookup.get_terms({topic for topics in topics_list
+                                           for topic in topics})
+        return [list({term_dict[topic] for topic in topics
+                      if term_dict[topic] is not None})
+                for topics in topics_list]
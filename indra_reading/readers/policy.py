@@ -0,0 +1,187 @@
+import time
+import logging
+import threading
+import subprocess
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class ReadingTimeout(Exception):
+    """Raised when a document is not read within its deadline."""
+    pass
+
+
+class QuarantinedError(Exception):
+    """Raised when a quarantined document is given to a policy to run."""
+    pass
+
+
+TIMEOUT_EXCEPTIONS = (ReadingTimeout, subprocess.TimeoutExpired, TimeoutError)
+
+
+def call_with_deadline(func, timeout, *args, **kwargs):
+    """Call a function in a separate thread, giving up after `timeout` secs.
+
+    Unlike `signal.alarm`, this works in any thread and in pool workers. It
+    cannot stop the function, however: if the deadline passes, the function
+    is left to finish in a daemon thread and its result is discarded. Where
+    the function can enforce a timeout itself (for example by passing one to
+    `subprocess` or `requests`) that is preferable.
+    """
+    if timeout is None:
+        return func(*args, **kwargs)
+
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = func(*args, **kwargs)
+        except BaseException as e:
+            outcome['error'] = e
+
+    th = threading.Thread(target=target, daemon=True)
+    th.start()
+    th.join(timeout)
+    if th.is_alive():
+        raise ReadingTimeout("Call did not complete within %s seconds."
+                             % timeout)
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+class ExecutionPolicy(object):
+    """Per-document deadlines, retries, and quarantine for a reader.
+
+    The deadline for a document is `timeout` plus `timeout_per_char` seconds
+    for every character of its text, capped at `max_timeout`. A failed
+    document is tried again up to `max_retries` times, waiting `backoff`
+    seconds before the first retry and `backoff_factor` times longer before
+    each following one. A document that times out `quarantine_after` times is
+    quarantined, and any later attempt to read it is refused immediately.
+
+    The policy keeps its state behind a lock, so it may be shared by threads.
+    Copies sent to pool workers each keep their own count of timeouts.
+
+    Parameters
+    ----------
+    timeout : Optional[float]
+        The base number of seconds allowed for each document. If None, there
+        is no deadline. Default is 60.
+    timeout_per_char : float
+        The number of seconds added to the deadline per character of text.
+        Default is 0.
+    max_timeout : Optional[float]
+        If given, the longest deadline any document may be given.
+    max_retries : int
+        The number of times a failed document is tried again. Default is 0.
+    backoff : float
+        The seconds to wait before the first retry. Default is 1.
+    backoff_factor : float
+        The factor by which the wait grows with each retry. Default is 2.
+    quarantine_after : Optional[int]
+        The number of timeouts after which a document is quarantined. If
+        None, documents are never quarantined. Default is 2.
+    """
+    def __init__(self, timeout=60, timeout_per_char=0, max_timeout=None,
+                 max_retries=0, backoff=1, backoff_factor=2,
+                 quarantine_after=2):
+        self.timeout = timeout
+        self.timeout_per_char = timeout_per_char
+        self.max_timeout = max_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.quarantine_after = quarantine_after
+        self.timeout_counts = Counter()
+        self.quarantined = set()
+        self._lock = threading.Lock()
+        return
+
+    def __repr__(self):
+        return ('%s(timeout=%s, timeout_per_char=%s, max_retries=%d, '
+                'quarantined=%d)'
+                % (self.__class__.__name__, self.timeout,
+                   self.timeout_per_char, self.max_retries,
+                   len(self.quarantined)))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def get_timeout(self, text_length=0):
+        """Get the deadline in seconds for a text of the given length."""
+        if self.timeout is None:
+            return None
+        timeout = self.timeout + self.timeout_per_char * text_length
+        if self.max_timeout is not None:
+            timeout = min(timeout, self.max_timeout)
+        return timeout
+
+    def is_quarantined(self, doc_id):
+        """Check whether a document has been quarantined."""
+        with self._lock:
+            return doc_id in self.quarantined
+
+    def record_timeout(self, doc_id):
+        """Record that a document timed out, returning whether it is now
+        quarantined."""
+        with self._lock:
+            self.timeout_counts[doc_id] += 1
+            if self.quarantine_after is not None \
+                    and self.timeout_counts[doc_id] >= self.quarantine_after:
+                if doc_id not in self.quarantined:
+                    logger.warning("Quarantining %s after %d timeouts."
+                                   % (doc_id, self.timeout_counts[doc_id]))
+                self.quarantined.add(doc_id)
+            return doc_id in self.quarantined
+
+    def run(self, func, doc_id, text_length=0, enforce=False):
+        """Run `func(timeout)` for a document according to this policy.
+
+        Parameters
+        ----------
+        func : callable
+            Called with the deadline in seconds (or None) as its only
+            argument. It should raise an exception if it fails or times out.
+        doc_id : str or int
+            The ID of the document, used to track timeouts and quarantine.
+        text_length : int
+            The length of the document's text, used to scale the deadline.
+        enforce : bool
+            If True, the deadline is also enforced from outside of `func` by
+            `call_with_deadline`, for functions that cannot enforce it
+            themselves. Default is False.
+
+        Returns
+        -------
+        result :
+            The return value of the first successful call of `func`.
+        """
+        timeout = self.get_timeout(text_length)
+        wait = self.backoff
+        for attempt in range(self.max_retries + 1):
+            if self.is_quarantined(doc_id):
+                raise QuarantinedError("%s is quarantined." % doc_id)
+            try:
+                if enforce:
+                    return call_with_deadline(func, timeout, timeout)
+                return func(timeout)
+            except TIMEOUT_EXCEPTIONS as e:
+                logger.warning("Timed out reading %s after %s seconds."
+                               % (doc_id, timeout))
+                self.record_timeout(doc_id)
+                err = e
+            except Exception as e:
+                logger.warning("Failed to read %s: %s" % (doc_id, e))
+                err = e
+            if attempt < self.max_retries:
+                time.sleep(wait)
+                wait *= self.backoff_factor
+        raise err
@@ -0,0 +1,143 @@
+"""Convert content in parallel before it is read.
+
+Some readers cannot read content in the format it is given, most often NXML,
+and must first convert it, e.g. with `indra.literature.pmc_client.extract_text`.
+Done one document at a time on the main thread, that conversion does not
+overlap with anything. A `ContentConverter` runs it in a process pool,
+yielding each converted document as soon as it is ready, and caches the
+results by a hash of the original text, so the same document is never
+converted twice.
+"""
+import logging
+from functools import partial
+from multiprocessing import Pool
+
+from .content import Content
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['ContentConverter']
+
+
+def _convert(convert_func, task):
+    content_id, text = task
+    try:
+        return content_id, convert_func(text), None
+    except Exception as e:
+        return content_id, None, '%s: %s' % (e.__class__.__name__, e)
+
+
+class ContentConverter(object):
+    """Convert the text of content from one format to another, in parallel.
+
+    Parameters
+    ----------
+    convert_func : callable
+        A function that takes the text of a content and returns the
+        converted text. To be used in a process pool it must be picklable,
+        e.g. defined at the top level of a module.
+    from_format : str
+        The format of the content to convert, e.g. 'nxml'. Content in other
+        formats is passed on as is.
+    to_format : str
+        The format of the converted content, e.g. 'txt'.
+    n_proc : int
+        The number of processes to use. If 1 (default), content is converted
+        in this process.
+    cache : Optional[indra_reading.readers.cache.ReadingCache]
+        If given, converted texts are stored in and served from this cache,
+        keyed by a hash of the original text.
+    name : Optional[str]
+        The name of the conversion in the keys of the cache, which should
+        change whenever its output would. By default, the name of
+        `convert_func` is used.
+    """
+    def __init__(self, convert_func, from_format, to_format, n_proc=1,
+                 cache=None, name=None):
+        if name is None:
+            name = getattr(convert_func, '__name__', 'convert')
+        self.name = name
+        self.convert_func = convert_func
+        self.from_format = from_format
+        self.to_format = to_format
+        self.n_proc = n_proc
+        self.cache = cache
+        self._cache_name = '%s_to_%s' % (from_format, to_format)
+        return
+
+    def __repr__(self):
+        return '%s(%s, n_proc=%d)' % (self.__class__.__name__,
+                                      self._cache_name, self.n_proc)
+
+    def _make_key(self, text):
+        return self.cache.make_key(self._cache_name, self.name, text)
+
+    def _make_content(self, content_id, text):
+        return Content.from_string(content_id, self.to_format, text)
+
+    def iter_convert(self, content_iter):
+        """Convert content, yielding each as soon as it is ready.
+
+        Content that is served from the cache or that does not need to be
+        converted is yielded first, then the rest as it is converted.
+
+        Yields
+        ------
+        content_id : int or str
+            The ID of the original content.
+        new_content : Content or None
+            The content as it should be read, or None if it could not be
+            converted.
+        """
+        to_convert = []
+        keys = {}
+        for content in content_iter:
+            if not content.is_format(self.from_format):
+                yield content.get_id(), content
+                continue
+
+            if self.cache is not None:
+                key = self._make_key(content.get_text())
+                converted = self.cache.get(key)
+                if converted is not None:
+                    content.release_text()
+                    yield content.get_id(), \
+                        self._make_content(content.get_id(), converted)
+                    continue
+                keys[content.get_id()] = key
+            to_convert.append(content)
+
+        if not to_convert:
+            return
+
+        logger.info("Converting %d contents from %s to %s."
+                    % (len(to_convert), self.from_format, self.to_format))
+
+        def iter_tasks():
+            for content in to_convert:
+                text = content.get_text()
+                content.release_text()
+                yield content.get_id(), text
+
+        convert = partial(_convert, self.convert_func)
+        pool = None
+        try:
+            if self.n_proc > 1 and len(to_convert) > 1:
+                pool = Pool(min(self.n_proc, len(to_convert)))
+                results = pool.imap_unordered(convert, iter_tasks())
+            else:
+                results = map(convert, iter_tasks())
+            for content_id, converted, error in results:
+                if error is not None:
+                    logger.error("Failed to convert %s: %s"
+                                 % (content_id, error))
+                    yield content_id, None
+                    continue
+                if self.cache is not None:
+                    self.cache.put(keys[content_id], converted)
+                yield content_id, self._make_content(content_id, converted)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return
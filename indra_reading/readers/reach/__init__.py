@@ -1,31 +1,80 @@
 import re
 import json
 import glob
+import time
+import socket
 import logging
+import requests
+import threading
 import subprocess
 
 from os import path, remove, environ, listdir
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from indra.config import get_config
 from indra_reading.readers.util import get_dir, get_mem_total
-from indra_reading.readers.core import Reader, ReadingError
+from indra_reading.readers.core import Reader, ReadingError, statuses
+from indra_reading.readers.policy import ReadingTimeout
 
 from indra.sources import reach
 
 logger = logging.getLogger(__name__)
 
 
+# The main class of the REACH web service, and its endpoints.
+REACH_SERVER_CLASS = 'org.clulab.reach.export.server.ApiServer'
+REACH_TEXT_ENDPOINT = 'api/text'
+REACH_NXML_ENDPOINT = 'api/uploadFile'
+
+
 class ReachError(ReadingError):
     pass
 
 
 class ReachReader(Reader):
-    """This object encodes an interface to the reach reading script."""
+    """This object encodes an interface to the reach reading script.
+
+    Parameters
+    ----------
+    server_mode : bool
+        If True, rather than running the REACH command line tool (and
+        loading all of REACH's models) on every call to `read`, a REACH
+        server is started the first time content is read and kept running
+        for the life of this reader. Content is then posted to the server and
+        results are gathered as each paper finishes. Call `stop_server` (or
+        use the reader as a context manager) to shut the server down.
+        Default is False.
+    server_port : int
+        The port on which to run the REACH server. Default is 8080.
+    server_startup_timeout : int
+        The number of seconds to wait for the REACH server to be ready.
+        Default is 900.
+    server_read_timeout : int
+        The longest the server may take to read a single paper before it is
+        given up on, whatever the deadline set by the reader's `policy`.
+        Default is 600.
+    harvest_interval : int or None
+        If given, while the REACH command line tool is running, the output
+        directory is polled every `harvest_interval` seconds and the output
+        of each paper is joined and added to the results as soon as all of
+        its files are complete. If REACH then crashes, the results harvested
+        so far are kept rather than lost. Default is None, meaning outputs are
+        only gathered once REACH has finished.
+    result_callback : callable or None
+        A function called with each new ReadingData as soon as it is added,
+        for example to process statements while REACH is still reading.
+        Exceptions raised by the callback are logged and ignored.
+    """
+    _filetype_list = ['entities', 'events', 'sentences']
     REACH_MEM = 5  # GB
     MEM_BUFFER = 2  # GB
     name = 'REACH'
+    default_timeout = 600
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, server_mode=False, server_port=8080,
+                 server_startup_timeout=900, server_read_timeout=600,
+                 harvest_interval=None, result_callback=None, **kwargs):
         self.exec_path, self.version = self._check_reach_env()
         super(ReachReader, self).__init__(*args, **kwargs)
         conf_fmt_fname = path.join(path.dirname(__file__),
@@ -42,8 +91,172 @@ class ReachReader(Reader):
                 )
         self.output_dir = get_dir(self.tmp_dir, 'output')
         self.num_input = 0
+
+        # Settings for the long-lived REACH server.
+        self.server_mode = server_mode
+        self.server_port = server_port
+        self.server_startup_timeout = server_startup_timeout
+        self.server_read_timeout = server_read_timeout
+        self._server_proc = None
+        self._server_log = None
+
+        # Settings for harvesting results while REACH runs.
+        self.harvest_interval = harvest_interval
+        self.result_callback = result_callback
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop_server()
+
+    def _server_url(self, endpoint):
+        return 'http://localhost:%d/%s' % (self.server_port, endpoint)
+
+    def server_is_running(self):
+        """Check whether the REACH server process is alive."""
+        return self._server_proc is not None \
+            and self._server_proc.poll() is None
+
+    def start_server(self):
+        """Start the REACH server, if it is not already running.
+
+        The server is started only once per reader, so the cost of starting
+        the JVM and loading REACH's models is only paid once.
+        """
+        if self.server_is_running():
+            return
+
+        logger.info("Starting the REACH server on port %d."
+                    % self.server_port)
+        args = [
+            'java',
+            '-Dconfig.file=%s' % self.conf_file_path,
+            '-Dhttp.port=%d' % self.server_port,
+            '-cp', self.exec_path, REACH_SERVER_CLASS
+        ]
+        log_path = path.join(self.tmp_dir, 'reach_server.log')
+        self._server_log = open(log_path, 'ab')
+        self._server_proc = subprocess.Popen(args, stdout=self._server_log,
+                                             stderr=subprocess.STDOUT)
+
+        # Wait for the server to accept connections.
+        start = time.time()
+        while time.time() - start < self.server_startup_timeout:
+            if not self.server_is_running():
+                self.stop_server()
+                raise ReachError("REACH server exited during startup. See "
+                                 "%s for details." % log_path)
+            with closing(socket.socket(socket.AF_INET,
+                                       socket.SOCK_STREAM)) as sok:
+                if sok.connect_ex(('localhost', self.server_port)) == 0:
+                    break
+            time.sleep(1)
+        else:
+            self.stop_server()
+            raise ReachError("REACH server did not start within %d seconds."
+                             % self.server_startup_timeout)
+        logger.info("REACH server is ready after %d seconds."
+                    % (time.time() - start))
         return
 
+    def stop_server(self):
+        """Shut down the REACH server, if one is running."""
+        if self._server_proc is not None:
+            logger.info("Stopping the REACH server.")
+            if self._server_proc.poll() is None:
+                self._server_proc.terminate()
+                try:
+                    self._server_proc.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    logger.warning("REACH server did not stop; killing it.")
+                    self._server_proc.kill()
+            self._server_proc = None
+        if self._server_log is not None:
+            self._server_log.close()
+            self._server_log = None
+        return
+
+    def _read_one_with_server(self, content):
+        """Post a single content to the REACH server, returning the JSON.
+
+        The deadline, retries, and quarantine of the reader's `policy` apply,
+        with `server_read_timeout` as the longest deadline allowed.
+        """
+        text_length = content.get_length_bounds()[1]
+        return self.policy.run(
+            lambda timeout: self._post_to_server(content, timeout),
+            content.get_id(),
+            text_length=text_length
+        )
+
+    def _post_to_server(self, content, timeout=None):
+        if timeout is None or timeout > self.server_read_timeout:
+            timeout = self.server_read_timeout
+        try:
+            if content.is_format('nxml'):
+                url = self._server_url(REACH_NXML_ENDPOINT)
+                resp = requests.post(url,
+                                     files={'file': (content.get_filename(),
+                                                     content.get_text())},
+                                     data={'output': 'fries'},
+                                     timeout=timeout)
+            else:
+                url = self._server_url(REACH_TEXT_ENDPOINT)
+                resp = requests.post(url,
+                                     data={'text': content.get_text(),
+                                           'output': 'fries'},
+                                     timeout=timeout)
+        except requests.exceptions.Timeout as e:
+            # Raise a timeout the policy recognizes, so it counts towards
+            # quarantine.
+            raise ReadingTimeout("REACH server did not read %s within %s "
+                                 "seconds." % (content.get_id(), timeout)) \
+                from e
+        if resp.status_code != 200:
+            raise ReachError("REACH server responded with %d for %s: %s"
+                             % (resp.status_code, content.get_id(),
+                                resp.text))
+        return resp.json()
+
+    def _read_with_server(self, content_iter):
+        """Read the content using the persistent REACH server."""
+        to_read = []
+        for content in content_iter:
+            # Check the quality of the text, and skip if there are any issues.
+            quality_issue = self._check_content(content)
+            if quality_issue is not None:
+                logger.warning("Skipping %s due to: %s"
+                               % (content.get_id(), quality_issue))
+                continue
+            to_read.append(content)
+
+        if not to_read:
+            return self.results
+
+        self.start_server()
+        logger.info("Sending %d papers to the REACH server." % len(to_read))
+        with ThreadPoolExecutor(max_workers=self.n_proc) as executor:
+            futures = {executor.submit(self._read_one_with_server, content):
+                       content.get_id() for content in to_read}
+            for future in as_completed(futures):
+                content_id = futures[future]
+                try:
+                    reading = future.result()
+                except Exception as e:
+                    logger.exception(e)
+                    logger.error("REACH server failed to read %s."
+                                 % content_id)
+                    self.set_status(content_id, statuses.FAILED)
+                    reading = None
+                self._add_new_result(content_id, reading)
+                logger.debug('Got REACH result for %s.' % content_id)
+
+        if not self.server_is_running():
+            logger.error("The REACH server stopped while reading.")
+        return self.results
+
     @classmethod
     def _join_json_files(cls, prefix, clear=False):
         """Join different REACH output JSON files into a single JSON object.
@@ -65,10 +278,9 @@ class ReachReader(Reader):
         json_obj : dict
             The result of joining the files, keyed by the three subcategories.
         """
-        filetype_list = ['entities', 'events', 'sentences']
         json_dict = {}
         try:
-            for filetype in filetype_list:
+            for filetype in cls._filetype_list:
                 fname = prefix + '.uaz.' + filetype + '.json'
                 with open(fname, 'rt') as f:
                     json_dict[filetype] = json.load(f)
@@ -120,7 +332,7 @@ class ReachReader(Reader):
         logger.info("Prepping input.")
         for content in content_iter:
             # Check the quality of the text, and skip if there are any issues.
-            quality_issue = self._check_content(content.get_text())
+            quality_issue = self._check_content(content)
             if quality_issue is not None:
                 logger.warning("Skipping %s due to: %s"
                                % (content.get_id(), quality_issue))
@@ -132,29 +344,100 @@ class ReachReader(Reader):
                          % new_fpath)
         return
 
-    def get_output(self):
-        """Get the output of a reading job as a list of filenames."""
-        logger.info("Getting outputs.")
-        # Get the set of prefixes (each will correspond to three json files.)
+    def _add_new_result(self, content_id, content):
+        self.add_result(content_id, content)
+        if self.result_callback is not None:
+            try:
+                self.result_callback(self.results[-1])
+            except Exception as e:
+                logger.exception(e)
+                logger.error("Result callback failed for %s." % content_id)
+        return
+
+    def _add_joined_result(self, prefix):
+        content_id = path.basename(prefix)
+        try:
+            content = self._join_json_files(prefix, clear=True)
+        except Exception as e:
+            logger.exception(e)
+            logger.error("Could not load result for prefix %s." % prefix)
+            content = None
+        if content is None:
+            self.set_status(content_id, statuses.FAILED)
+        self._add_new_result(content_id, content)
+        logger.debug('Joined files for prefix %s.' % content_id)
+        return
+
+    def _get_output_files(self):
+        """Get a dict of output files keyed by their prefixes."""
         json_files = glob.glob(path.join(self.output_dir, '*.json'))
-        json_prefixes = set()
+        prefix_files = {}
         for json_file in json_files:
             # Remove .uaz.<subfile type>.json
             prefix = '.'.join(path.basename(json_file).split('.')[:-3])
-            json_prefixes.add(path.join(self.output_dir, prefix))
+            prefix_files.setdefault(path.join(self.output_dir, prefix), []) \
+                .append(json_file)
+        return prefix_files
+
+    def get_output(self):
+        """Get the output of a reading job as a list of filenames."""
+        logger.info("Getting outputs.")
+        # Join each set of json files and store the json dict. Each prefix
+        # will correspond to three json files.
+        for prefix in self._get_output_files().keys():
+            self._add_joined_result(prefix)
+        return self.results
+
+    def harvest_output(self, file_sizes):
+        """Join and add the outputs of any papers that REACH has finished.
+
+        A paper is considered finished when all three of its files exist and
+        none of their sizes have changed since the last harvest.
+
+        Parameters
+        ----------
+        file_sizes : dict
+            The file sizes found by the previous harvest, keyed by path. This
+            is updated in place.
+
+        Returns
+        -------
+        num_harvested : int
+            The number of papers whose results were added.
+        """
+        num_harvested = 0
+        for prefix, files in self._get_output_files().items():
+            if len(files) < len(self._filetype_list):
+                continue
 
-        # Join each set of json files and store the json dict.
-        for prefix in json_prefixes:
-            content_id = path.basename(prefix)
             try:
-                content = self._join_json_files(prefix, clear=True)
+                sizes = {fpath: path.getsize(fpath) for fpath in files}
+            except OSError:
+                # A file was moved or removed in the meantime.
+                continue
+            if any(file_sizes.get(fpath) != size
+                   for fpath, size in sizes.items()):
+                file_sizes.update(sizes)
+                continue
+
+            self._add_joined_result(prefix)
+            for fpath in files:
+                file_sizes.pop(fpath, None)
+            num_harvested += 1
+        return num_harvested
+
+    def _harvest_until(self, stop_event):
+        file_sizes = {}
+        num_harvested = 0
+        while not stop_event.wait(self.harvest_interval):
+            try:
+                num_harvested += self.harvest_output(file_sizes)
             except Exception as e:
                 logger.exception(e)
-                logger.error("Could not load result for prefix %s." % prefix)
-                content = None
-            self.add_result(content_id, content)
-            logger.debug('Joined files for prefix %s.' % content_id)
-        return self.results
+                logger.error("Failed to harvest REACH outputs.")
+        logger.info("Harvested %d results while REACH was running."
+                    % num_harvested)
+        return
 
     def clear_input(self):
         """Remove all the input files (at the end of a reading)."""
@@ -177,6 +460,10 @@ class ReachReader(Reader):
             logger.info("REACH not run.")
             return ret
 
+        # Use the long-lived server, if selected.
+        if self.server_mode:
+            return self._read_with_server(content_iter)
+
         # Prep the content
         self.prep_input(content_iter)
 
@@ -194,6 +481,14 @@ class ReachReader(Reader):
         p = subprocess.Popen(args, stdout=subprocess.PIPE,
                              stderr=subprocess.PIPE)
 
+        # Gather the results of each paper as it finishes, if selected.
+        harvest_thread = None
+        stop_harvest = threading.Event()
+        if self.harvest_interval is not None:
+            harvest_thread = threading.Thread(target=self._harvest_until,
+                                              args=[stop_harvest])
+            harvest_thread.start()
+
         # Monitor the logs and wait for Reach to finish.
         log_file_str = ''
         for line in iter(p.stdout.readline, b''):
@@ -206,12 +501,19 @@ class ReachReader(Reader):
             with open('reach_run.log', 'ab') as f:
                 f.write(log_file_str.encode('utf8'))
         p_out, p_err = p.communicate()
+        if harvest_thread is not None:
+            stop_harvest.set()
+            harvest_thread.join()
         if p.returncode:
             logger.error('Problem running REACH:')
             logger.error('Stdout: %s' % p_out.decode('utf-8'))
             logger.error('Stderr: %s' % p_err.decode('utf-8'))
-            raise ReachError("Problem running REACH")
-        logger.info("Reach finished.")
+            if harvest_thread is None:
+                raise ReachError("Problem running REACH")
+            logger.warning("Keeping the %d results harvested before REACH "
+                           "failed." % len(self.results))
+        else:
+            logger.info("Reach finished.")
 
         # Get the output
         ret = self.get_output()
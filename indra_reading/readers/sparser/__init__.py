@@ -1,15 +1,17 @@
 import re
 import json
 import logging
+import subprocess
 
 from io import BytesIO
 from os import path, remove
 from multiprocessing import Pool
 
-from indra_reading.readers.core import Reader, ReadingError
+from indra_reading.readers.core import Reader, ReadingError, statuses
 from indra_reading.readers.content import Content
 from indra_reading.readers.util import get_time_stamp
 
+from indra.config import get_config
 from indra.sources import sparser
 
 logger = logging.getLogger(__name__)
@@ -20,14 +22,29 @@ class SparserError(ReadingError):
 
 
 class SparserReader(Reader):
-    """This object provides methods to interface with the commandline tool."""
+    """This object provides methods to interface with the commandline tool.
+
+    The reader's `policy` sets the time Sparser may spend on each file, from
+    the size of that file. When several files are given to one process, it
+    may spend the sum of their deadlines.
+
+    Parameters
+    ----------
+    docs_per_process : Optional[int]
+        If given, each Sparser process is given up to this many files at
+        once, rather than starting a new Sparser process (and Lisp image) for
+        every file. If a process fails or times out, the files it did not
+        finish are split in half and retried, so a single bad file is
+        isolated without failing the rest of its batch. Default is None.
+    """
 
     name = 'SPARSER'
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, docs_per_process=None, **kwargs):
         self.version = self.get_version()
         super(SparserReader, self).__init__(*args, **kwargs)
         self.file_list = None
+        self.docs_per_process = docs_per_process
         return
 
     @classmethod
@@ -41,7 +58,7 @@ class SparserReader(Reader):
         self.file_list = []
 
         for content in content_iter:
-            quality_issue = self._check_content(content.get_text())
+            quality_issue = self._check_content(content)
             if quality_issue is not None:
                 logger.warning("Skipping %s due to: %s"
                                % (content.get_id(), quality_issue))
@@ -58,6 +75,7 @@ class SparserReader(Reader):
                 # Otherwise we need to frame the content in xml and put it
                 # in a new file with the appropriate name.
                 nxml_str = sparser.make_nxml_from_text(content.get_text())
+                content.release_text()
                 new_content = Content.from_string('PMC' + str(content.get_id()),
                                                   'nxml', nxml_str)
                 fpath = new_content.copy_to(self.tmp_dir)
@@ -98,6 +116,8 @@ class SparserReader(Reader):
                                    % outpath)
 
             content_id = re_out.groups()[0]
+            if reading is None:
+                self.set_status(content_id, statuses.FAILED)
             self.add_result(content_id, reading)
 
             # Clean up the input and output files.
@@ -113,25 +133,34 @@ class SparserReader(Reader):
         return self.results
 
     def read_one(self, fpath, outbuf=None, verbose=False):
-        fpath = path.abspath(fpath)
-        if outbuf is None:
-            outbuf = BytesIO()
-        outbuf.write(b'\nReading %s.\n' % fpath.encode('utf8'))
-        outbuf.flush()
-        if verbose:
-            logger.info('Reading %s.' % fpath)
-        outpath = None
-        try:
-            outpath = sparser.run_sparser(fpath, 'json', outbuf, timeout=60)
-        except Exception as e:
-            if verbose:
-                logger.error('Failed to run sparser on %s.' %
-                             fpath)
-                logger.exception(e)
-            outbuf.write(b'Reading failed.----------\n')
-            outbuf.write(str(e).encode('utf-8') + b'\n')
-            outbuf.write(b'-------------------------\n')
-        return outpath, outbuf
+        return _read_one(fpath, self.policy, outbuf, verbose)
+
+    @staticmethod
+    def _get_outpath(fpath):
+        return _get_outpath(fpath)
+
+    def read_many(self, fpath_list, outbuf=None, verbose=False):
+        """Read many files with a single Sparser process.
+
+        This requires a `save-semantics.sh` that accepts several files in one
+        call, and reads them in the order given.
+
+        The process is given the sum of the deadlines the reader's `policy`
+        sets for the files, and files the policy has quarantined are left
+        out. If the process times out, the timeout is recorded against the
+        first file without output, which is the one Sparser was reading. If
+        the process fails or times out, any files without output are split
+        in half and each half is read by a new process, until the file(s)
+        causing the failure are found and skipped.
+
+        Returns
+        -------
+        outpath_list : list[str]
+            The paths to the output files that were produced.
+        outbuf : BytesIO
+            The buffer with the logs.
+        """
+        return _read_many(fpath_list, self.policy, outbuf, verbose)
 
     def read_some(self, fpath_list, outbuf=None, verbose=False):
         "Perform a few readings."
@@ -143,7 +172,19 @@ class SparserReader(Reader):
         return outpath_list, outbuf
 
     def _read(self, content_iter, verbose=False, log=False, n_per_proc=None):
-        "Perform the actual reading."
+        """Perform the actual reading.
+
+        Files are handed to the worker processes dynamically, largest first,
+        so that the processes stay busy even though the time Sparser takes
+        varies widely from paper to paper. Each output is loaded as soon as
+        it is complete.
+
+        Parameters
+        ----------
+        n_per_proc : Optional[int]
+            The number of files handed to a worker process at a time. The
+            default is 1, which balances the work best.
+        """
         ret = []
         self.prep_input(content_iter)
         L = len(self.file_list)
@@ -151,60 +192,61 @@ class SparserReader(Reader):
             return ret
 
         logger.info("Beginning to run sparser.")
-        output_file_list = []
         if log:
             log_name = 'sparser_run_%s.log' % get_time_stamp()
             outbuf = open(log_name, 'wb')
         else:
             outbuf = None
+
+        # Start the biggest files first, so a long paper is not left to run
+        # on its own at the end. If many files are given to each Sparser
+        # process, group them in that order.
+        file_list = sorted(self.file_list, key=path.getsize, reverse=True)
+        if self.docs_per_process:
+            file_list = [file_list[i:i+self.docs_per_process]
+                         for i in range(0, L, self.docs_per_process)]
+        tasks = [(fpaths, self.policy, verbose) for fpaths in file_list]
+
         try:
             if self.n_proc == 1:
-                for fpath in self.file_list:
-                    outpath, _ = self.read_one(fpath, outbuf, verbose)
-                    if outpath is not None:
-                        output_file_list.append(outpath)
+                for fpaths, _, _ in tasks:
+                    if isinstance(fpaths, list):
+                        outpaths, _ = self.read_many(fpaths, outbuf, verbose)
+                    else:
+                        outpath, _ = self.read_one(fpaths, outbuf, verbose)
+                        outpaths = [] if outpath is None else [outpath]
+                    self.get_output(outpaths)
             else:
                 if n_per_proc is None:
-                    n_per_proc = max(1, min(1000, L//self.n_proc//2))
+                    n_per_proc = 1
                 pool = None
                 try:
                     pool = Pool(self.n_proc)
-                    if n_per_proc is not 1:
-                        batches = [self.file_list[n*n_per_proc:(n+1)*n_per_proc]
-                                   for n in range(L//n_per_proc + 1)]
-                        out_lists_and_buffs = pool.map(self.read_some,
-                                                       batches)
-                    else:
-                        out_files_and_buffs = pool.map(self.read_one,
-                                                       self.file_list)
-                        out_lists_and_buffs = [([out_files], buffs)
-                                               for out_files, buffs
-                                               in out_files_and_buffs]
+                    out_iter = pool.imap_unordered(_read_task, tasks,
+                                                   n_per_proc)
+                    for i, (outpaths, buff) in enumerate(out_iter):
+                        self.get_output(outpaths)
+                        if log:
+                            outbuf.write(b'Log for producing output %d/%d.\n'
+                                         % (i, len(tasks)))
+                            if buff is not None:
+                                buff.seek(0)
+                                outbuf.write(buff.read() + b'\n')
+                            else:
+                                outbuf.write(b'ERROR: no buffer was None. '
+                                             b'No logs available.\n')
+                            outbuf.flush()
                 finally:
                     if pool is not None:
                         pool.close()
                         pool.join()
-                for i, (out_list, buff) in enumerate(out_lists_and_buffs):
-                    if out_list is not None:
-                        output_file_list += out_list
-                    if log:
-                        outbuf.write(b'Log for producing output %d/%d.\n'
-                                     % (i, len(out_lists_and_buffs)))
-                        if buff is not None:
-                            buff.seek(0)
-                            outbuf.write(buff.read() + b'\n')
-                        else:
-                            outbuf.write(b'ERROR: no buffer was None. '
-                                         b'No logs available.\n')
-                        outbuf.flush()
         finally:
             if log:
                 outbuf.close()
                 if verbose:
                     logger.info("Sparser logs may be found at %s." %
                                 log_name)
-        ret = self.get_output(output_file_list)
-        return ret
+        return self.results
 
     @staticmethod
     def parse_results(content):
@@ -212,3 +254,125 @@ class SparserReader(Reader):
         if processor is not None:
             processor.set_statements_pmid(None)
         return processor
+
+
+def _get_outpath(fpath):
+    return re.sub(r'\.nxml$', '', fpath) + '-semantics.json'
+
+
+def _get_text_length(fpath):
+    with open(fpath, 'r', encoding='utf-8', errors='replace') as f:
+        return len(f.read())
+
+
+def _read_one(fpath, policy, outbuf=None, verbose=False):
+    fpath = path.abspath(fpath)
+    if outbuf is None:
+        outbuf = BytesIO()
+    outbuf.write(b'\nReading %s.\n' % fpath.encode('utf8'))
+    outbuf.flush()
+    if verbose:
+        logger.info('Reading %s.' % fpath)
+    outpath = None
+    try:
+        outpath = policy.run(
+            lambda timeout: sparser.run_sparser(fpath, 'json', outbuf,
+                                                timeout=timeout),
+            path.basename(fpath),
+            text_length=_get_text_length(fpath)
+        )
+    except Exception as e:
+        if verbose:
+            logger.error('Failed to run sparser on %s.' %
+                         fpath)
+            logger.exception(e)
+        outbuf.write(b'Reading failed.----------\n')
+        outbuf.write(str(e).encode('utf-8') + b'\n')
+        outbuf.write(b'-------------------------\n')
+    return outpath, outbuf
+
+
+def _read_many(fpath_list, policy, outbuf=None, verbose=False):
+    """Read many files with a single Sparser process, as described in
+    `SparserReader.read_many`."""
+    fpath_list = [path.abspath(fpath) for fpath in fpath_list]
+    if outbuf is None:
+        outbuf = BytesIO()
+    quarantined = [fpath for fpath in fpath_list
+                   if policy.is_quarantined(path.basename(fpath))]
+    if quarantined:
+        outbuf.write(b'Skipping %d quarantined files.\n' % len(quarantined))
+        fpath_list = [fpath for fpath in fpath_list
+                      if fpath not in quarantined]
+    if not fpath_list:
+        return [], outbuf
+    if len(fpath_list) == 1:
+        outpath, outbuf = _read_one(fpath_list[0], policy, outbuf, verbose)
+        return ([] if outpath is None else [outpath]), outbuf
+
+    outbuf.write(b'\nReading %d files in one process.\n'
+                 % len(fpath_list))
+    if verbose:
+        logger.info('Reading %d files in one process.' % len(fpath_list))
+    exec_path = path.join(get_config('SPARSERPATH'), 'save-semantics.sh')
+    timeout = None
+    if policy.timeout is not None:
+        timeout = sum(policy.get_timeout(_get_text_length(fpath))
+                      for fpath in fpath_list)
+    failed = False
+    timed_out = False
+    try:
+        p = subprocess.run([exec_path, '-j'] + fpath_list,
+                           stdout=subprocess.PIPE,
+                           stderr=subprocess.STDOUT,
+                           timeout=timeout)
+        outbuf.write(p.stdout)
+        failed = p.returncode != 0
+    except subprocess.TimeoutExpired as e:
+        outbuf.write(b'Sparser timed out.\n')
+        if e.output:
+            outbuf.write(e.output)
+        failed = True
+        timed_out = True
+
+    outpath_list = []
+    missing = []
+    for fpath in fpath_list:
+        outpath = _get_outpath(fpath)
+        if path.exists(outpath):
+            outpath_list.append(outpath)
+        else:
+            missing.append(fpath)
+
+    # Files are read in order, so the first without output was the one being
+    # read when time ran out.
+    if timed_out and missing:
+        policy.record_timeout(path.basename(missing[0]))
+
+    # Isolate the file(s) that caused the failure.
+    if failed and missing:
+        logger.warning("Sparser failed with %d files unread. Retrying "
+                       "them in smaller batches." % len(missing))
+        if len(missing) > 1:
+            half = len(missing) // 2
+            fpath_sublists = [missing[:half], missing[half:]]
+        else:
+            fpath_sublists = [missing]
+        for fpath_sublist in fpath_sublists:
+            sub_outpaths, outbuf = _read_many(fpath_sublist, policy, outbuf,
+                                              verbose)
+            outpath_list.extend(sub_outpaths)
+    return outpath_list, outbuf
+
+
+def _read_task(task):
+    """Read a file, or a list of files, in a pool worker.
+
+    Only the paths, the policy, and the verbosity are sent to the worker, not
+    the reader, whose results grow as the reading goes on.
+    """
+    fpaths, policy, verbose = task
+    if isinstance(fpaths, list):
+        return _read_many(fpaths, policy, verbose=verbose)
+    outpath, outbuf = _read_one(fpaths, policy, verbose=verbose)
+    return ([] if outpath is None else [outpath]), outbuf
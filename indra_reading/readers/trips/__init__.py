@@ -1,18 +1,21 @@
 import os
-import re
+import queue
+import signal
 import socket
-import random
 import logging
 import threading
 import subprocess as sp
 from os.path import expanduser
 
-from unidecode import unidecode
 from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
 
 from indra.resources.greek_alphabet import greek_alphabet
-from indra_reading.readers.core import Reader
+from indra_reading.readers.core import Reader, statuses
+from indra_reading.readers.normalize import TextNormalizer
+from indra_reading.readers.policy import call_with_deadline, \
+    TIMEOUT_EXCEPTIONS
 
 from indra.sources.trips import client, process_xml
 
@@ -23,67 +26,165 @@ startup_path = '/sw/drum/bin/startup.sh'
 service_endpoint = 'drum'
 DRUM_DOCKER = '292075781285.dkr.ecr.us-east-1.amazonaws.com/drum'
 
+# Collapse whitespace, spell out greek letters, and fold the rest to ASCII.
+text_normalizer = TextNormalizer(greek_alphabet)
+
+
+STARTUP_TIMEOUT = 600
+MAX_STARTUP_ATTEMPTS = 5
+
+_reserved_ports = set()
+_port_lock = threading.Lock()
+
+
+def reserve_free_port():
+    """Get an unused port from the OS, reserved from other callers in this
+    process until it is given to `release_port`.
+
+    The OS picks an ephemeral port by binding to port 0. Ports that are
+    already reserved (e.g. by TRIPS instances still starting up) are skipped.
+    """
+    with _port_lock:
+        while True:
+            with closing(socket.socket(socket.AF_INET,
+                                       socket.SOCK_STREAM)) as sok:
+                sok.bind(('localhost', 0))
+                port = sok.getsockname()[1]
+            if port not in _reserved_ports:
+                _reserved_ports.add(port)
+                return port
+
+
+def release_port(port):
+    """Release a port reserved by `reserve_free_port`."""
+    with _port_lock:
+        _reserved_ports.discard(port)
+    return
+
 
 def find_free_ports():
-    """Find ports that are unused.
+    """Find ports that are unused, reserving each one as it is yielded.
 
-    The order is randomized to minimize the chances of race-condition overlaps.
+    Ports that are not used should be passed to `release_port`.
     """
-    ports = list(range(1, 65536))
-    random.shuffle(ports)
-    for port in ports:
-        with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sok:
-            res = sok.connect_ex(('localhost', port))
-            if res != 0:
-                yield port
+    while True:
+        yield reserve_free_port()
 
 
 class TripsStartupError(Exception):
     pass
 
 
-def _start_trips():
-    # Start trips running
-    for port in find_free_ports():
-        port_failure = False
+def _wait_for_ready(proc, timeout):
+    """Follow the TRIPS log until it is ready, fails, or `timeout` passes.
+
+    Returns
+    -------
+    status : str
+        'ready', 'port_failure', 'failure', or 'timeout'.
+    """
+    outcome = {'status': 'failure'}
+
+    def watch():
+        for log_line in _tail_trips(proc):
+            if 'can\'t bind to port' in log_line:
+                outcome['status'] = 'port_failure'
+            if log_line == 'Ready':
+                # TRIPS is ready to read and we can continue on.
+                outcome['status'] = 'ready'
+                return
+
+    th = threading.Thread(target=watch, daemon=True)
+    th.start()
+    th.join(timeout)
+    if th.is_alive():
+        return 'timeout'
+    return outcome['status']
+
+
+def _start_trips(name=None, startup_timeout=STARTUP_TIMEOUT,
+                 max_attempts=MAX_STARTUP_ATTEMPTS):
+    """Start a TRIPS service on a free port.
+
+    If TRIPS fails to bind its port, or is not ready within
+    `startup_timeout` seconds, it is stopped and started again on another
+    port, up to `max_attempts` times.
+
+    Parameters
+    ----------
+    name : Optional[str]
+        If given, and TRIPS is run using the drum docker, the name of the
+        docker container, so that it can be stopped on its own later.
+    startup_timeout : float
+        The number of seconds to wait for each attempt to be ready.
+    max_attempts : int
+        The number of times to try starting TRIPS.
+
+    Returns
+    -------
+    p : subprocess.Popen
+        The process running TRIPS. When TRIPS is run from within the docker,
+        this process leads its own process group.
+    service_host : str
+        The URL at which the TRIPS service may be queried.
+    port : int
+        The port used, which is reserved until given to `release_port`.
+    """
+    for attempt, port in zip(range(max_attempts), find_free_ports()):
         if os.environ.get("IN_TRIPS_DOCKER", 'false') == 'true':
             logger.info("Attempting to starting up a TRIPS service from "
                         "within the docker on port %d." % port)
             p = sp.Popen([expanduser('~/startup_trips.sh'), str(port)],
-                         stdout=sp.PIPE, stderr=sp.STDOUT)
+                         stdout=sp.PIPE, stderr=sp.STDOUT,
+                         start_new_session=True)
         else:
             logger.info("Starting up a TRIPS service using drum docker.")
-            p = sp.Popen(['docker', 'run', '-it', '-p', '%d:80' % port,
-                          '--entrypoint', '/sw/drum/bin/startup.sh',
-                          DRUM_DOCKER],
+            name_args = [] if name is None else ['--name', name]
+            p = sp.Popen(['docker', 'run', '-it', '--rm', '-p', '%d:80' % port]
+                         + name_args
+                         + ['--entrypoint', '/sw/drum/bin/startup.sh',
+                            DRUM_DOCKER],
                          stdout=sp.PIPE, stderr=sp.STDOUT)
         service_host = 'http://localhost:%d/cgi/' % port
 
         # Wait for the service to be ready
-        for log_line in _tail_trips(p):
-            if 'can\'t bind to port' in 'log_line':
-                port_failure = True
-            if log_line == 'Ready':
-                # TRIPS is ready to read and we can continue on.
-                break
-        else:
-            logger.error("TRIPS failed to start on port %d." % port)
-            if port_failure:
-                # If the failure due to wrong port, try another port.
-                continue
-            else:
-                # Otherwise give up.
-                raise TripsStartupError("Trips failed to start up.")
-
-        # The above for-loop existed without going to else, indicating
-        # successful startup.
-        break
+        status = _wait_for_ready(p, startup_timeout)
+        if status == 'ready':
+            break
+
+        logger.error("TRIPS failed to start on port %d (%s)." % (port, status))
+        _stop_trips_process(p, name)
+        release_port(port)
+        if status == 'failure':
+            # If the failure was not due to the port or a hang, give up.
+            raise TripsStartupError("Trips failed to start up.")
     else:
-        # We exhausted all possible ports.
-        raise TripsStartupError("Could not start TRIPS, all ports appear "
-                                "to be busy.")
+        raise TripsStartupError("Could not start TRIPS in %d attempts."
+                                % max_attempts)
     logger.info("Service has started up.")
-    return p, service_host
+    return p, service_host, port
+
+
+def _stop_trips_process(proc, name=None):
+    """Stop a single TRIPS process started by `_start_trips`."""
+    if proc.poll() is None:
+        if os.environ.get("IN_TRIPS_DOCKER", 'false') == 'true':
+            try:
+                os.killpg(proc.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        elif name is not None:
+            sp.run(['docker', 'kill', name], stdout=sp.DEVNULL,
+                   stderr=sp.DEVNULL)
+        else:
+            proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except sp.TimeoutExpired:
+        logger.warning("TRIPS did not end. Killing it.")
+        proc.kill()
+        proc.wait()
+    return
 
 
 def _kill_trips():
@@ -94,93 +195,234 @@ def _kill_trips():
     $ pkill -f lighttpd
 
     Killing the trips-drum code and the hosting service respectively.
+
+    Note that this will also kill instances started by other readers. To stop
+    a single instance, use `TripsService.stop`.
     """
     sp.run(['pkill', '-f', 'trips-drum'])
     sp.run(['pkill', '-f', 'trips-drum'])
 
 
-class TripsReader(Reader):
-    """A wrapper around the TRIPS reading system."""
-    name = 'TRIPS'
-    result_format = 'xml'
+class TripsService(object):
+    """A single TRIPS/DRUM instance, which may be started and stopped alone.
 
-    def __init__(self, *args, **kwargs):
-        self.version = self.get_version()
-        super(TripsReader, self).__init__(*args, **kwargs)
+    Once started, the TRIPS log is followed by a monitor thread, which marks
+    the service as no longer running when the log ends.
+    """
+    _count = 0
+    _count_lock = threading.Lock()
+
+    def __init__(self):
+        with self._count_lock:
+            TripsService._count += 1
+            self.name = 'trips_%d_%d' % (os.getpid(), TripsService._count)
+        self.proc = None
+        self.service_host = None
+        self.port = None
         self.running = False
         self.stopping = False
+        self._monitor = None
         return
 
-    def _monitor_trips_service(self, proc):
+    def __repr__(self):
+        return '%s(%s, running=%s)' % (self.__class__.__name__,
+                                       self.service_host, self.running)
+
+    def start(self):
+        """Start the TRIPS instance and its monitor."""
+        self.stopping = False
+        self.proc, self.service_host, self.port = _start_trips(self.name)
         self.running = True
-        for _ in _tail_trips(proc):
+        self._monitor = threading.Thread(target=self._monitor_trips_service,
+                                         daemon=True)
+        self._monitor.start()
+        return
+
+    def _monitor_trips_service(self):
+        for _ in _tail_trips(self.proc):
             if self.stopping:
                 logger.info("Got stop signal. Stopping.")
                 break
-        logger.info("Waiting for TRIPS process to join.")
-        try:
-            proc.communicate(timeout=10)
-        except sp.TimeoutExpired:
-            logger.warning("TRIPS did not end.")
-            self.running = False
+        self.running = False
+        if not self.stopping:
+            logger.error("TRIPS at %s stopped unexpectedly."
+                         % self.service_host)
+        return
+
+    def is_alive(self):
+        """Check whether this instance is up and able to read."""
+        return self.running and self.proc is not None \
+            and self.proc.poll() is None
+
+    def query(self, text):
+        """Read a text with this instance, returning the html response."""
+        return client.send_query(text, service_host=self.service_host,
+                                 service_endpoint=service_endpoint)
+
+    def stop(self):
+        """Stop this instance, leaving any other TRIPS instances running."""
+        if self.proc is None:
             return
-        if proc.returncode:
-            logger.error("TRIPS ended with return code %d." % proc.returncode)
-        else:
-            logger.info("TRIPS ended without error.")
-        logger.info("TRIPS is no longer running.")
+        logger.info("Stopping TRIPS at %s." % self.service_host)
+        self.stopping = True
+        _stop_trips_process(self.proc, self.name)
+        if self.proc.returncode:
+            logger.info("TRIPS ended with return code %d."
+                        % self.proc.returncode)
+        if self._monitor is not None:
+            self._monitor.join(timeout=5)
+            if self._monitor.is_alive():
+                logger.warning("Monitor thread did not end.")
+        release_port(self.port)
+        self.proc = None
+        self.port = None
         self.running = False
+        return
 
-    def _read(self, content_iter, verbose=False, log=False, n_per_proc=None):
 
-        # Process all the content.
-        th = None
-        trips_started = False
-        for content in content_iter:
-            if not trips_started:
-                p, service_host = _start_trips()
+class TripsPool(object):
+    """A pool of TRIPS instances, to which texts may be sent concurrently.
 
-                # Set up the trips monitor
-                th = threading.Thread(target=self._monitor_trips_service,
-                                      args=[p])
-                th.start()
-                trips_started = True
+    Each call to `query` takes an idle instance, restarting it first if it
+    has died, and returns it to the pool when the query is done. If a query
+    runs past its deadline, its instance is stopped before it is returned,
+    so a hung instance is restarted rather than kept out of the pool. Only
+    the instances started by this pool are stopped by `stop`. The pool may
+    be used as a context manager.
 
-            if not self.running:
-                logger.error("Breaking loop: trips is down.")
-                break
+    Parameters
+    ----------
+    size : int
+        The number of TRIPS instances to run.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.services = []
+        self._idle = queue.Queue()
+        return
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """Start all the instances of the pool, at the same time.
 
-            # Clean up the text string a bit.
-            # - remove all excess white space.
-            # - remove special greek letters
-            # - remove all special unicode, replace with ascii
-            raw_text = content.get_text()
-            raw_text = re.sub('\s+', ' ', raw_text)
-            for greek_letter, spelled_letter in greek_alphabet.items():
-                raw_text = raw_text.replace(greek_letter, spelled_letter)
-            text = unidecode(raw_text)
-
-            # Process the text
-            html = client.send_query(text, service_host=service_host,
-                                     service_endpoint=service_endpoint)
-            if html:
-                xml = client.get_xml(html)
-                self.add_result(content.get_id(), xml)
-            else:
-                self.add_result(content.get_id(), None)
-
-        # Stop TRIPS if it hasn't stopped already.
-        logger.info("Killing TRIPS")
-        _kill_trips()  # Kill all instances of trips-drum.
-
-        logger.info("Signalling observation loop to stop.")
-        self.stopping = True  # Sends signal to the loop to stop
-
-        if th is not None:
-            logger.info("Waiting for observation loop thread to join.")
-            th.join(timeout=5)
-            if th.is_alive():
-                logger.warning("Thread did not end, TRIPS is still running.")
+        Each instance is made available to `query` as soon as it is ready. If
+        any instance fails to start, the instances that did are stopped, and
+        the error is raised.
+        """
+        num_new = self.size - len(self.services)
+        if num_new <= 0:
+            return
+        new_services = [TripsService() for _ in range(num_new)]
+        self.services.extend(new_services)
+
+        def start_service(service):
+            service.start()
+            self._idle.put(service)
+
+        with ThreadPoolExecutor(max_workers=num_new) as executor:
+            futures = [executor.submit(start_service, service)
+                       for service in new_services]
+            errors = [future.exception() for future in futures]
+        errors = [e for e in errors if e is not None]
+        if errors:
+            logger.error("%d of %d TRIPS instances failed to start. Stopping "
+                         "the pool." % (len(errors), num_new))
+            self.stop()
+            raise errors[0]
+        return
+
+    def query(self, text, timeout=None):
+        """Read a text with the next idle instance of TRIPS.
+
+        If `timeout` is given, the query is abandoned after that many
+        seconds, and the instance that was reading it is stopped.
+        """
+        service = self._idle.get()
+        try:
+            if not service.is_alive():
+                logger.warning("Restarting TRIPS instance %s." % service.name)
+                service.stop()
+                service.start()
+            try:
+                return call_with_deadline(service.query, timeout, text)
+            except TIMEOUT_EXCEPTIONS:
+                logger.warning("TRIPS instance %s timed out, stopping it."
+                               % service.name)
+                service.stop()
+                raise
+        finally:
+            self._idle.put(service)
+
+    def stop(self):
+        """Stop all the instances started by this pool."""
+        for service in self.services:
+            service.stop()
+        self.services = []
+        self._idle = queue.Queue()
+        return
+
+
+class TripsReader(Reader):
+    """A wrapper around the TRIPS reading system.
+
+    A pool of `n_proc` TRIPS instances is started for each reading, and
+    content is sent to all of them concurrently.
+
+    TRIPS queries cannot be given a timeout, so any deadline set by the
+    reader's `policy` is enforced by the pool, from a separate thread, and
+    the instance that timed out is restarted. By default there is no
+    deadline.
+    """
+    name = 'TRIPS'
+    result_format = 'xml'
+    default_timeout = None
+
+    def __init__(self, *args, **kwargs):
+        self.version = self.get_version()
+        super(TripsReader, self).__init__(*args, **kwargs)
+        return
+
+    def _read_one(self, pool, content_id, text):
+        return self.policy.run(lambda timeout: pool.query(text, timeout),
+                               content_id, text_length=len(text))
+
+    def _read(self, content_iter, verbose=False, log=False, n_per_proc=None):
+        # Clean up the text strings a bit.
+        # - remove all excess white space.
+        # - remove special greek letters
+        # - remove all special unicode, replace with ascii
+        texts = {}
+        for content in content_iter:
+            texts[content.get_id()] = text_normalizer(content.get_text())
+        if not texts:
+            return self.results
+
+        # Process the texts.
+        pool_size = min(self.n_proc, len(texts))
+        with TripsPool(pool_size) as pool, \
+                ThreadPoolExecutor(max_workers=pool_size) as executor:
+            futures = {executor.submit(self._read_one, pool, content_id,
+                                       text): content_id
+                       for content_id, text in texts.items()}
+            for future in as_completed(futures):
+                content_id = futures[future]
+                try:
+                    html = future.result()
+                except Exception as e:
+                    logger.error("Failed to read %s: %s" % (content_id, e))
+                    self.set_status(content_id, statuses.FAILED)
+                    continue
+                if html:
+                    xml = client.get_xml(html)
+                    self.add_result(content_id, xml)
+                else:
+                    self.add_result(content_id, None)
 
         return self.results
 
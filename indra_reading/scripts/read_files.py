@@ -1,11 +1,13 @@
 """Read a list of files located in your local directory."""
+import gzip
 import json
 import pickle
 import random
 import logging
 from os import path, listdir
 
-from indra_reading.readers.core import dump_readings
+from indra_reading.readers.core import dump_readings, ReadingStreamWriter, \
+    iter_readings, get_results_parallel
 from indra_reading.util.script_tools import get_parser
 from indra_reading.readers import get_dir, get_reader_classes, Content
 
@@ -42,10 +44,21 @@ def make_parser():
         dest='pickle',
         help='Select to use pickles instead of JSON for the dumps.'
     )
+    parser.add_argument(
+        '-S', '--stream',
+        action='store_true',
+        dest='stream',
+        help=('Stream the readings and statements to gzipped, line-delimited '
+              'JSON files (<output_path>/readings.jsonl.gz and '
+              '<output_path>/stmts.jsonl.gz) as they are produced, so that '
+              'memory use does not grow with the number of files read. This '
+              'cannot be used with --pickle.')
+    )
     return parser
 
 
-def read_files(files, readers, **kwargs):
+def read_files(files, readers, reading_writer=None, chunk_size=1000,
+               **kwargs):
     """Read the files in `files` with the reader objects in `readers`.
 
     Parameters
@@ -55,33 +68,110 @@ def read_files(files, readers, **kwargs):
         limited to text and nxml files.
     readers : list [Reader instances]
         A list of Reader objects to be used reading the files.
+    reading_writer : Optional[ReadingStreamWriter]
+        If given, the files are given to each reader `chunk_size` at a time,
+        and the readings of each chunk are written to this writer as soon as
+        it has been read, and are not accumulated in the returned list, so
+        memory use does not grow with the number of files.
+    chunk_size : int
+        The number of files read at a time when streaming to a
+        `reading_writer`. Default is 1000.
     **kwargs :
         Other keyword arguments are passed to the `read` method of the readers.
 
     Returns
     -------
     output_list : list [ReadingData]
-        A list of ReadingData objects with the contents of the readings.
+        A list of ReadingData objects with the contents of the readings. This
+        will be empty if a `reading_writer` was given.
     """
-    reading_content = [Content.from_file(filepath) for filepath in files]
+    if reading_writer is None:
+        file_chunks = [files]
+    else:
+        file_chunks = [files[i:i+chunk_size]
+                       for i in range(0, len(files), chunk_size)]
     output_list = []
+    num_readings = 0
     for reader in readers:
-        res_list = reader.read(reading_content, **kwargs)
-        if res_list is None:
+        num_reader_readings = 0
+        for file_chunk in file_chunks:
+            reading_content = [Content.from_file(filepath)
+                               for filepath in file_chunk]
+            res_list = reader.read(reading_content, **kwargs)
+            if res_list is None:
+                continue
+            num_reader_readings += len(res_list)
+            if reading_writer is not None:
+                reading_writer.write_all(res_list)
+                reader.reset()
+            else:
+                output_list += res_list
+        if not num_reader_readings:
             logger.warning("No readings produced by %s." % reader.name)
         else:
             logger.info("Produced %d readings with %s."
-                        % (len(res_list), reader.name))
-            output_list += res_list
+                        % (num_reader_readings, reader.name))
+            num_readings += num_reader_readings
     logger.info("Produced %d readings across %d readers."
-                % (len(output_list), len(readers)))
+                % (num_readings, len(readers)))
     return output_list
 
 
+def stream_statements(reading_path, stmts_path, add_metadata=False,
+                      n_proc=1, batch_size=1000):
+    """Write the statements from a stream of readings one line at a time.
+
+    Parameters
+    ----------
+    reading_path : str
+        The path to a line-delimited JSON file of readings, as written by a
+        `ReadingStreamWriter`.
+    stmts_path : str
+        The path to which the statement JSONs will be written, one per line.
+        If the path ends with '.gz' the file will be gzipped.
+    add_metadata : bool
+        If True, add the reader and content ID to the evidence of each
+        Statement.
+    n_proc : int
+        The number of processes used to produce the statements.
+    batch_size : int
+        The number of readings loaded and processed at a time.
+
+    Returns
+    -------
+    num_stmts : int
+        The number of statements written.
+    """
+    num_stmts = 0
+    opener = gzip.open if stmts_path.endswith('.gz') else open
+    with opener(stmts_path, 'wt') as f:
+        def write_batch(batch):
+            n = 0
+            results = get_results_parallel(batch, n_proc,
+                                           add_metadata=add_metadata)
+            for _, stmts in results:
+                for stmt in stmts:
+                    f.write(json.dumps(stmt.to_json()) + '\n')
+                    n += 1
+            return n
+
+        batch = []
+        for rd in iter_readings(reading_path):
+            batch.append(rd)
+            if len(batch) >= batch_size:
+                num_stmts += write_batch(batch)
+                batch = []
+        if batch:
+            num_stmts += write_batch(batch)
+    return num_stmts
+
+
 def main():
     # Load arguments.
     parser = make_parser()
     args = parser.parse_args()
+    if args.stream and args.pickle:
+        parser.error("The --stream and --pickle options are incompatible.")
     if args.debug and not args.quiet:
         logger.setLevel(logging.DEBUG)
 
@@ -122,6 +212,22 @@ def main():
                for reader_class in get_reader_classes()
                if reader_class.name.lower() in args.readers]
 
+    # If streaming, read the files straight into the dump, and likewise
+    # produce the statements one reading at a time.
+    if args.stream:
+        reading_out_path = path.join(args.output_path, 'readings.jsonl.gz')
+        with ReadingStreamWriter(reading_out_path) as writer:
+            read_files(file_list, readers, reading_writer=writer,
+                       verbose=verbose)
+        print("Reading outputs stored in %s." % reading_out_path)
+
+        stmts_dump_path = path.join(args.output_path, 'stmts.jsonl.gz')
+        num_stmts = stream_statements(reading_out_path, stmts_dump_path,
+                                      add_metadata=args.add_metadata,
+                                      n_proc=args.n_proc)
+        print("Stored %d statements in %s." % (num_stmts, stmts_dump_path))
+        return
+
     # Read the files.
     outputs = read_files(file_list, readers, verbose=verbose)
 
@@ -138,8 +244,9 @@ def main():
 
     # Generate and dump the statements.
     stmts_dump_path = path.join(args.output_path, 'stmts')
-    stmt_gen = (s for rd in outputs
-                for s in rd.get_results(add_metadata=args.add_metadata))
+    results = get_results_parallel(outputs, args.n_proc,
+                                   add_metadata=args.add_metadata)
+    stmt_gen = (s for _, stmts in results for s in stmts)
     if args.pickle:
         stmts_dump_path += ".pkl"
         stmts_json = list(stmt_gen)
@@ -101,6 +101,11 @@ def create_read_parser():
         type=int,
         help="Set the amount of time to wait between job submissions in secs."
     )
+    parent_read_parser.add_argument(
+        '--checkpoint_file',
+        help=('Record the jobs submitted in this file, and skip any jobs '
+              'already recorded in it, to resume an interrupted submission.')
+    )
     ''' Not currently supported.
     parent_read_parser.add_argument(
         '--num_tries',
@@ -168,6 +173,7 @@ if __name__ == '__main__':
     sub.set_options(args.force_read, args.force_fulltext)
     if args.job_type in ['read', 'full']:
         sub.submit_reading(args.input_file, args.start_ix, args.end_ix,
-                           args.ids_per_job)
+                           args.ids_per_job,
+                           checkpoint_file=args.checkpoint_file)
     if args.job_type in ['combine', 'full']:
         sub.submit_combine()
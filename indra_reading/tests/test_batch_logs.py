@@ -0,0 +1,43 @@
+import gzip
+from os import path
+import tempfile
+
+from indra_reading.batch.fake_client import FakeBatchClient, FakeLogsClient
+from indra_reading.batch.logs import LogTailer, LocalLogSink
+
+
+def test_log_tailer():
+    batch_client = FakeBatchClient()
+    logs_client = FakeLogsClient(page_size=3)
+    job = batch_client.submit_job('test_job', 'test-queue', 'def')
+    tailer = LogTailer(job, batch_client, logs_client)
+
+    # There is no log until the job runs.
+    assert tailer.fetch() == []
+    batch_client.set_status(job['jobId'], 'RUNNING')
+    stream = batch_client.get_log_stream_name(job['jobId'])
+    logs_client.put_events(stream, ['line %d' % i for i in range(5)])
+    assert len(tailer.fetch()) == 5
+    assert tailer.fetch() == []
+
+    # Only the new events are fetched.
+    num_calls = logs_client.calls['GetLogEvents']
+    logs_client.put_events(stream, ['line 5'])
+    new_lines = tailer.fetch()
+    assert len(new_lines) == 1 and new_lines[0].endswith('line 5\n')
+    assert logs_client.calls['GetLogEvents'] - num_calls == 2
+    assert len(tailer) == 6 and len(tailer.pop_lines()) == 6
+    assert not tailer.lines
+
+
+def test_local_log_sink():
+    dirname = tempfile.mkdtemp()
+    sink = LocalLogSink(dirname)
+    sink.append('test_job', ['a\n', 'b\n'])
+    sink.append('test_job', ['c\n'])
+    assert sink.num_chunks['test_job'] == 2
+    final_path = sink.finalize('test_job', 'SUCCESS')
+    assert not path.exists(sink.get_path('test_job'))
+    with gzip.open(final_path, 'rt') as f:
+        assert f.read() == 'a\nb\nc\n'
+    assert sink.finalize('other_job', 'FAILURE') is None
@@ -0,0 +1,44 @@
+from indra_reading.batch.fake_client import FakeBatchClient, FakeLogsClient
+from indra_reading.batch.monitor import BatchMonitor
+
+
+def test_poll_jobs():
+    client = FakeBatchClient(page_size=10)
+    job_list = [client.submit_job('test_job_%d' % i, 'test-queue', 'def')
+                for i in range(25)]
+    client.submit_job('other_job', 'test-queue', 'def')
+    monitor = BatchMonitor('test-queue', job_list, batch_client=client,
+                           logs_client=FakeLogsClient())
+    monitor.job_id_list = [job['jobId'] for job in job_list]
+
+    # All the pages of each status are listed.
+    jobs_by_status = monitor.poll_jobs()
+    assert len(jobs_by_status['SUBMITTED']) == 25, jobs_by_status
+    assert not client.calls['DescribeJobs'], client.calls
+
+    # Jobs that finish are described only once.
+    for job in job_list[:15]:
+        client.set_status(job['jobId'], 'SUCCEEDED')
+    client.set_status(job_list[15]['jobId'], 'FAILED')
+    jobs_by_status = monitor.poll_jobs()
+    assert len(jobs_by_status['SUCCEEDED']) == 15, jobs_by_status
+    assert len(jobs_by_status['FAILED']) == 1, jobs_by_status
+    assert len(jobs_by_status['SUBMITTED']) == 9, jobs_by_status
+    assert client.calls['DescribeJobs'] == 1, client.calls
+
+    monitor.poll_jobs()
+    assert client.calls['DescribeJobs'] == 1, client.calls
+
+
+def test_watch_and_wait():
+    client = FakeBatchClient()
+    job_list = [client.submit_job('test_job_%d' % i, 'test-queue', 'def')
+                for i in range(3)]
+    for job in job_list:
+        client.set_status(job['jobId'], 'SUCCEEDED')
+    monitor = BatchMonitor('test-queue', job_list, batch_client=client,
+                           logs_client=FakeLogsClient())
+    result_record = {}
+    assert monitor.watch_and_wait(poll_interval=0,
+                                  result_record=result_record) == 0
+    assert len(result_record['succeeded']) == 3, result_record
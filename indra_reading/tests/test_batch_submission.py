@@ -0,0 +1,37 @@
+import tempfile
+from os import path
+
+from indra_reading.batch.fake_client import FakeBatchClient
+from indra_reading.batch.submission import SubmissionEngine
+
+
+def _iter_jobs(num_jobs):
+    for i in range(num_jobs):
+        yield {'jobName': 'test_job_%d' % i, 'jobQueue': 'test-queue',
+               'jobDefinition': 'def'}
+
+
+def test_submission_engine():
+    checkpoint_file = path.join(tempfile.mkdtemp(), 'submitted.jsonl')
+    client = FakeBatchClient()
+
+    # Throttled submissions are retried, and slow the rate down.
+    client.throttle('SubmitJob', 3)
+    engine = SubmissionEngine(client, num_threads=4, rate=1000, backoff=0.01,
+                              checkpoint_file=checkpoint_file)
+    jobs = list(engine.submit_all(_iter_jobs(20),
+                                  keep_going=lambda: len(client.jobs) < 10))
+    assert engine.num_throttled == 3, engine
+    assert engine.rate < 1000, engine
+    assert len(jobs) == len(client.jobs) >= 10, len(jobs)
+    num_first = len(jobs)
+
+    # Resuming from the checkpoint does not submit any job twice.
+    engine = SubmissionEngine(client, checkpoint_file=checkpoint_file,
+                              rate=1000)
+    jobs = list(engine.submit_all(_iter_jobs(20)))
+    assert len(jobs) == 20 and len(client.jobs) == 20, len(client.jobs)
+    assert len({job['jobId'] for _, job in jobs}) == 20
+    report = engine.get_report()
+    assert report['resumed'] == num_first, report
+    assert report['submitted'] == 20 - num_first, report
@@ -0,0 +1,29 @@
+import re
+import html
+
+from indra_reading.readers.normalize import TextNormalizer, collapse_whitespace
+
+
+def test_mti_sanitize():
+    normalizer = TextNormalizer(whitespace='newlines', non_ascii=' ',
+                                unescape_html=True)
+    for text in ['MEK &amp; ERK\nbind.', 'Naïve  cells\n\n',
+                 'TGF-β\nβ and éé', 'plain text']:
+        expected = re.sub(r'[^\x00-\x7F]+', ' ',
+                          re.sub(r'\n', ' ', html.unescape(text)))
+        assert normalizer(text) == expected, (text, normalizer(text))
+
+
+def test_replacements():
+    normalizer = TextNormalizer({'β': 'beta', 'γ': 'gamma'},
+                                non_ascii=None)
+    assert normalizer('TGF-β \n\t and  PI3Kγé') \
+        == 'TGF-beta and PI3Kgammaé'
+
+    normalizer = TextNormalizer({'β': 'beta'}, non_ascii='?')
+    assert normalizer('TGF-βéé   x') == 'TGF-beta? x'
+
+
+def test_collapse_whitespace():
+    for text in ['', ' ', '\n\t ', ' a  b\n', 'a\xa0\xa0b', 'ab']:
+        assert collapse_whitespace(text) == re.sub(r'\s+', ' ', text), text
@@ -0,0 +1,28 @@
+from indra_reading.readers.cache import MemoryReadingCache
+from indra_reading.readers.content import Content
+from indra_reading.readers.preprocess import ContentConverter
+
+
+def _fail_on_bad(text):
+    if 'bad' in text:
+        raise ValueError('Cannot convert.')
+    return text.upper()
+
+
+def test_content_converter():
+    cache = MemoryReadingCache()
+    for n_proc in [1, 2]:
+        converter = ContentConverter(_fail_on_bad, 'nxml', 'txt',
+                                     n_proc=n_proc, cache=cache)
+        contents = [Content.from_string('1', 'nxml', 'mek binds erk'),
+                    Content.from_string('2', 'nxml', 'bad input'),
+                    Content.from_string('3', 'txt', 'already text')]
+        converted = dict(converter.iter_convert(contents))
+        assert set(converted.keys()) == {'1', '2', '3'}, converted
+        assert converted['1'].get_text() == 'MEK BINDS ERK'
+        assert converted['1'].is_format('txt')
+        assert converted['2'] is None
+        assert converted['3'].get_text() == 'already text'
+
+    # The second time around, the first text came from the cache.
+    assert cache.hits == 1, cache
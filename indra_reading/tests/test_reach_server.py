@@ -0,0 +1,36 @@
+from unittest import mock
+
+import requests
+
+from indra_reading.readers.content import Content
+from indra_reading.readers.policy import ExecutionPolicy, ReadingTimeout, \
+    QuarantinedError
+from indra_reading.readers.reach import ReachReader
+
+
+def test_server_timeouts_are_quarantined():
+    # Make a reader without starting anything.
+    reader = ReachReader.__new__(ReachReader)
+    reader.server_port = 8080
+    reader.server_read_timeout = 600
+    reader.policy = ExecutionPolicy(timeout=1, max_retries=1, backoff=0,
+                                    quarantine_after=2)
+    content = Content.from_string('1', 'txt', 'MEK phosphorylates ERK.')
+
+    with mock.patch('requests.post',
+                    side_effect=requests.exceptions.ReadTimeout()) as post:
+        try:
+            reader._read_one_with_server(content)
+            assert False, "Expected a timeout."
+        except ReadingTimeout:
+            pass
+        assert post.call_count == 2, post.call_count
+        assert '1' in reader.policy.quarantined, reader.policy
+
+        # A quarantined document is not sent to the server again.
+        try:
+            reader._read_one_with_server(content)
+            assert False, "Expected the document to be quarantined."
+        except QuarantinedError:
+            pass
+        assert post.call_count == 2, post.call_count
@@ -0,0 +1,178 @@
+import time
+import pickle
+import tempfile
+from os import path
+
+from indra_reading.readers.core import Reader, ReadingData, statuses, \
+    ReadingStreamWriter, dump_readings_stream, iter_readings
+from indra_reading.readers.cache import MemoryReadingCache, DiskReadingCache
+from indra_reading.readers.content import Content
+from indra_reading.readers.policy import ExecutionPolicy, ReadingTimeout, \
+    QuarantinedError
+
+
+class _StubReader(Reader):
+    """A trivial reader that "reads" content by echoing its text."""
+    name = 'STUB'
+
+    @classmethod
+    def get_version(cls):
+        return '0.0'
+
+    def _read(self, content_iter, verbose=False, log=False):
+        for content in content_iter:
+            if self._check_content(content) is not None:
+                continue
+            if 'fail' in content.get_text():
+                self.set_status(content.get_id(), statuses.FAILED)
+                continue
+            self.add_result(content.get_id(), {'text': content.get_text()})
+        return self.results
+
+    @staticmethod
+    def parse_results(content):
+        return None
+
+
+def _make_readings(n):
+    return [ReadingData(i, _StubReader, '0.0', 'json', {'n': i})
+            for i in range(n)]
+
+
+def test_reading_stream_round_trip():
+    tmp_dir = tempfile.mkdtemp()
+    for fname in ['readings.jsonl', 'readings.jsonl.gz']:
+        fpath = path.join(tmp_dir, fname)
+        n = dump_readings_stream(iter(_make_readings(5)), fpath)
+        assert n == 5, n
+
+        # Appending should add to, not replace, the existing readings.
+        with ReadingStreamWriter(fpath, append=True) as writer:
+            writer.write(ReadingData(5, _StubReader, '0.0', 'json', None))
+
+        loaded = list(iter_readings(fpath))
+        assert [rd.content_id for rd in loaded] == list(range(6)), loaded
+        assert all(rd.reader_class is _StubReader for rd in loaded)
+        assert loaded[3].reading == {'n': 3}
+        assert loaded[5].reading is None
+
+
+def test_reading_cache():
+    for cache in [MemoryReadingCache(),
+                  DiskReadingCache(path.join(tempfile.mkdtemp(), 'cache'))]:
+        reader = _StubReader(base_dir=tempfile.mkdtemp(), cache=cache)
+        contents = [Content.from_string('1', 'txt', 'MEK binds ERK.'),
+                    Content.from_string('2', 'txt', 'ERK binds MEK.')]
+        reader.read(contents)
+        assert cache.hits == 0 and len(cache) == 2, cache
+
+        # The same text under a different ID should not reach the reader.
+        reader.reset()
+        read_ids = []
+        orig_read = reader._read
+
+        def _read(content_iter, verbose=False, log=False):
+            content_list = list(content_iter)
+            read_ids.extend(c.get_id() for c in content_list)
+            return orig_read(content_list, verbose, log)
+
+        reader._read = _read
+        contents = [Content.from_string('3', 'txt', 'MEK binds ERK.'),
+                    Content.from_string('4', 'txt', 'RAS binds RAF.')]
+        results = reader.read(contents)
+        assert read_ids == ['4'], read_ids
+        assert cache.hits == 1, cache
+        assert {rd.content_id: rd.reading['text'] for rd in results} \
+            == {3: 'MEK binds ERK.', 4: 'RAS binds RAF.'}, results
+
+
+def test_memory_cache_eviction():
+    cache = MemoryReadingCache(max_bytes=100)
+    for i in range(10):
+        cache.put('key%d' % i, {'text': 'x' * 50, 'i': i})
+    assert len(cache) < 10
+    assert cache.get('key9') == {'text': 'x' * 50, 'i': 9}
+    assert cache.get('key0') is None
+
+    # The cache may be sent to pool workers.
+    cache_copy = pickle.loads(pickle.dumps(cache))
+    assert cache_copy.get('key9') == {'text': 'x' * 50, 'i': 9}
+
+
+def test_check_content():
+    reader = _StubReader(base_dir=tempfile.mkdtemp(), input_character_limit=20,
+                         max_non_ascii_ratio=0.2)
+
+    # Over-long files are rejected from their size, without being loaded.
+    fpath = path.join(tempfile.mkdtemp(), 'long.txt')
+    with open(fpath, 'w') as f:
+        f.write('MEK phosphorylates ERK. ' * 10)
+    content = Content.from_file(fpath)
+    assert reader._check_content(content).startswith('too long')
+    assert content._text is None
+
+    content = Content.from_string('1', 'txt', 'MEK binds ERK.')
+    assert reader._check_content(content) is None
+    assert content.get_stats()['length'] == 14, content.get_stats()
+    assert content.get_stats(5)['sample_length'] == 5
+    assert content.get_stats(10)['sample_length'] == 10
+
+    assert reader._check_content('a  b    c').startswith('space-ratio')
+    assert reader._check_content('αβγ binds x') \
+        .startswith('non-ascii-ratio')
+    assert reader._check_content('') == 'empty'
+
+
+def test_read_summary():
+    reader = _StubReader(base_dir=tempfile.mkdtemp(), input_character_limit=20)
+    contents = [Content.from_string('1', 'txt', 'MEK binds ERK.'),
+                Content.from_string('2', 'txt', 'This will fail.'),
+                Content.from_string('3', 'txt', 'This is much too long.')]
+    results = reader.read(contents)
+    assert len(results) == 3, results
+    assert reader.result_status == {1: statuses.READ, 2: statuses.FAILED,
+                                    3: statuses.SKIPPED}, reader.result_status
+    assert reader.get_result('3').reading is None
+    assert reader.summary['num_input'] == 3, reader.summary
+    assert reader.summary['statuses'] == {statuses.READ: 1,
+                                          statuses.FAILED: 1,
+                                          statuses.SKIPPED: 1}, reader.summary
+    assert not reader.summary['unexpected_ids'], reader.summary
+
+
+def test_execution_policy():
+    policy = ExecutionPolicy(timeout=1, timeout_per_char=0.01, max_timeout=5,
+                             max_retries=2, backoff=0, quarantine_after=2)
+    assert policy.get_timeout(100) == 2
+    assert policy.get_timeout(10000) == 5
+
+    # Failures are retried, until one attempt succeeds.
+    attempts = []
+
+    def flaky(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise ValueError('Try again.')
+        return 'done'
+
+    assert policy.run(flaky, 'a', text_length=100) == 'done'
+    assert attempts == [2, 2, 2], attempts
+
+    # Documents that keep timing out are quarantined.
+    policy = ExecutionPolicy(timeout=0.05, max_retries=3, backoff=0,
+                             quarantine_after=2)
+    try:
+        policy.run(lambda timeout: time.sleep(1), 'b', enforce=True)
+        assert False, "Should have timed out."
+    except QuarantinedError:
+        pass
+    assert policy.timeout_counts['b'] == 2
+    assert policy.is_quarantined('b')
+
+    policy = ExecutionPolicy(timeout=0.05, quarantine_after=None)
+    try:
+        policy.run(lambda timeout: time.sleep(1), 'c', enforce=True)
+        assert False, "Should have timed out."
+    except ReadingTimeout:
+        pass
+    assert not policy.is_quarantined('c')
@@ -0,0 +1,120 @@
+"""Benchmark text normalization against the step-by-step cleaning it replaced.
+
+The TRIPS reader used to collapse whitespace, replace each greek letter in
+turn, and then apply `unidecode`, while MTI unescaped HTML and then made two
+regex passes. Both are compared here to the `TextNormalizer` that replaces
+them, on texts built by repeating a sample paragraph.
+
+For example, to time texts of 1k, 10k, and 100k characters:
+
+    python -m indra_reading.util.benchmark_normalize -n 1000 10000 100000
+"""
+import re
+import html
+import json
+import time
+from argparse import ArgumentParser
+
+from unidecode import unidecode
+from indra.resources.greek_alphabet import greek_alphabet
+
+from indra_reading.readers.normalize import TextNormalizer
+
+
+SAMPLE_TEXT = ('We found that TGF-β activates MEK and ERK, and that '
+               'the  effect  is  lost in cells lacking PI3Kγ.\n'
+               'Naïve T cells (n = 12) showed 5 ± 2% &lt; '
+               'baseline.\n')
+
+
+def legacy_trips_normalize(text):
+    """Clean text the way TripsReader did before TextNormalizer."""
+    text = re.sub(r'\s+', ' ', text)
+    for greek_letter, spelled_letter in greek_alphabet.items():
+        text = text.replace(greek_letter, spelled_letter)
+    return unidecode(text)
+
+
+def legacy_mti_sanitize(text):
+    """Clean text the way MTI's sanitize_text did before TextNormalizer."""
+    text = html.unescape(text)
+    text = re.sub(r'\n', ' ', text)
+    text = re.sub(r'[^\x00-\x7F]+', ' ', text)
+    return text
+
+
+def time_func(func, texts, repeats=3):
+    """Get the best time, in seconds, for `func` to process all `texts`."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark_normalize(text_length, num_texts=100):
+    """Time the legacy and new normalization of texts of a given length.
+
+    Returns
+    -------
+    times : dict
+        The best time for each method, and whether the outputs matched.
+    """
+    text = (SAMPLE_TEXT * (text_length // len(SAMPLE_TEXT) + 1))[:text_length]
+    texts = [text] * num_texts
+    trips_normalizer = TextNormalizer(greek_alphabet)
+    mti_normalizer = TextNormalizer(whitespace='newlines', non_ascii=' ',
+                                    unescape_html=True)
+    return {
+        'trips_legacy': time_func(legacy_trips_normalize, texts),
+        'trips_new': time_func(trips_normalizer, texts),
+        'trips_match': legacy_trips_normalize(text) == trips_normalizer(text),
+        'mti_legacy': time_func(legacy_mti_sanitize, texts),
+        'mti_new': time_func(mti_normalizer, texts),
+        'mti_match': legacy_mti_sanitize(text) == mti_normalizer(text),
+    }
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '-n', '--lengths',
+        type=int,
+        default=[1000, 10000, 100000],
+        nargs='+',
+        help='The lengths of the texts to normalize.'
+    )
+    parser.add_argument(
+        '-t', '--num_texts',
+        type=int,
+        default=100,
+        help='The number of texts of each length to normalize.'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='Optionally dump the results as JSON to this file.'
+    )
+    args = parser.parse_args()
+
+    cols = ['trips_legacy', 'trips_new', 'trips_match', 'mti_legacy',
+            'mti_new', 'mti_match']
+    print(('%8s' + ' %13s' * len(cols)) % (('length',) + tuple(cols)))
+    all_times = []
+    for length in args.lengths:
+        times = benchmark_normalize(length, args.num_texts)
+        print(('%8d' + ' %13s' * len(cols))
+              % ((length,) + tuple(times[c] if isinstance(times[c], bool)
+                                   else '%.4f' % times[c] for c in cols)))
+        all_times.append({'length': length, 'times': times})
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(all_times, f, indent=2)
+    return
+
+
+if __name__ == '__main__':
+    main()
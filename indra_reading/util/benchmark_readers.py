@@ -0,0 +1,335 @@
+"""Benchmark the python glue surrounding the readers, using stub readers.
+
+The real readers need JARs, Docker, or network access, and their run time is
+dominated by the reading itself. The stub readers defined here imitate the
+file outputs of REACH (three JSON files per paper), Sparser (one
+`-semantics.json` file per paper) and ISI (one JSON file per paper) at a
+configurable latency per paper, so the overhead of `prep_input`,
+`get_output`, `add_result`, `_map_id`, the bookkeeping in `Reader.read`, and
+`ReadingData.get_results` can be measured on its own.
+
+For example, to benchmark all the stubs on 1k, 10k, and 100k documents:
+
+    python -m indra_reading.util.benchmark_readers -n 1000 10000 100000
+"""
+import re
+import json
+import time
+import glob
+import shutil
+import logging
+import tempfile
+from os import path, remove, listdir
+from functools import wraps
+from argparse import ArgumentParser
+from collections import defaultdict
+
+from indra_reading.readers.core import Reader
+from indra_reading.readers.content import Content
+from indra_reading.readers.util import get_dir
+
+logger = logging.getLogger(__name__)
+
+
+SAMPLE_TEXT = ('We found that MEK phosphorylates ERK in the presence of RAS, '
+               'and that this phosphorylation is inhibited by vemurafenib. ')
+
+
+class _StubEvidence(object):
+    def __init__(self):
+        self.text_refs = {}
+
+
+class _StubStatement(object):
+    def __init__(self):
+        self.evidence = [_StubEvidence()]
+
+
+class _StubProcessor(object):
+    def __init__(self, num_stmts):
+        self.statements = [_StubStatement() for _ in range(num_stmts)]
+
+
+class StubReader(Reader):
+    """A parent for readers that imitate the outputs of real readers.
+
+    Parameters
+    ----------
+    latency : float
+        The number of seconds each paper takes to "read". Default is 0.
+    null_every : int or None
+        If given, every `null_every`-th paper produces no output, so that the
+        filling of null results is exercised. Default is 10.
+    """
+    name = NotImplemented
+    stmts_per_reading = 2
+
+    def __init__(self, *args, latency=0.0, null_every=10, **kwargs):
+        super(StubReader, self).__init__(*args, **kwargs)
+        self.latency = latency
+        self.null_every = null_every
+        self.output_dir = get_dir(self.tmp_dir, 'output')
+        return
+
+    @classmethod
+    def get_version(cls):
+        return 'stub'
+
+    def _produces_output(self, idx):
+        if self.latency:
+            time.sleep(self.latency)
+        return not self.null_every or (idx + 1) % self.null_every
+
+    @classmethod
+    def parse_results(cls, content):
+        return _StubProcessor(cls.stmts_per_reading)
+
+
+class StubReachReader(StubReader):
+    """Imitate REACH: one input file, and three output JSON files, per paper.
+    """
+    name = 'STUB_REACH'
+
+    def prep_input(self, content_iter):
+        for content in content_iter:
+            quality_issue = self._check_content(content)
+            if quality_issue is not None:
+                continue
+            content.copy_to(self.input_dir)
+        return
+
+    def get_output(self):
+        json_files = glob.glob(path.join(self.output_dir, '*.json'))
+        json_prefixes = set()
+        for json_file in json_files:
+            prefix = '.'.join(path.basename(json_file).split('.')[:-3])
+            json_prefixes.add(path.join(self.output_dir, prefix))
+        for prefix in json_prefixes:
+            json_dict = {}
+            for filetype in ['entities', 'events', 'sentences']:
+                fname = prefix + '.uaz.' + filetype + '.json'
+                with open(fname, 'rt') as f:
+                    json_dict[filetype] = json.load(f)
+                remove(fname)
+            self.add_result(path.basename(prefix), json_dict)
+        return self.results
+
+    def _read(self, content_iter, verbose=False, log=False):
+        self.prep_input(content_iter)
+        for idx, fname in enumerate(sorted(listdir(self.input_dir))):
+            if not self._produces_output(idx):
+                continue
+            prefix = path.join(self.output_dir, path.splitext(fname)[0])
+            for filetype in ['entities', 'events', 'sentences']:
+                with open(prefix + '.uaz.' + filetype + '.json', 'w') as f:
+                    json.dump({'frames': [{'type': filetype, 'text': fname}]},
+                              f)
+        ret = self.get_output()
+        for fname in listdir(self.input_dir):
+            remove(path.join(self.input_dir, fname))
+        return ret
+
+
+class StubSparserReader(StubReader):
+    """Imitate Sparser: PMC-prefixed nxml inputs, `-semantics.json` outputs.
+    """
+    name = 'STUB_SPARSER'
+
+    def prep_input(self, content_iter):
+        self.file_list = []
+        for content in content_iter:
+            quality_issue = self._check_content(content)
+            if quality_issue is not None:
+                continue
+            content.change_id('PMC' + str(content.get_id()))
+            content.change_format('nxml')
+            self.file_list.append(content.copy_to(self.tmp_dir))
+        return
+
+    def _map_id(self, content_id):
+        if isinstance(content_id, str) and content_id.startswith('PMC'):
+            content_id = content_id[3:]
+        return super(StubSparserReader, self)._map_id(content_id)
+
+    def get_output(self, output_files):
+        patt = re.compile(r'(.*?)-semantics.*?')
+        for outpath in output_files:
+            with open(outpath, 'rt') as f:
+                reading = json.load(f)
+            content_id = patt.match(path.basename(outpath)).groups()[0]
+            self.add_result(content_id, reading)
+            remove(outpath)
+            remove(outpath.replace('-semantics.json', '.nxml'))
+        return self.results
+
+    def _read(self, content_iter, verbose=False, log=False):
+        self.prep_input(content_iter)
+        output_files = []
+        for idx, fpath in enumerate(self.file_list):
+            if not self._produces_output(idx):
+                continue
+            outpath = fpath.replace('.nxml', '-semantics.json')
+            with open(outpath, 'w') as f:
+                json.dump([{'type': 'sentence', 'text': fpath}], f)
+            output_files.append(outpath)
+        return self.get_output(output_files)
+
+
+class StubIsiReader(StubReader):
+    """Imitate ISI: preprocessed inputs, then one output JSON per paper."""
+    name = 'STUB_ISI'
+
+    def prep_input(self, content_iter):
+        self.input_ids = []
+        for content in content_iter:
+            quality_issue = self._check_content(content)
+            if quality_issue is not None:
+                continue
+            fpath = path.join(self.input_dir, '%s.txt' % content.get_id())
+            with open(fpath, 'w') as f:
+                f.write(content.get_text())
+            self.input_ids.append(content.get_id())
+        return
+
+    def get_output(self):
+        for cid in self.input_ids:
+            fname = path.join(self.output_dir, '%s.json' % cid)
+            if not path.exists(fname):
+                continue
+            with open(fname, 'r') as f:
+                content = json.load(f)
+            self.add_result(cid, content)
+        return self.results
+
+    def _read(self, content_iter, verbose=False, log=False):
+        self.prep_input(content_iter)
+        for idx, cid in enumerate(self.input_ids):
+            if not self._produces_output(idx):
+                continue
+            with open(path.join(self.output_dir, '%s.json' % cid), 'w') as f:
+                json.dump({cid: [['MEK', 'ERK', 'phosphorylation']]}, f)
+        return self.get_output()
+
+
+STUB_READERS = {'reach': StubReachReader, 'sparser': StubSparserReader,
+                'isi': StubIsiReader}
+
+
+class PhaseTimer(object):
+    """Accumulate the time spent in selected methods of an object."""
+    def __init__(self):
+        self.times = defaultdict(float)
+        self.counts = defaultdict(int)
+        return
+
+    def wrap(self, obj, method_name):
+        """Replace a method of `obj` with a timed version of it."""
+        method = getattr(obj, method_name)
+
+        @wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.times[method_name] += time.perf_counter() - start
+                self.counts[method_name] += 1
+
+        setattr(obj, method_name, timed)
+        return
+
+
+def benchmark_reader(reader_class, num_docs, latency=0.0, null_every=10):
+    """Time each stage of reading `num_docs` documents with a stub reader.
+
+    Note that the time given for methods which call other timed methods
+    (e.g. `get_output` calls `add_result`, which calls `_map_id`) includes
+    the time of those other methods.
+
+    Returns
+    -------
+    times : dict
+        The total number of seconds spent in each stage, keyed by name. The
+        `read_bookkeeping` entry is the time `read` spent outside of `_read`,
+        mostly filling in null results.
+    """
+    base_dir = tempfile.mkdtemp(prefix='reader_benchmark_')
+    try:
+        reader = reader_class(base_dir=base_dir, latency=latency,
+                              null_every=null_every)
+        timer = PhaseTimer()
+        for method_name in ['prep_input', 'get_output', 'add_result',
+                            '_map_id', '_read']:
+            timer.wrap(reader, method_name)
+
+        contents = [Content.from_string(str(i), 'txt', SAMPLE_TEXT)
+                    for i in range(num_docs)]
+        start = time.perf_counter()
+        results = reader.read(contents)
+        read_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for rd in results:
+            rd.get_results(add_metadata=True)
+        get_results_time = time.perf_counter() - start
+
+        times = dict(timer.times)
+        times['read'] = read_time
+        times['read_bookkeeping'] = read_time - times['_read']
+        times['get_results'] = get_results_time
+    finally:
+        shutil.rmtree(base_dir)
+    return times
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '-r', '--readers',
+        choices=list(STUB_READERS.keys()),
+        default=list(STUB_READERS.keys()),
+        nargs='+',
+        help='The stub readers to benchmark.'
+    )
+    parser.add_argument(
+        '-n', '--num_docs',
+        type=int,
+        default=[1000, 10000, 100000],
+        nargs='+',
+        help='The numbers of documents to read.'
+    )
+    parser.add_argument(
+        '-l', '--latency',
+        type=float,
+        default=0.0,
+        help='The number of seconds each stub reader takes per document.'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='Optionally dump the results as JSON to this file.'
+    )
+    args = parser.parse_args()
+
+    stages = ['read', 'prep_input', '_read', 'get_output', 'add_result',
+              '_map_id', 'read_bookkeeping', 'get_results']
+    print(('%-8s %8s' + ' %16s' * len(stages)) % (('reader', 'docs')
+                                                  + tuple(stages)))
+    all_times = []
+    for reader_name in args.readers:
+        for num_docs in args.num_docs:
+            times = benchmark_reader(STUB_READERS[reader_name], num_docs,
+                                     args.latency)
+            print(('%-8s %8d' + ' %16.4f' * len(stages))
+                  % ((reader_name, num_docs)
+                     + tuple(times.get(s, 0) for s in stages)))
+            all_times.append({'reader': reader_name, 'num_docs': num_docs,
+                              'times': times})
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(all_times, f, indent=2)
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,8 @@ import re
 import boto3
 from os.path import join
 
+from indra_reading.batch.logs import load_s3_log
+
 
 def analyze_reach_log(log_fname=None, log_str=None):
     """Return unifinished PMIDs given a log file name."""
@@ -41,9 +43,17 @@ def get_logs_from_db_reading(job_prefix, reading_queue='run_db_reading_queue'):
                                       Prefix=join(gen_prefix, job_prefix))
     # TODO: Track success/failure
     log_strs = []
+    chunk_keys = {}
     for fdict in job_log_data['Contents']:
-        resp = s3.get_object(Bucket='bigmech', Key=fdict['Key'])
+        key = fdict['Key']
+        if key.endswith('.gz'):
+            # Logs stashed in compressed chunks are gathered up and joined.
+            chunk_keys.setdefault(key.rsplit('.', 2)[0], []).append(key)
+            continue
+        resp = s3.get_object(Bucket='bigmech', Key=key)
         log_strs.append(resp['Body'].read().decode('utf-8'))
+    for log_name in sorted(chunk_keys.keys()):
+        log_strs.append(load_s3_log(s3, 'bigmech', chunk_keys[log_name]))
     return log_strs
 
 
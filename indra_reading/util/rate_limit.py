@@ -0,0 +1,69 @@
+"""Tools to limit the rate of calls to remote services."""
+import time
+import threading
+
+
+class TokenBucket(object):
+    """A thread-safe token bucket, to limit the rate of some action.
+
+    Tokens are added continuously at `rate` per second, up to `capacity`.
+    Each action takes a token, waiting if none are available, so bursts of up
+    to `capacity` actions are allowed while the long-run rate is bounded.
+
+    Parameters
+    ----------
+    rate : float
+        The number of tokens added per second.
+    capacity : Optional[float]
+        The maximum number of tokens that may accumulate. By default this is
+        the greater of `rate` and 1.
+    """
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("The rate must be positive.")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None
+                              else max(rate, 1))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        return
+
+    def __repr__(self):
+        return '%s(rate=%s, capacity=%s)' % (self.__class__.__name__,
+                                             self.rate, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if they are available, returning whether they were."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+        return False
+
+    def acquire(self, tokens=1):
+        """Take tokens, waiting until they are available."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def set_rate(self, rate):
+        """Change the rate at which tokens are added."""
+        if rate <= 0:
+            raise ValueError("The rate must be positive.")
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+        return